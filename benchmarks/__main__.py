@@ -0,0 +1,31 @@
+import argparse
+import sys
+
+from benchmarks import (
+    bench_day_simulation, bench_order_cache, bench_startup, bench_state_checker, bench_warm_restart,
+    bench_webhook_load
+)
+
+
+BENCHMARKS = {
+    "state_checker": bench_state_checker,
+    "webhook_load": bench_webhook_load,
+    "order_cache": bench_order_cache,
+    "startup": bench_startup,
+    "warm_restart": bench_warm_restart,
+    "day_simulation": bench_day_simulation,
+}
+
+
+def _parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the Fleet notifications benchmarks.")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    for name, benchmark in BENCHMARKS.items():
+        benchmark.configure_parser(subparsers.add_parser(name, help=benchmark.__doc__.splitlines()[0]))
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_arguments()
+    passed = BENCHMARKS[args.benchmark].main(args)
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,13 @@
+from fleet_notifications.script_args.configs import Twilio
+from tests._utils.testing_configs import TEST_TWILIO_CONFIG
+
+
+BENCHMARK_TWILIO_CONFIG = TEST_TWILIO_CONFIG.model_copy(deep=True)
+BENCHMARK_TWILIO_CONFIG.notifications.repeated_calls = 1
+BENCHMARK_TWILIO_CONFIG.notifications.rate_limit = Twilio.Notifications.RateLimit(
+    calls_create_per_s=1_000_000, calls_fetch_per_s=1_000_000, burst=1000
+)
+# All requests of the load benchmarks come from localhost
+BENCHMARK_TWILIO_CONFIG.call_handling.request_gate = Twilio.CallHandling.RequestGate(
+    requests_per_s=1_000_000, burst=1_000_000
+)
@@ -0,0 +1,75 @@
+import json
+
+from fleet_management_http_client_python import ( # type: ignore
+    Car, CarActionState, CarActionStatus, CarState, CarStatus, MobilePhone, Order, OrderState, OrderStatus
+)
+
+
+def synthetic_fleet(n_of_orders: int, orders_per_car: int = 10) -> tuple[list[Car], list[Order], list[OrderState]]:
+    """Create cars, orders and the stream of their states.
+
+    Every car completes its orders one after another, so the number of orders active at the same time
+    equals the number of cars. Every order reports IN_PROGRESS and then DONE."""
+    n_of_cars = max(1, n_of_orders // orders_per_car)
+    cars = [
+        Car(id=car_id, platformHwId=car_id, name=f"car_{car_id}", underTest=False,
+            carAdminPhone=MobilePhone(phone=f"+420000{car_id:06d}"))
+        for car_id in range(1, n_of_cars + 1)
+    ]
+    orders = []
+    states = []
+    timestamp = 1
+    for order_id in range(1, n_of_orders + 1):
+        car_id = (order_id - 1) % n_of_cars + 1
+        orders.append(Order(
+            id=order_id, carId=car_id, targetStopId=0, stopRouteId=0,
+            notificationPhone=MobilePhone(phone=f"+420111{order_id:06d}"),
+            last_state=OrderState(id=0, orderId=order_id, carId=car_id, status=OrderStatus.TO_ACCEPT, timestamp=0)
+        ))
+    for round_start in range(0, n_of_orders, n_of_cars):
+        round_orders = orders[round_start:round_start + n_of_cars]
+        for status in (OrderStatus.IN_PROGRESS, OrderStatus.DONE):
+            for order in round_orders:
+                states.append(OrderState(
+                    id=timestamp, orderId=order.id, carId=order.car_id, status=status, timestamp=timestamp
+                ))
+                timestamp += 1
+    return cars, orders, states
+
+
+def recorded_fleet(path: str) -> tuple[list[Car], list[Order], list[OrderState]]:
+    """Load a recorded stream of order states (one JSON object per line, as returned by the API)
+    and create the cars and orders it refers to."""
+    with open(path) as stream_file:
+        states = [OrderState.from_dict(json.loads(line)) for line in stream_file if line.strip()]
+    states.sort(key=lambda state: state.timestamp)
+    car_ids = sorted({state.car_id for state in states})
+    cars = [
+        Car(id=car_id, platformHwId=car_id, name=f"car_{car_id}", underTest=False,
+            carAdminPhone=MobilePhone(phone=f"+420000{car_id:06d}"))
+        for car_id in car_ids
+    ]
+    first_states: dict[int, OrderState] = {}
+    for state in states:
+        first_states.setdefault(state.order_id, state)
+    orders = [
+        Order(id=order_id, carId=state.car_id, targetStopId=0, stopRouteId=0,
+              notificationPhone=MobilePhone(phone=f"+420111{order_id:06d}"),
+              last_state=OrderState(id=0, orderId=order_id, carId=state.car_id, status=OrderStatus.TO_ACCEPT,
+                                    timestamp=0))
+        for order_id, state in first_states.items()
+    ]
+    return cars, orders, states
+
+
+def fleet_of_cars(n_of_cars: int) -> tuple[list[Car], list[CarState], list[CarActionState]]:
+    """Create driving cars named `car_<ID>` with their current states and action states."""
+    cars = [
+        Car(id=car_id, platformHwId=car_id, name=f"car_{car_id}", carAdminPhone=MobilePhone(phone=""))
+        for car_id in range(1, n_of_cars + 1)
+    ]
+    car_states = [CarState(id=0, timestamp=0, status=CarStatus.DRIVING, carId=car.id) for car in cars]
+    car_action_states = [
+        CarActionState(id=0, carId=car.id, timestamp=0, actionStatus=CarActionStatus.NORMAL) for car in cars
+    ]
+    return cars, car_states, car_action_states
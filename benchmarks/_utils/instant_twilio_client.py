@@ -0,0 +1,26 @@
+from twilio.rest.api.v2010.account.call import CallInstance # type: ignore
+
+from tests._utils.mock_twilio_client import MockCallList, MockTwilioClient
+
+
+class InstantCallList(MockCallList):
+    """Call list whose calls are picked up immediately and looked up by SID in constant time,
+    so the benchmarks never wait for the pickup polling."""
+
+    def __init__(self):
+        super().__init__()
+        self._calls_by_sid = {}
+
+    def create(self, to="", from_="", twiml=""):
+        call = super().create(to, from_, twiml)
+        call.fetch().status = CallInstance.Status.COMPLETED
+        self._calls_by_sid[call.sid] = call
+        return call
+
+    def get(self, sid):
+        return self._calls_by_sid.get(sid)
+
+
+class InstantTwilioClient(MockTwilioClient):
+    def __init__(self):
+        self.calls = InstantCallList()
@@ -0,0 +1,39 @@
+"""Runs the service until the state checker sends its first long-poll request, then reports it on stdout.
+
+Started by the startup benchmark in a new interpreter: `python -m benchmarks._utils.startup_probe <config>`.
+The entry point runs unchanged, except that the database is an in-memory SQLite database and the checkers
+request the order states from a MockApi.
+"""
+
+import sys
+
+
+FIRST_LONG_POLL_MARKER = "FIRST_LONG_POLL"
+
+
+def main(config_path: str) -> None:
+    # The service is imported here, so that the benchmark can import the marker without importing the service
+    import fleet_notifications.__main__ as entry_point
+    from fleet_notifications import state_checker
+    from fleet_notifications.database.database_controller import initialize_db
+    from tests._utils.mock_api import MockApi
+
+    class _ProbeApi(MockApi):
+        """MockApi reporting the first long-poll request and then blocking the checker until it is killed."""
+
+        def get_all_order_states(self, wait: bool = False, since: int = 0, last_n: int = 0, **kwargs):
+            if wait:
+                print(FIRST_LONG_POLL_MARKER, flush=True)
+                self.long_poll_timeout_s = 3600.0
+            return super().get_all_order_states(wait, since, last_n, **kwargs)
+
+    api = _ProbeApi()
+    state_checker.SingleFlightCarApi = state_checker.SingleFlightOrderApi = lambda _: api
+    state_checker.OrderStateApi = lambda _: api
+    entry_point.initialize_db = lambda connection, sites: initialize_db(connection, test=True, sites=sites)
+    sys.argv = ["fleet_notifications", config_path]
+    entry_point.main()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1])
@@ -0,0 +1,10 @@
+import math
+
+
+def percentile(values: list[float], p: float) -> float:
+    """Return the p-th percentile of the values (nearest-rank method), or 0 for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
@@ -0,0 +1,27 @@
+import json
+import os
+
+
+THRESHOLDS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "thresholds.json")
+
+
+def load_thresholds(benchmark: str) -> dict[str, dict[str, float]]:
+    """Return the regression thresholds of the benchmark, keyed by the scenario name."""
+    with open(THRESHOLDS_PATH) as thresholds_file:
+        return json.load(thresholds_file).get(benchmark, {})
+
+
+def check_thresholds(results: dict[str, float], thresholds: dict[str, float]) -> list[str]:
+    """Compare the results with thresholds named `min_<result>` or `max_<result>`.
+    Return descriptions of the violated thresholds."""
+    violations = []
+    for name, limit in thresholds.items():
+        bound, _, result_name = name.partition("_")
+        value = results.get(result_name)
+        if value is None:
+            continue
+        if bound == "min" and value < limit:
+            violations.append(f"{result_name} = {value:.2f} is below the minimum {limit}")
+        elif bound == "max" and value > limit:
+            violations.append(f"{result_name} = {value:.2f} is above the maximum {limit}")
+    return violations
@@ -0,0 +1,190 @@
+"""Simulates a day of a fleet on an accelerated clock and measures the lag of the customer notifications.
+
+The state checker runs in its own thread with the notification dispatcher, the Twilio rate limits of the test
+configuration and a Twilio client whose calls are picked up immediately. Cars complete their orders one after
+another during the simulated hours; the order states are added to the MockApi stand-in of the Fleet Management
+API at their simulated times. All components wait on a `ScaledClock`, so the day passes in minutes, while the
+requests to the stand-in API and the database take their real time, which is magnified by the time scale.
+"""
+
+import argparse
+import dataclasses
+import threading
+import time
+from typing import Callable
+
+from fleet_management_http_client_python import ( # type: ignore
+    ApiClient, Car, Configuration, MobilePhone, Order, OrderState, OrderStatus
+)
+
+import fleet_notifications.database.database_controller as notifications_db
+from fleet_notifications import clock
+from fleet_notifications.clock import ScaledClock, set_clock
+from fleet_notifications.notification_dispatcher import NotificationDispatcher
+from fleet_notifications.notifications_client import NotificationClient
+from fleet_notifications.script_args.configs import Database
+from fleet_notifications.state_checker import OrderStateChecker
+from benchmarks._utils.instant_twilio_client import InstantTwilioClient
+from benchmarks._utils.stats import percentile
+from benchmarks._utils.thresholds import check_thresholds, load_thresholds
+from tests._utils.mock_api import MockApi
+from tests._utils.testing_configs import TEST_TWILIO_CONFIG
+
+
+HOURS = 24
+ORDERS_PER_DAY = 2000
+N_OF_CARS = 50
+TIME_SCALE = 1000.0
+# Real seconds to wait for the notifications queued at the end of the day
+DRAIN_TIMEOUT_S = 30.0
+CUSTOMER_PHONE_PREFIX = "+420111"
+
+
+@dataclasses.dataclass(frozen=True)
+class DaySimulationResult:
+    simulated_s: float
+    real_s: float
+    n_of_states: int
+    n_of_done_orders: int
+    customer_lags_s: list[float]
+
+    @property
+    def compression(self) -> float:
+        return self.simulated_s / self.real_s
+
+    @property
+    def missed_notifications(self) -> int:
+        return self.n_of_done_orders - len(self.customer_lags_s)
+
+    def as_dict(self) -> dict[str, float]:
+        return {
+            "compression": self.compression,
+            "missed_notifications": self.missed_notifications,
+            "customer_lag_p50_s": percentile(self.customer_lags_s, 50),
+            "customer_lag_p95_s": percentile(self.customer_lags_s, 95),
+        }
+
+
+class _RecordingNotificationClient(NotificationClient):
+    """Notification client recording the simulated lag from the order state to the customer call."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.customer_lags_s: list[float] = []
+        self._lock = threading.Lock()
+
+    def call_phone(
+        self,
+        phone_number: str,
+        under_test: bool,
+        origin_timestamp_ms: int | None = None,
+        on_placing: Callable[[], None] | None = None
+    ) -> None:
+        super().call_phone(phone_number, under_test, origin_timestamp_ms, on_placing)
+        if phone_number.startswith(CUSTOMER_PHONE_PREFIX) and origin_timestamp_ms is not None:
+            with self._lock:
+                self.customer_lags_s.append(clock.time() - origin_timestamp_ms / 1000)
+
+
+def _schedule(hours: float, orders_per_day: int, n_of_cars: int) -> tuple[list[Order], list[tuple[float, int, int]]]:
+    """Create the orders and the schedule of their states as (simulated second, order ID, car ID),
+    IN_PROGRESS at the start of an order and DONE at its end."""
+    n_of_orders = max(1, round(orders_per_day * hours / 24))
+    orders_per_car = max(1, n_of_orders // n_of_cars)
+    order_duration_s = hours * 3600 / orders_per_car
+    orders = []
+    schedule = []
+    for order_id in range(1, orders_per_car * n_of_cars + 1):
+        car_id = (order_id - 1) % n_of_cars + 1
+        # The cars start their orders at different times, so the states are spread over the day
+        start_s = ((order_id - 1) // n_of_cars + car_id / n_of_cars) * order_duration_s
+        orders.append(Order(
+            id=order_id, carId=car_id, targetStopId=0, stopRouteId=0,
+            notificationPhone=MobilePhone(phone=f"{CUSTOMER_PHONE_PREFIX}{order_id:06d}"),
+        ))
+        schedule.append((start_s, order_id, car_id))
+        schedule.append((start_s + 0.9 * order_duration_s, -order_id, car_id))
+    schedule.sort(key=lambda event: event[0])
+    return orders, schedule
+
+
+def run(hours: float, orders_per_day: int, n_of_cars: int, time_scale: float) -> DaySimulationResult:
+    notifications_db.initialize_db(
+        Database.Connection(location="_", database_name="_", username="_", password="_", port=0),
+        test=True
+    )
+    orders, schedule = _schedule(hours, orders_per_day, n_of_cars)
+    api = MockApi()
+    api._set_cars([
+        Car(id=car_id, platformHwId=car_id, name=f"car_{car_id}", underTest=False,
+            carAdminPhone=MobilePhone(phone=f"+420000{car_id:06d}"))
+        for car_id in range(1, n_of_cars + 1)
+    ])
+    api._set_orders(orders)
+
+    previous_clock = set_clock(ScaledClock(time_scale))
+    try:
+        notification_client = _RecordingNotificationClient(TEST_TWILIO_CONFIG)
+        notification_client._client = InstantTwilioClient()
+        notification_client._check_url_exists = lambda: True
+        checker = OrderStateChecker(
+            twilio_config=TEST_TWILIO_CONFIG,
+            api_client=ApiClient(Configuration(host="http://example.com", api_key={'APIKeyAuth': "benchmark"})),
+            dispatcher=NotificationDispatcher(notification_client, TEST_TWILIO_CONFIG.notifications.dispatcher)
+        )
+        checker.order_api = api
+        checker.car_api = api
+        checker.order_state_api = api
+        checker.start_thread()
+
+        start_s = clock.monotonic()
+        real_start_s = time.monotonic()
+        for state_id, (at_s, signed_order_id, car_id) in enumerate(schedule, start=1):
+            clock.sleep(at_s - (clock.monotonic() - start_s))
+            api._add_order_state(OrderState(
+                id=state_id, orderId=abs(signed_order_id), carId=car_id,
+                status=OrderStatus.IN_PROGRESS if signed_order_id > 0 else OrderStatus.DONE,
+                timestamp=int(clock.time() * 1000)
+            ))
+        n_of_done_orders = sum(1 for _, signed_order_id, _ in schedule if signed_order_id < 0)
+        deadline = time.monotonic() + DRAIN_TIMEOUT_S
+        while len(notification_client.customer_lags_s) < n_of_done_orders and time.monotonic() < deadline:
+            time.sleep(0.1)
+        simulated_s = clock.monotonic() - start_s
+        real_s = time.monotonic() - real_start_s
+        checker.stop(timeout_s=DRAIN_TIMEOUT_S)
+        checker.dispatcher.shutdown(timeout_s=DRAIN_TIMEOUT_S)
+    finally:
+        set_clock(previous_clock)
+
+    return DaySimulationResult(
+        simulated_s=simulated_s,
+        real_s=real_s,
+        n_of_states=len(schedule),
+        n_of_done_orders=n_of_done_orders,
+        customer_lags_s=notification_client.customer_lags_s,
+    )
+
+
+def configure_parser(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--hours", type=float, default=HOURS, help="Number of simulated hours.")
+    parser.add_argument("--orders-per-day", type=int, default=ORDERS_PER_DAY, help="Number of orders per day.")
+    parser.add_argument("--cars", type=int, default=N_OF_CARS, help="Number of cars completing the orders.")
+    parser.add_argument("--time-scale", type=float, default=TIME_SCALE,
+                        help="How many times faster than the real time the simulated time runs.")
+
+
+def main(args: argparse.Namespace) -> bool:
+    """Run the simulation and print the results. Return False if any regression threshold is violated."""
+    thresholds = load_thresholds("day_simulation")
+    result = run(args.hours, args.orders_per_day, args.cars, args.time_scale)
+    values = result.as_dict()
+    print(f"Simulated {result.simulated_s / 3600:.1f} h in {result.real_s:.1f} s "
+          f"({result.compression:.0f}x), {result.n_of_states} order states")
+    print(f"Customer notifications: {len(result.customer_lags_s)} of {result.n_of_done_orders}, "
+          f"lag p50 {values['customer_lag_p50_s']:.1f} s, p95 {values['customer_lag_p95_s']:.1f} s (simulated)")
+    passed = True
+    for violation in check_thresholds(values, thresholds.get("default", {})):
+        print(f"  REGRESSION: {violation}")
+        passed = False
+    return passed
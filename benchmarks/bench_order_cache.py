@@ -0,0 +1,198 @@
+"""Measures the memory held by the order cache of the OrderStateChecker.
+
+The footprint of a cached order is compared with the footprint of the complete `Order` model, then days
+of orders are streamed through a checker to check that the memory held by the process stays flat once
+the finished orders are evicted. Memory is measured with tracemalloc.
+"""
+
+import argparse
+import dataclasses
+import gc
+import tracemalloc
+
+from fleet_management_http_client_python import ( # type: ignore
+    ApiClient, Configuration, Car, MobilePhone, Order, OrderState, OrderStatus
+)
+
+import fleet_notifications.database.database_controller as notifications_db
+from fleet_notifications.notification_dispatcher import NotificationPriority
+from fleet_notifications.order_record import OrderRecord
+from fleet_notifications.script_args.configs import Database
+from fleet_notifications.state_checker import OrderStateChecker
+from benchmarks._utils.configs import BENCHMARK_TWILIO_CONFIG
+from benchmarks._utils.thresholds import check_thresholds, load_thresholds
+from tests._utils.mock_api import MockApi
+
+
+N_OF_ORDERS = 10000
+DAYS = 7
+ORDERS_PER_DAY = 10000
+N_OF_CARS = 100
+BATCH_SIZE = 100
+
+
+@dataclasses.dataclass(frozen=True)
+class OrderCacheResult:
+    model_bytes_per_order: float
+    record_bytes_per_order: float
+    daily_retained_kib: list[float]
+
+    @property
+    def record_to_model_ratio(self) -> float:
+        return self.record_bytes_per_order / self.model_bytes_per_order
+
+    @property
+    def growth_after_first_day_kib(self) -> float:
+        return max(self.daily_retained_kib) - self.daily_retained_kib[0]
+
+    def as_dict(self) -> dict[str, float]:
+        return {
+            "record_bytes_per_order": self.record_bytes_per_order,
+            "record_to_model_ratio": self.record_to_model_ratio,
+            "growth_after_first_day_kib": self.growth_after_first_day_kib,
+        }
+
+
+class _CountingDispatcher:
+    """Dispatcher counting the notifications instead of placing them."""
+
+    def __init__(self):
+        self.n_of_notifications = 0
+
+    def dispatch(
+        self,
+        phone_number: str,
+        under_test: bool,
+        priority: NotificationPriority,
+        origin_timestamp_ms: int | None = None
+    ) -> None:
+        self.n_of_notifications += 1
+
+
+def _order(order_id: int, car_id: int) -> Order:
+    return Order(
+        id=order_id, carId=car_id, targetStopId=0, stopRouteId=0,
+        notificationPhone=MobilePhone(phone=f"+420111{order_id:06d}"),
+        last_state=OrderState(id=0, orderId=order_id, carId=car_id, status=OrderStatus.TO_ACCEPT, timestamp=0)
+    )
+
+
+def _retained_bytes(create) -> int:
+    """Return the memory held by the object returned by `create`."""
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    held = create()
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    del held
+    return retained
+
+
+def measure_footprint(n_of_orders: int) -> tuple[float, float]:
+    """Return the bytes per order held by a dictionary of `Order` models and of order records."""
+    orders = [_order(order_id, order_id % N_OF_CARS + 1) for order_id in range(1, n_of_orders + 1)]
+    model_bytes = _retained_bytes(
+        lambda: {order.id: order.model_copy(deep=True) for order in orders}
+    )
+    record_bytes = _retained_bytes(
+        lambda: {order.id: OrderRecord.from_order(order) for order in orders}
+    )
+    return model_bytes / n_of_orders, record_bytes / n_of_orders
+
+
+def _create_checker(api: MockApi) -> tuple[OrderStateChecker, _CountingDispatcher]:
+    checker = OrderStateChecker(
+        twilio_config=BENCHMARK_TWILIO_CONFIG,
+        api_client=ApiClient(Configuration(host="http://example.com", api_key={'APIKeyAuth': "benchmark"}))
+    )
+    dispatcher = _CountingDispatcher()
+    checker.dispatcher = dispatcher
+    checker.order_api = api
+    checker.car_api = api
+    checker.order_state_api = api
+    return checker, dispatcher
+
+
+def _stream_day(
+    checker: OrderStateChecker,
+    api: MockApi,
+    first_order_id: int,
+    first_timestamp: int,
+    orders_per_day: int,
+    batch_size: int
+) -> int:
+    """Stream the orders of a day through the checker. Every car completes its orders one after another.
+    The orders are known to the API only while they are active. Return the timestamp of the last state."""
+    timestamp = first_timestamp
+    for round_start in range(first_order_id, first_order_id + orders_per_day, N_OF_CARS):
+        round_order_ids = range(round_start, min(round_start + N_OF_CARS, first_order_id + orders_per_day))
+        api._set_orders([_order(order_id, order_id % N_OF_CARS + 1) for order_id in round_order_ids])
+        for status in (OrderStatus.IN_PROGRESS, OrderStatus.DONE):
+            states = []
+            for order_id in round_order_ids:
+                states.append(OrderState(
+                    id=timestamp, orderId=order_id, carId=order_id % N_OF_CARS + 1, status=status,
+                    timestamp=timestamp
+                ))
+                timestamp += 1
+            for start in range(0, len(states), batch_size):
+                checker._process_states({state.order_id: state for state in states[start:start + batch_size]})
+    return timestamp
+
+
+def measure_uptime(days: int, orders_per_day: int, batch_size: int) -> list[float]:
+    """Stream `days` days of orders through a checker and return the memory (KiB) held after each day."""
+    notifications_db.initialize_db(
+        Database.Connection(location="_", database_name="_", username="_", password="_", port=0),
+        test=True
+    )
+    api = MockApi()
+    api._set_cars([
+        Car(id=car_id, platformHwId=car_id, name=f"car_{car_id}", underTest=False,
+            carAdminPhone=MobilePhone(phone=f"+420000{car_id:06d}"))
+        for car_id in range(1, N_OF_CARS + 1)
+    ])
+    checker, _ = _create_checker(api)
+    retained_kib = []
+    timestamp = 1
+    for day in range(days):
+        timestamp = _stream_day(checker, api, day * orders_per_day + 1, timestamp, orders_per_day, batch_size)
+        gc.collect()
+        retained_kib.append(tracemalloc.get_traced_memory()[0] / 1024)
+    return retained_kib
+
+
+def run(n_of_orders: int, days: int, orders_per_day: int, batch_size: int = BATCH_SIZE) -> OrderCacheResult:
+    tracemalloc.start()
+    try:
+        model_bytes, record_bytes = measure_footprint(n_of_orders)
+        daily_retained_kib = measure_uptime(days, orders_per_day, batch_size)
+    finally:
+        tracemalloc.stop()
+    return OrderCacheResult(model_bytes, record_bytes, daily_retained_kib)
+
+
+def configure_parser(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--orders", type=int, default=N_OF_ORDERS,
+                        help="Number of cached orders used to measure the footprint of an order.")
+    parser.add_argument("--days", type=int, default=DAYS, help="Number of days of uptime to simulate.")
+    parser.add_argument("--orders-per-day", type=int, default=ORDERS_PER_DAY, help="Number of orders per day.")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Number of states per long-poll.")
+
+
+def main(args: argparse.Namespace) -> bool:
+    """Run the benchmark and print the results. Return False if any regression threshold is violated."""
+    thresholds = load_thresholds("order_cache")
+    result = run(args.orders, args.days, args.orders_per_day, args.batch_size)
+    print(f"{'Order model':>14}: {result.model_bytes_per_order:>8.0f} B/order")
+    print(f"{'Order record':>14}: {result.record_bytes_per_order:>8.0f} B/order "
+          f"({result.record_to_model_ratio:.0%} of the model)")
+    print(f"{'day':>4} {'retained KiB':>13}")
+    for day, retained_kib in enumerate(result.daily_retained_kib, start=1):
+        print(f"{day:>4} {retained_kib:>13.0f}")
+    print(f"Growth after the first day: {result.growth_after_first_day_kib:.0f} KiB")
+    passed = True
+    for violation in check_thresholds(result.as_dict(), thresholds.get("default", {})):
+        print(f"  REGRESSION: {violation}")
+        passed = False
+    return passed
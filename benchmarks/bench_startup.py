@@ -0,0 +1,158 @@
+"""Measures how long the service takes from its launch to the first long-poll request of the state checker.
+
+Every run starts the service in a new interpreter by the startup probe, with an in-memory database and
+a MockApi stand-in of the Fleet Management API, and measures the time from launching the interpreter until
+the checker asks the stand-in for new order states. The time includes the start of the interpreter, the
+imports, the initialization of the components and the catch-up request. The import times of all components
+are listed to find the modules slowing the startup down.
+"""
+
+import argparse
+import dataclasses
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks._utils.startup_probe import FIRST_LONG_POLL_MARKER
+from benchmarks._utils.thresholds import check_thresholds, load_thresholds
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPEAT = 5
+N_OF_SLOWEST_MODULES = 5
+# Real seconds to wait for the first long poll of a single run
+LAUNCH_TIMEOUT_S = 60.0
+COMPONENTS = (
+    "fleet_notifications.__main__",
+    "fleet_notifications.database.database_controller",
+    "fleet_notifications.state_checker",
+    "fleet_notifications.notifications_client",
+    "fleet_notifications.incoming_call_endpoint",
+    "fleet_notifications.health",
+    "fleet_notifications.lifecycle",
+    "fleet_notifications.config_reload",
+)
+
+
+@dataclasses.dataclass(frozen=True)
+class StartupResult:
+    first_long_poll_times_ms: list[float]
+    import_ms: float
+    slowest_modules: list[tuple[str, float]]
+
+    @property
+    def first_long_poll_ms(self) -> float:
+        return statistics.median(self.first_long_poll_times_ms)
+
+    def as_dict(self) -> dict[str, float]:
+        return {
+            "first_long_poll_ms": self.first_long_poll_ms,
+            "import_ms": self.import_ms,
+        }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _write_config(directory: str) -> str:
+    """Write the shipped configuration with a free HTTP port and only the errors logged to the console."""
+    with open(os.path.join(ROOT_DIR, "config", "config.json")) as config_file:
+        config = json.load(config_file)
+    config["logging"]["console"]["level"] = "error"
+    config["logging"]["file"]["use"] = False
+    config["http_server"]["port"] = _free_port()
+    path = os.path.join(directory, "config.json")
+    with open(path, "w") as config_file:
+        json.dump(config, config_file)
+    return path
+
+
+def _time_to_first_long_poll_ms(config_path: str) -> float:
+    """Launch the service by the startup probe and return the time (ms) until its first long-poll request."""
+    command = [sys.executable, "-m", "benchmarks._utils.startup_probe", config_path]
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        command, cwd=ROOT_DIR, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+    )
+    try:
+        assert process.stdout is not None
+        for line in process.stdout:
+            if line.strip() == FIRST_LONG_POLL_MARKER:
+                return (time.perf_counter() - start) * 1000
+            if time.perf_counter() - start > LAUNCH_TIMEOUT_S:
+                break
+        raise RuntimeError("The service exited or timed out before its first long-poll request.")
+    finally:
+        process.kill()
+        process.wait()
+
+
+def _import_times(modules: tuple[str, ...]) -> tuple[float, dict[str, float]]:
+    """Import the modules in a new interpreter. Return the total import time (ms) and the cumulative import
+    time (ms) of every imported module, parsed from the `-X importtime` output."""
+    code = "; ".join(f"import {module}" for module in modules)
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+    )
+    total_ms = 0.0
+    times_ms = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        times_ms[name.strip()] = int(cumulative_us) / 1000
+        if not name.startswith("  "):
+            # Nested imports are included in the cumulative time of the top-level import
+            total_ms += int(cumulative_us) / 1000
+    return total_ms, times_ms
+
+
+def run(repeat: int = REPEAT) -> StartupResult:
+    with tempfile.TemporaryDirectory() as directory:
+        first_long_poll_times_ms = [_time_to_first_long_poll_ms(_write_config(directory)) for _ in range(repeat)]
+
+    # Modules imported by the interpreter itself are left out
+    baseline_ms, baseline_times_ms = _import_times(())
+    import_times_ms = []
+    module_times_ms: dict[str, list[float]] = {}
+    for _ in range(repeat):
+        total_ms, times_ms = _import_times(COMPONENTS)
+        import_times_ms.append(total_ms - baseline_ms)
+        for name, time_ms in times_ms.items():
+            module_times_ms.setdefault(name, []).append(time_ms)
+    slowest_modules = sorted(
+        ((name, statistics.median(times)) for name, times in module_times_ms.items()
+         if name not in COMPONENTS and name not in baseline_times_ms),
+        key=lambda item: item[1], reverse=True
+    )[:N_OF_SLOWEST_MODULES]
+    return StartupResult(
+        first_long_poll_times_ms, statistics.median(import_times_ms), slowest_modules
+    )
+
+
+def configure_parser(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="Number of launches of the service.")
+
+
+def main(args: argparse.Namespace) -> bool:
+    """Run the benchmark and print the results. Return False if any regression threshold is violated."""
+    thresholds = load_thresholds("startup")
+    result = run(args.repeat)
+    print(f"Launch to the first long poll: {result.first_long_poll_ms:.0f} ms "
+          f"(median of {len(result.first_long_poll_times_ms)})")
+    print(f"Import of all components: {result.import_ms:.0f} ms, slowest modules:")
+    for module, time_ms in result.slowest_modules:
+        print(f"  {module:<50} {time_ms:>8.1f} ms")
+    passed = True
+    for violation in check_thresholds(result.as_dict(), thresholds.get("default", {})):
+        print(f"  REGRESSION: {violation}")
+        passed = False
+    return passed
@@ -0,0 +1,195 @@
+"""Replays streams of order states through the OrderStateChecker and measures its throughput.
+
+The checker talks to the MockApi stand-in of the Fleet Management API, an in-memory SQLite database
+and a Twilio client whose calls are picked up immediately.
+"""
+
+import argparse
+import dataclasses
+import threading
+import time
+
+from sqlalchemy import event
+
+from fleet_management_http_client_python import ApiClient, Configuration, OrderState # type: ignore
+
+import fleet_notifications.database.database_controller as notifications_db
+from fleet_notifications.database.connection import get_connection_source
+from fleet_notifications.notification_dispatcher import NotificationDispatcher, NotificationPriority
+from fleet_notifications.script_args.configs import Database
+from fleet_notifications.state_checker import OrderStateChecker
+from benchmarks._utils.configs import BENCHMARK_TWILIO_CONFIG
+from benchmarks._utils.fleet import recorded_fleet, synthetic_fleet
+from benchmarks._utils.instant_twilio_client import InstantTwilioClient
+from benchmarks._utils.stats import percentile
+from benchmarks._utils.thresholds import check_thresholds, load_thresholds
+from tests._utils.mock_api import MockApi
+
+
+BATCH_SIZE = 100
+FLEET_SIZES = (10, 100, 1000, 10000)
+
+
+@dataclasses.dataclass(frozen=True)
+class StateCheckerResult:
+    n_of_orders: int
+    n_of_states: int
+    n_of_batches: int
+    n_of_notifications: int
+    duration_s: float
+    api_requests: int
+    db_round_trips: int
+    decision_latencies_ms: list[float]
+
+    @property
+    def states_per_s(self) -> float:
+        return self.n_of_states / self.duration_s if self.duration_s else float("inf")
+
+    @property
+    def api_requests_per_state(self) -> float:
+        return self.api_requests / self.n_of_states
+
+    @property
+    def db_round_trips_per_batch(self) -> float:
+        return self.db_round_trips / self.n_of_batches
+
+    @property
+    def decision_latency_p50_ms(self) -> float:
+        return percentile(self.decision_latencies_ms, 50)
+
+    @property
+    def decision_latency_p95_ms(self) -> float:
+        return percentile(self.decision_latencies_ms, 95)
+
+    def as_dict(self) -> dict[str, float]:
+        return {
+            "states_per_s": self.states_per_s,
+            "api_requests_per_state": self.api_requests_per_state,
+            "db_round_trips_per_batch": self.db_round_trips_per_batch,
+            "decision_latency_p50_ms": self.decision_latency_p50_ms,
+            "decision_latency_p95_ms": self.decision_latency_p95_ms,
+        }
+
+
+class _RecordingDispatcher(NotificationDispatcher):
+    """Dispatcher recording the time at which the checker decided to notify."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batch_started_at = 0.0
+        self.decision_latencies_ms: list[float] = []
+        self._lock = threading.Lock()
+
+    def dispatch(
+        self,
+        phone_number: str,
+        under_test: bool,
+        priority: NotificationPriority,
+        origin_timestamp_ms: int | None = None
+    ) -> None:
+        with self._lock:
+            self.decision_latencies_ms.append((time.perf_counter() - self.batch_started_at) * 1000)
+        super().dispatch(phone_number, under_test, priority, origin_timestamp_ms)
+
+
+def _create_checker(api: MockApi) -> tuple[OrderStateChecker, _RecordingDispatcher]:
+    checker = OrderStateChecker(
+        twilio_config=BENCHMARK_TWILIO_CONFIG,
+        api_client=ApiClient(Configuration(host="http://example.com", api_key={'APIKeyAuth': "benchmark"}))
+    )
+    checker.notification_client._client = InstantTwilioClient()
+    checker.notification_client._check_url_exists = lambda: True
+    dispatcher = _RecordingDispatcher(checker.notification_client, BENCHMARK_TWILIO_CONFIG.notifications.dispatcher)
+    checker.dispatcher = dispatcher
+    checker.order_api = api
+    checker.car_api = api
+    checker.order_state_api = api
+    return checker, dispatcher
+
+
+def _initialize_db() -> None:
+    notifications_db.initialize_db(
+        Database.Connection(location="_", database_name="_", username="_", password="_", port=0),
+        test=True
+    )
+
+
+def _batches(states: list[OrderState], batch_size: int):
+    for start in range(0, len(states), batch_size):
+        yield states[start:start + batch_size]
+
+
+def run(api: MockApi, states: list[OrderState], batch_size: int = BATCH_SIZE) -> StateCheckerResult:
+    """Replay `states` through a new checker in batches of `batch_size`, as if each batch were
+    the response of one long-poll request."""
+    _initialize_db()
+    db_round_trips = 0
+
+    def count_round_trip(*_):
+        nonlocal db_round_trips
+        db_round_trips += 1
+
+    engine = get_connection_source()
+    event.listen(engine, "before_cursor_execute", count_round_trip)
+    checker, dispatcher = _create_checker(api)
+    n_of_batches = 0
+    duration_s = 0.0
+    try:
+        for batch in _batches(states, batch_size):
+            for state in batch:
+                api._add_order_state(state)
+            batch_states = {state.order_id: state for state in batch}
+            start = time.perf_counter()
+            dispatcher.batch_started_at = start
+            checker._process_states(batch_states)
+            duration_s += time.perf_counter() - start
+            n_of_batches += 1
+    finally:
+        event.remove(engine, "before_cursor_execute", count_round_trip)
+
+    return StateCheckerResult(
+        n_of_orders=len({state.order_id for state in states}),
+        n_of_states=len(states),
+        n_of_batches=n_of_batches,
+        n_of_notifications=len(dispatcher.decision_latencies_ms),
+        duration_s=duration_s,
+        api_requests=api.total_requests,
+        db_round_trips=db_round_trips,
+        decision_latencies_ms=dispatcher.decision_latencies_ms,
+    )
+
+
+def configure_parser(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=FLEET_SIZES, help="Numbers of orders in the synthetic streams."
+    )
+    parser.add_argument("--stream", type=str, help="Replay a recorded stream of order states (JSON lines).")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Number of states per long-poll.")
+    parser.add_argument("--api-latency", type=float, default=0.0,
+                        help="Seconds every Fleet Management API request takes.")
+
+
+def main(args: argparse.Namespace) -> bool:
+    """Run the benchmark and print the results. Return False if any regression threshold is violated."""
+    thresholds = load_thresholds("state_checker")
+    scenarios = []
+    if args.stream:
+        scenarios.append((args.stream, recorded_fleet(args.stream)))
+    else:
+        scenarios.extend((str(size), synthetic_fleet(size)) for size in args.sizes)
+
+    passed = True
+    print(f"{'scenario':>12} {'states':>8} {'states/s':>10} {'API/state':>10} {'DB/batch':>9} "
+          f"{'p50 ms':>8} {'p95 ms':>8}")
+    for name, (cars, orders, states) in scenarios:
+        api = MockApi(latency_s=args.api_latency)
+        api._set_cars(cars)
+        api._set_orders(orders)
+        result = run(api, states, args.batch_size)
+        print(f"{name:>12} {result.n_of_states:>8} {result.states_per_s:>10.0f} "
+              f"{result.api_requests_per_state:>10.2f} {result.db_round_trips_per_batch:>9.1f} "
+              f"{result.decision_latency_p50_ms:>8.2f} {result.decision_latency_p95_ms:>8.2f}")
+        for violation in check_thresholds(result.as_dict(), thresholds.get(name, {})):
+            print(f"  REGRESSION: {violation}")
+            passed = False
+    return passed
@@ -0,0 +1,111 @@
+"""Measures how long the state checker takes after a restart to load its unfinished orders.
+
+The unfinished orders are saved in an in-memory SQLite database and known to a stand-in of the Fleet
+Management API with a configurable request latency. The orders are loaded once by fetching every order
+from the API (cold restart) and once from the snapshot of the order cache (warm restart).
+"""
+
+import argparse
+import dataclasses
+import tempfile
+import time
+
+from fleet_management_http_client_python import ApiClient, Configuration, OrderState, OrderStatus # type: ignore
+
+import fleet_notifications.database.database_controller as notifications_db
+from fleet_notifications.script_args.configs import Database, OrderSnapshot
+from fleet_notifications.state_checker import OrderStateChecker
+from benchmarks._utils.configs import BENCHMARK_TWILIO_CONFIG
+from benchmarks._utils.fleet import synthetic_fleet
+from benchmarks._utils.thresholds import check_thresholds, load_thresholds
+from tests._utils.mock_api import MockApi
+
+
+ORDER_COUNTS = [100, 1000]
+API_LATENCY_S = 0.01
+
+
+@dataclasses.dataclass(frozen=True)
+class RestartResult:
+    n_of_orders: int
+    cold_start_ms: float
+    warm_start_ms: float
+    warm_api_requests: int
+
+    def as_dict(self) -> dict[str, float]:
+        return {
+            "cold_start_ms": self.cold_start_ms,
+            "warm_start_ms": self.warm_start_ms,
+            "warm_api_requests": self.warm_api_requests,
+        }
+
+
+def _create_checker(api: MockApi, snapshot_directory: str) -> OrderStateChecker:
+    checker = OrderStateChecker(
+        twilio_config=BENCHMARK_TWILIO_CONFIG,
+        api_client=ApiClient(Configuration(host="http://example.com", api_key={'APIKeyAuth': "benchmark"})),
+        snapshot_config=OrderSnapshot(directory=snapshot_directory)
+    )
+    checker.order_api = api
+    checker.car_api = api
+    checker.order_state_api = api
+    return checker
+
+
+def _load_orders_ms(checker: OrderStateChecker) -> float:
+    start = time.perf_counter()
+    checker._load_unfinished_orders()
+    return (time.perf_counter() - start) * 1000
+
+
+def run(n_of_orders: int, api_latency_s: float) -> RestartResult:
+    """Load `n_of_orders` unfinished orders without and with the snapshot of the order cache."""
+    notifications_db.initialize_db(
+        Database.Connection(location="_", database_name="_", username="_", password="_", port=0),
+        test=True
+    )
+    _, orders, _ = synthetic_fleet(n_of_orders, orders_per_car=1)
+    orders = [
+        order.model_copy(update={"last_state": OrderState(
+            id=order.id, orderId=order.id, carId=order.car_id, status=OrderStatus.IN_PROGRESS, timestamp=order.id
+        )})
+        for order in orders
+    ]
+    api = MockApi(latency_s=api_latency_s)
+    api._set_orders(orders)
+    for order in orders:
+        notifications_db.update_order(order.id, order.car_id, n_of_orders)
+
+    with tempfile.TemporaryDirectory() as snapshot_directory:
+        cold_checker = _create_checker(api, snapshot_directory)
+        cold_start_ms = _load_orders_ms(cold_checker)
+        cold_checker._save_snapshot()
+
+        requests_before = api.total_requests
+        warm_start_ms = _load_orders_ms(_create_checker(api, snapshot_directory))
+        warm_api_requests = api.total_requests - requests_before
+
+    for order in orders:
+        notifications_db.delete_order(order.id)
+    return RestartResult(n_of_orders, cold_start_ms, warm_start_ms, warm_api_requests)
+
+
+def configure_parser(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--orders", type=int, nargs="+", default=ORDER_COUNTS, help="Numbers of unfinished orders.")
+    parser.add_argument("--api-latency", type=float, default=API_LATENCY_S,
+                        help="Seconds every Fleet Management API request takes.")
+
+
+def main(args: argparse.Namespace) -> bool:
+    """Run the benchmark and print the results. Return False if any regression threshold is violated."""
+    thresholds = load_thresholds("warm_restart")
+    passed = True
+    print(f"{'orders':>7} {'cold ms':>9} {'warm ms':>9} {'warm API requests':>18}")
+    for n_of_orders in args.orders:
+        result = run(n_of_orders, args.api_latency)
+        print(f"{n_of_orders:>7} {result.cold_start_ms:>9.0f} {result.warm_start_ms:>9.1f} "
+              f"{result.warm_api_requests:>18}")
+        for violation in check_thresholds(result.as_dict(), thresholds.get("default", {})):
+            print(f"  REGRESSION: {violation}")
+            passed = False
+    return passed
@@ -0,0 +1,204 @@
+"""Load-tests the handle-call webhook with concurrent signed pause/unpause requests.
+
+The app is served locally by a threaded server and talks to a stand-in of the Fleet Management API
+in which cars change their states only after a configurable delay. The handled calls are recorded
+in an in-memory SQLite database.
+"""
+
+import argparse
+import dataclasses
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Flask
+from twilio.request_validator import RequestValidator # type: ignore
+from werkzeug.serving import make_server
+
+from fleet_management_http_client_python import ApiClient, Configuration # type: ignore
+
+import fleet_notifications.database.database_controller as notifications_db
+from fleet_notifications.incoming_call_endpoint import FlaskAppWrapper, IncomingCallHandler
+from fleet_notifications.script_args.configs import Database, HTTPServer, Twilio
+from benchmarks._utils.configs import BENCHMARK_TWILIO_CONFIG
+from benchmarks._utils.fleet import fleet_of_cars
+from benchmarks._utils.stats import percentile
+from benchmarks._utils.thresholds import check_thresholds, load_thresholds
+from tests._utils.mock_api import MockApi
+
+
+HANDLE_CALL_PATH = "/v2/notifications/handle-call"
+TWILIO_WEBHOOK_TIMEOUT_S = 15
+ERROR_MESSAGE = "An error occured while handling the call."
+CONCURRENCY_LEVELS = (1, 5, 10, 25, 50)
+
+
+@dataclasses.dataclass(frozen=True)
+class LoadResult:
+    concurrency: int
+    latencies_ms: list[float]
+    n_of_errors: int
+    duration_s: float
+
+    @property
+    def n_of_requests(self) -> int:
+        return len(self.latencies_ms)
+
+    @property
+    def error_rate(self) -> float:
+        return self.n_of_errors / self.n_of_requests if self.n_of_requests else 0.0
+
+    @property
+    def timeout_rate(self) -> float:
+        over_timeout = [latency for latency in self.latencies_ms if latency > TWILIO_WEBHOOK_TIMEOUT_S * 1000]
+        return len(over_timeout) / self.n_of_requests if self.n_of_requests else 0.0
+
+    def as_dict(self) -> dict[str, float]:
+        return {
+            "p50_ms": percentile(self.latencies_ms, 50),
+            "p95_ms": percentile(self.latencies_ms, 95),
+            "p99_ms": percentile(self.latencies_ms, 99),
+            "error_rate": self.error_rate,
+            "timeout_rate": self.timeout_rate,
+            "requests_per_s": self.n_of_requests / self.duration_s if self.duration_s else 0.0,
+        }
+
+
+class WebhookServer:
+    """Serves the handle-call endpoint of `call_handler` on localhost in a background thread."""
+
+    def __init__(self, call_handler: IncomingCallHandler):
+        app = FlaskAppWrapper(Flask(__name__))
+        call_handler.add_endpoints(app)
+        self._server = make_server("127.0.0.1", 0, app.app, threaded=True)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}{HANDLE_CALL_PATH}"
+
+    def __enter__(self) -> "WebhookServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self._server.shutdown()
+
+
+def _twilio_config(phone_numbers: dict[str, str], async_mode: bool = False) -> Twilio:
+    config = BENCHMARK_TWILIO_CONFIG.model_copy(deep=True)
+    config.call_handling.allowed_incoming_phone_numbers = phone_numbers
+    config.call_handling.async_mode = async_mode
+    return config
+
+
+def _create_call_handler(api: MockApi, twilio_config: Twilio) -> IncomingCallHandler:
+    call_handler = IncomingCallHandler(
+        twilio_config=twilio_config,
+        server_config=HTTPServer(port=8080),
+        api_client=ApiClient(Configuration(host="http://example.com", api_key={'APIKeyAuth': "benchmark"})),
+        allow_http=True
+    )
+    call_handler.car_api = api
+    call_handler.car_state_api = api
+    call_handler.car_action_api = api
+    return call_handler
+
+
+def _send_signed_request(url: str, validator: RequestValidator, phone_number: str) -> tuple[float, bool]:
+    """Send a request signed as Twilio would sign it. Return the latency in ms and whether it failed."""
+    params = {
+        "CallSid": f"CA{random.getrandbits(128):032x}",
+        "From": phone_number,
+        "To": BENCHMARK_TWILIO_CONFIG.from_number,
+    }
+    # The handler validates https URLs when HTTP is allowed, because Twilio signs the public URL
+    signature = validator.compute_signature(url.replace("http://", "https://"), params)
+    request = urllib.request.Request(
+        url,
+        data=urllib.parse.urlencode(params).encode(),
+        headers={"X-Twilio-Signature": signature},
+        method="POST",
+    )
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=2 * TWILIO_WEBHOOK_TIMEOUT_S) as response:
+            failed = ERROR_MESSAGE in response.read().decode()
+    except (urllib.error.URLError, TimeoutError):
+        failed = True
+    return (time.perf_counter() - start) * 1000, failed
+
+
+def run(
+    concurrency: int,
+    n_of_requests: int,
+    n_of_cars: int,
+    transition_delay_s: float,
+    request_latency_s: float,
+    async_mode: bool = False,
+) -> LoadResult:
+    """Send `n_of_requests` requests from `concurrency` concurrent clients, every request calling
+    about a random car. In the async mode, only the acknowledgment of the calls is measured."""
+    notifications_db.initialize_db(
+        Database.Connection(location="_", database_name="_", username="_", password="_", port=0),
+        test=True
+    )
+    api = MockApi(latency_s=request_latency_s, transition_delay_s=transition_delay_s)
+    cars, car_states, car_action_states = fleet_of_cars(n_of_cars)
+    api._set_cars(cars)
+    api._set_car_states(car_states)
+    api._set_car_action_states(car_action_states)
+    phone_numbers = {f"+420222{car.id:06d}": car.name for car in cars}
+    twilio_config = _twilio_config(phone_numbers, async_mode)
+    validator = RequestValidator(twilio_config.auth_token)
+
+    with WebhookServer(_create_call_handler(api, twilio_config)) as server:
+        callers = [random.choice(list(phone_numbers)) for _ in range(n_of_requests)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(lambda phone: _send_signed_request(server.url, validator, phone), callers))
+        duration_s = time.perf_counter() - start
+
+    return LoadResult(
+        concurrency=concurrency,
+        latencies_ms=[latency for latency, _ in results],
+        n_of_errors=sum(1 for _, failed in results if failed),
+        duration_s=duration_s,
+    )
+
+
+def configure_parser(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=CONCURRENCY_LEVELS, help="Numbers of concurrent callers."
+    )
+    parser.add_argument("--requests", type=int, default=100, help="Number of requests per concurrency level.")
+    parser.add_argument("--cars", type=int, default=20, help="Number of cars the callers pause and unpause.")
+    parser.add_argument("--transition-delay", type=float, default=0.5,
+                        help="Seconds until a car reports the requested state.")
+    parser.add_argument("--api-latency", type=float, default=0.01,
+                        help="Seconds every Fleet Management API request takes.")
+    parser.add_argument("--async-mode", action="store_true",
+                        help="Acknowledge the calls immediately and pause the cars in the background.")
+
+
+def main(args: argparse.Namespace) -> bool:
+    """Run the load test and print the results. Return False if any regression threshold is violated."""
+    thresholds = load_thresholds("webhook_load")
+    passed = True
+    print(f"{'callers':>8} {'requests':>9} {'req/s':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'errors':>7} {'>15 s':>7}")
+    for concurrency in args.concurrency:
+        result = run(concurrency, args.requests, args.cars, args.transition_delay, args.api_latency,
+                     args.async_mode)
+        values = result.as_dict()
+        print(f"{concurrency:>8} {result.n_of_requests:>9} {values['requests_per_s']:>7.1f} "
+              f"{values['p50_ms']:>9.0f} {values['p95_ms']:>9.0f} {values['p99_ms']:>9.0f} "
+              f"{values['error_rate']:>7.1%} {values['timeout_rate']:>7.1%}")
+        for violation in check_thresholds(values, thresholds.get(str(concurrency), thresholds.get("default", {}))):
+            print(f"  REGRESSION: {violation}")
+            passed = False
+    return passed
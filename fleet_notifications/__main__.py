@@ -4,32 +4,63 @@ import fleet_notifications.script_args as _args
 
 from fleet_notifications.database.database_controller import initialize_db
 from fleet_notifications.state_checker import OrderStateChecker
+from fleet_notifications.single_flight_api import configure_single_flight
+from fleet_notifications.notifications_client import NotificationClient
+from fleet_notifications.notification_dispatcher import NotificationDispatcher
 from fleet_notifications.incoming_call_endpoint import IncomingCallHandler
+from fleet_notifications.health import HealthMonitor
+from fleet_notifications.lifecycle import LifecycleManager
+from fleet_notifications.config_reload import ConfigReloader
 from fleet_notifications.logs import configure_logging
+from fleet_notifications.tracing import configure_tracing
+from fleet_notifications.profiling import configure_profiling, install_signal_handler
 from fleet_management_http_client_python import ApiClient, Configuration # type: ignore
 
 
+COMPONENT_NAME = "Fleet Notifications"
+
+
 def main():
     args = _args.request_and_get_script_arguments("Run the Fleet notifications script.")
 
     try:
-        configure_logging("Fleet Notifications", args.config)
+        configure_logging(COMPONENT_NAME, args.config)
     except Exception as e:
         print(f"Error when configuring logging: {e}")
         sys.exit(1)
 
     config = args.config
-    initialize_db(config.database.connection)
-    api_client = ApiClient(Configuration(
-        host=str(config.fleet_management_server.base_uri),
-        api_key={'APIKeyAuth': config.fleet_management_server.api_key}
-    ))
-
-    state_checker = OrderStateChecker(config.twilio, api_client)
-    state_checker.start_thread()
-    incoming_call_handler = IncomingCallHandler(config.twilio, config.http_server, api_client,
+    configure_tracing(config.tracing)
+    configure_profiling(config.profiling)
+    install_signal_handler()
+    servers = config.fleet_management_servers
+    initialize_db(config.database.connection, sites=[server.name for server in servers])
+    api_clients = []
+    for server in servers:
+        api_client = ApiClient(Configuration(host=str(server.base_uri), api_key={'APIKeyAuth': server.api_key}))
+        configure_single_flight(api_client, server.single_flight_ttl_s)
+        api_clients.append(api_client)
+
+    # All sites share the Twilio client with its rate limits and the notification workers
+    dispatcher = NotificationDispatcher(NotificationClient(config.twilio), config.twilio.notifications.dispatcher)
+    state_checkers = [
+        OrderStateChecker(config.twilio, api_client, dispatcher, server.long_poll, server.name, config.order_snapshot)
+        for server, api_client in zip(servers, api_clients)
+    ]
+    health_monitor = HealthMonitor(state_checkers, config.health)
+    incoming_call_handler = IncomingCallHandler(config.twilio, config.http_server, api_clients,
                                                 args.argvals["allow_http"])
-    incoming_call_handler.run_app()
+    config_reloader = ConfigReloader(
+        COMPONENT_NAME, args.config_path, args.argvals, config, incoming_call_handler, dispatcher.notification_client
+    )
+    lifecycle = LifecycleManager(
+        state_checkers, incoming_call_handler.create_server(health_monitor, config_reloader), config.shutdown
+    )
+
+    health_monitor.start()
+    lifecycle.install_signal_handlers()
+    config_reloader.install_signal_handler()
+    lifecycle.run()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,134 @@
+import abc, threading
+import time as _time
+
+
+class Clock(abc.ABC):
+    """Source of the time for the timeouts, delays and timestamps of the service.
+
+    The components read the time and wait through the clock set by `set_clock` instead of the `time` module,
+    so the tests and simulations can run them on a virtual or accelerated time."""
+
+    @abc.abstractmethod
+    def time(self) -> float:
+        """Seconds since the epoch."""
+
+    @abc.abstractmethod
+    def monotonic(self) -> float:
+        """Seconds of a clock that never goes back, for measuring durations."""
+
+    @abc.abstractmethod
+    def sleep(self, seconds: float) -> None:
+        """Block for the given number of seconds."""
+
+    @abc.abstractmethod
+    def wait(self, event: threading.Event, timeout_s: float | None) -> bool:
+        """Wait until the event is set or the timeout elapses. Returns True if the event is set."""
+
+
+class SystemClock(Clock):
+    """The real time."""
+
+    def time(self) -> float:
+        return _time.time()
+
+    def monotonic(self) -> float:
+        return _time.monotonic()
+
+    def sleep(self, seconds: float) -> None:
+        _time.sleep(seconds)
+
+    def wait(self, event: threading.Event, timeout_s: float | None) -> bool:
+        return event.wait(timeout_s)
+
+
+class ScaledClock(Clock):
+    """The real time running `factor` times faster, from the moment the clock was created.
+
+    The whole service can be run on it, e.g. to simulate a day of a fleet in minutes. The requests
+    to the APIs still take their real time."""
+
+    def __init__(self, factor: float):
+        if factor <= 0:
+            raise ValueError("The factor of the clock must be positive.")
+        self.factor = factor
+        self._origin_time = _time.time()
+        self._origin_monotonic = _time.monotonic()
+
+    def time(self) -> float:
+        return self._origin_time + self._elapsed_s()
+
+    def monotonic(self) -> float:
+        return self._origin_monotonic + self._elapsed_s()
+
+    def sleep(self, seconds: float) -> None:
+        _time.sleep(max(0.0, seconds) / self.factor)
+
+    def wait(self, event: threading.Event, timeout_s: float | None) -> bool:
+        return event.wait(None if timeout_s is None else max(0.0, timeout_s) / self.factor)
+
+    def _elapsed_s(self) -> float:
+        return (_time.monotonic() - self._origin_monotonic) * self.factor
+
+
+class VirtualClock(Clock):
+    """Time that moves only when it is advanced. Sleeping advances the clock instead of blocking, so
+    the code waiting for a timeout runs instantly and deterministically in the tests."""
+
+    def __init__(self, start_time: float = 0.0):
+        self._time = start_time
+        self._lock = threading.Lock()
+
+    def time(self) -> float:
+        with self._lock:
+            return self._time
+
+    def monotonic(self) -> float:
+        return self.time()
+
+    def advance(self, seconds: float) -> None:
+        with self._lock:
+            self._time += max(0.0, seconds)
+
+    def sleep(self, seconds: float) -> None:
+        self.advance(seconds)
+
+    def wait(self, event: threading.Event, timeout_s: float | None) -> bool:
+        if timeout_s is None:
+            return event.wait()
+        if not event.is_set():
+            self.advance(timeout_s)
+        return event.is_set()
+
+
+_clock: Clock = SystemClock()
+
+
+def get_clock() -> Clock:
+    return _clock
+
+
+def set_clock(clock: Clock) -> Clock:
+    """Use the clock in all components. Returns the previously used clock."""
+    global _clock
+    previous, _clock = _clock, clock
+    return previous
+
+
+def time() -> float:
+    """Seconds since the epoch on the current clock."""
+    return _clock.time()
+
+
+def monotonic() -> float:
+    """Monotonic seconds on the current clock."""
+    return _clock.monotonic()
+
+
+def sleep(seconds: float) -> None:
+    """Sleep on the current clock."""
+    _clock.sleep(seconds)
+
+
+def wait(event: threading.Event, timeout_s: float | None) -> bool:
+    """Wait for the event on the current clock. Returns True if the event is set."""
+    return _clock.wait(event, timeout_s)
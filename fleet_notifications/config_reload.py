@@ -0,0 +1,149 @@
+import logging, signal, threading
+from typing import Any, NamedTuple
+
+from flask import jsonify
+
+from fleet_notifications.incoming_call_endpoint import FlaskAppWrapper, IncomingCallHandler
+from fleet_notifications.notifications_client import NotificationClient
+from fleet_notifications.script_args import load_script_config
+from fleet_notifications.script_args.configs import ScriptConfig
+from fleet_notifications.logs import LOGGER_NAME, configure_logging
+
+
+# Settings applied without a restart; changes of the other settings take effect after the restart
+RELOADABLE_SETTINGS = (
+    "logging",
+    "twilio.notifications.play_sound_url",
+    "twilio.notifications.repeated_calls",
+    "twilio.notifications.call_status_timeout_s",
+    "twilio.call_handling.allowed_incoming_phone_numbers",
+)
+logger = logging.getLogger(LOGGER_NAME)
+
+
+class ReloadResult(NamedTuple):
+    """Names of the changed settings, e.g. `twilio.notifications.repeated_calls`."""
+    reloaded: list[str]
+    restart_required: list[str]
+
+
+class ConfigReloader:
+    """Reloads the configuration file on SIGHUP or on a request to the admin endpoint.
+
+    The file is validated as on the start of the service. If it is valid, the changed logging handlers,
+    notification settings and the allowlist of the callers are replaced, while the state checkers and
+    the HTTP server keep running. Changes of the other settings are only reported."""
+
+    def __init__(
+        self,
+        component_name: str,
+        config_path: str,
+        argvals: dict[str, Any],
+        config: ScriptConfig,
+        call_handler: IncomingCallHandler,
+        notification_client: NotificationClient
+    ):
+        self._component_name = component_name
+        self._config_path = config_path
+        self._argvals = argvals
+        # Dump of the running configuration, i.e. the configuration of the start with the reloaded settings;
+        # settings requiring a restart keep their running values, so their changes are reported until the restart
+        self._running_settings = config.model_dump()
+        self._call_handler = call_handler
+        self._notification_client = notification_client
+        self.admin_api_key = config.http_server.admin_api_key
+        self._lock = threading.Lock()
+
+
+    def reload(self) -> ReloadResult:
+        """Load the configuration file and apply the changed settings. Raises an exception if the file
+        cannot be loaded or is not valid; nothing is changed in that case."""
+        with self._lock:
+            config = load_script_config(self._config_path, self._argvals)
+            new_settings = config.model_dump()
+            changed = _changed_settings(self._running_settings, new_settings)
+            result = ReloadResult(
+                reloaded=[name for name in changed if _is_reloadable(name)],
+                restart_required=[name for name in changed if not _is_reloadable(name)]
+            )
+            if "logging" in result.reloaded:
+                configure_logging(self._component_name, config)
+            if any(name.startswith("twilio.notifications.") for name in result.reloaded):
+                self._notification_client.update_settings(config.twilio.notifications)
+            if "twilio.call_handling.allowed_incoming_phone_numbers" in result.reloaded:
+                self._call_handler.update_allowlist(config.twilio.call_handling.allowed_incoming_phone_numbers)
+            for name in result.reloaded:
+                _set_setting(self._running_settings, name, _get_setting(new_settings, name))
+        logger.info("Configuration reloaded, changed settings: %s.", ", ".join(result.reloaded) or "none")
+        if result.restart_required:
+            logger.warning(
+                "Changes of these settings take effect after a restart: %s.", ", ".join(result.restart_required)
+            )
+        return result
+
+
+    def install_signal_handler(self) -> None:
+        """Reload the configuration on SIGHUP. Must be called from the main thread."""
+        signal.signal(signal.SIGHUP, self._on_signal)
+
+
+    def add_endpoints(self, app: FlaskAppWrapper) -> None:
+        """Register the reload endpoint in the app, if the admin API key is set."""
+        if self.admin_api_key:
+            app.add_endpoint(
+                "/v2/notifications/admin/reload-config", "reload_config", self._reload_config, methods=['POST']
+            )
+
+
+    def _on_signal(self, signum: int, frame) -> None:
+        # The reload logs and takes locks, so it must not run in the signal handler
+        threading.Thread(target=self._reload_logging_errors, name="config-reload").start()
+
+
+    def _reload_logging_errors(self) -> None:
+        try:
+            self.reload()
+        except Exception as e:
+            logger.error("Configuration not reloaded: %s", e)
+
+
+    @IncomingCallHandler._validate_admin_request
+    def _reload_config(self):
+        try:
+            return jsonify(self.reload()._asdict())
+        except Exception as e:
+            logger.error("Configuration not reloaded: %s", e)
+            return jsonify({"error": str(e)}), 400
+
+
+def _is_reloadable(name: str) -> bool:
+    return any(name == setting or name.startswith(setting + ".") for setting in RELOADABLE_SETTINGS)
+
+
+def _get_setting(settings: dict[str, Any], name: str) -> Any:
+    for key in name.split("."):
+        settings = settings.get(key) if isinstance(settings, dict) else None
+    return settings
+
+
+def _set_setting(settings: dict[str, Any], name: str, value: Any) -> None:
+    *path, last = name.split(".")
+    for key in path:
+        settings = settings.setdefault(key, {})
+    settings[last] = value
+
+
+def _changed_settings(old: dict[str, Any], new: dict[str, Any], prefix: str = "") -> list[str]:
+    """Names of the settings with different values in the dumps of two configurations. The reloadable
+    settings are reported as a whole, e.g. `logging` instead of the level of its console handler."""
+    changed = []
+    for key in sorted(old.keys() | new.keys()):
+        name = prefix + key
+        old_value, new_value = old.get(key), new.get(key)
+        if old_value == new_value:
+            continue
+        if isinstance(old_value, dict) and isinstance(new_value, dict) and name not in RELOADABLE_SETTINGS:
+            changed.extend(_changed_settings(old_value, new_value, name + "."))
+        else:
+            changed.append(name)
+    return changed
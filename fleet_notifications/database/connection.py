@@ -1,6 +1,6 @@
 from typing import Optional, Callable
 from sqlalchemy import create_engine, Engine
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import StaticPool
 
 _connection_source: Optional[Engine] = None
 
@@ -17,10 +17,6 @@ class InvalidConnectionArguments(Exception):
     pass
 
 
-class Base(DeclarativeBase):
-    pass
-
-
 def get_connection_source() -> Engine:
     """Return the SQLAlchemy engine object used to connect to the database and
     raise exception if the engine object was not set yet.
@@ -55,26 +51,21 @@ def set_db_connection(
     )
     _connection_source = source
     assert _connection_source is not None
-    create_all_tables(source)
     for foo in after_connect:
         foo()
 
 
 def set_test_db_connection(dblocation: str = "", db_name: str = "") -> None:
     """Create test SQLAlchemy engine object used to connect to the database using SQLite.
-    No username or password required.
+    No username or password required. An in-memory database is shared by all threads.
     Set module-level variable _connection_source to the new engine object."""
     global _connection_source
     source = _new_connection_source(
-        dialect="sqlite", dbapi="pysqlite", dblocation=dblocation, db_name=db_name
+        dialect="sqlite", dbapi="pysqlite", dblocation=dblocation, db_name=db_name,
+        poolclass=StaticPool, connect_args={"check_same_thread": False}
     )
     _connection_source = source
     assert _connection_source is not None
-    create_all_tables(source)
-
-
-def create_all_tables(source: Engine) -> None:
-    Base.metadata.create_all(source)
 
 
 def _new_connection_source(
@@ -4,22 +4,61 @@ from fleet_notifications.database.connection import (
     set_db_connection,
     set_test_db_connection
 )
-from sqlalchemy import MetaData ,Table, Column, Integer, BigInteger
+from fleet_notifications.database.time import timestamp
+from typing import Iterable, NamedTuple
+from sqlalchemy import MetaData ,Table, Column, Integer, BigInteger, Boolean, String, inspect, select
 from sqlalchemy.dialects.postgresql import insert
 from fleet_management_http_client_python import Order # type: ignore
 
 
 _meta = MetaData()
-_orders = Table(
-    'orders', _meta,
+
+
+def _new_orders_table(name: str) -> Table:
+    return Table(
+        name, _meta,
+        Column('id', Integer, primary_key=True),
+        Column('order_id', Integer, unique=True),
+        Column('car_id', Integer),
+        Column('timestamp', BigInteger)
+    )
+
+
+_orders = _new_orders_table('orders')
+_site_orders = {"": _orders}
+_pending_notifications = Table(
+    'pending_notifications', _meta,
     Column('id', Integer, primary_key=True),
-    Column('order_id', Integer, unique=True),
-    Column('car_id', Integer),
-    Column('timestamp', BigInteger)
+    Column('phone_number', String),
+    Column('under_test', Boolean),
+    Column('priority', String),
+    Column('origin_timestamp', BigInteger, nullable=True)
+)
+_handled_calls = Table(
+    'handled_calls', _meta,
+    Column('call_sid', String, primary_key=True),
+    Column('handled_at', BigInteger, index=True),
+    Column('response', String, nullable=True)
 )
 
 
-def initialize_db(connection: _db_args.Connection, test=False) -> None:
+class PendingNotification(NamedTuple):
+    """Notification that was not placed before the service stopped."""
+    phone_number: str
+    under_test: bool
+    priority: str
+    origin_timestamp: int | None
+
+
+def _orders_table(site: str) -> Table:
+    """Table of the unfinished orders of the site. Orders of the unnamed site are in the `orders` table,
+    so a single-site setup keeps using it."""
+    if site not in _site_orders:
+        _site_orders[site] = _new_orders_table(f'orders_{site}')
+    return _site_orders[site]
+
+
+def initialize_db(connection: _db_args.Connection, test=False, sites: Iterable[str] = ("",)) -> None:
     if test:
         set_test_db_connection(
             dblocation = "",
@@ -33,17 +72,24 @@ def initialize_db(connection: _db_args.Connection, test=False) -> None:
             db_name = connection.database_name
         )
     try:
-        print("Creating orders table")
         with get_connection_source().begin() as conn:
-            _meta.create_all(conn, tables=[_orders])
+            # A single query lists the existing tables, instead of a query per table made by `create_all`
+            existing_tables = set(inspect(conn).get_table_names())
+            missing_tables = [
+                table for table in (*(_orders_table(site) for site in sites), _pending_notifications, _handled_calls)
+                if table.name not in existing_tables
+            ]
+            if missing_tables:
+                print("Creating tables: " + ", ".join(table.name for table in missing_tables))
+                _meta.create_all(conn, tables=missing_tables, checkfirst=False)
     except Exception as e:
         print(e)
 
 
-def update_order(order_id: int, car_id: int, timestamp: int) -> None:
+def update_order(order_id: int, car_id: int, timestamp: int, site: str = "") -> None:
     try:
         with get_connection_source().begin() as conn:
-            update = insert(_orders).values(order_id=order_id, car_id=car_id, timestamp=timestamp)
+            update = insert(_orders_table(site)).values(order_id=order_id, car_id=car_id, timestamp=timestamp)
             update = update.on_conflict_do_update(
                 index_elements=['order_id'],
                 set_=dict(car_id=car_id, timestamp=timestamp)
@@ -53,18 +99,19 @@ def update_order(order_id: int, car_id: int, timestamp: int) -> None:
         print(e)
 
 
-def delete_order(order_id: int) -> None:
+def delete_order(order_id: int, site: str = "") -> None:
     try:
+        orders = _orders_table(site)
         with get_connection_source().begin() as conn:
-            conn.execute(_orders.delete().where(_orders.c.order_id == order_id))
+            conn.execute(orders.delete().where(orders.c.order_id == order_id))
     except Exception as e:
         print(e)
 
 
-def get_orders() -> list[Order]:
+def get_orders(site: str = "") -> list[Order]:
     try:
         with get_connection_source().begin() as conn:
-            result = conn.execute(_orders.select())
+            result = conn.execute(_orders_table(site).select())
             orders = result.fetchall()
             ret_list = []
             for order in orders:
@@ -78,4 +125,85 @@ def get_orders() -> list[Order]:
             return ret_list
     except Exception as e:
         print(e)
-        return []
\ No newline at end of file
+        return []
+
+
+def add_pending_notifications(notifications: list[PendingNotification]) -> None:
+    if not notifications:
+        return
+    try:
+        with get_connection_source().begin() as conn:
+            conn.execute(_pending_notifications.insert(), [
+                notification._asdict() for notification in notifications
+            ])
+    except Exception as e:
+        print(e)
+
+
+def pop_pending_notifications() -> list[PendingNotification]:
+    """Return the pending notifications and remove them from the database."""
+    try:
+        with get_connection_source().begin() as conn:
+            result = conn.execute(_pending_notifications.select().order_by(_pending_notifications.c.id))
+            notifications = [
+                PendingNotification(row.phone_number, row.under_test, row.priority, row.origin_timestamp)
+                for row in result.fetchall()
+            ]
+            conn.execute(_pending_notifications.delete())
+            return notifications
+    except Exception as e:
+        print(e)
+        return []
+
+
+def is_connected() -> bool:
+    """Return True if a query can be run on the database."""
+    try:
+        with get_connection_source().connect() as conn:
+            conn.execute(select(1))
+        return True
+    except Exception:
+        return False
+
+
+def claim_call(call_sid: str, ttl_s: float, claim_timeout_s: float | None = None) -> bool:
+    """Record that the call is being handled. Return False if the call was already claimed in the last `ttl_s`
+    seconds, possibly by another process. Claims older than `ttl_s` are removed, and so are claims without
+    a response older than `claim_timeout_s`, left by a process that stopped while handling the call, so the call
+    can be claimed again. If the database is not available, the call is considered not claimed, so it is handled."""
+    try:
+        with get_connection_source().begin() as conn:
+            now = timestamp()
+            expired = _handled_calls.c.handled_at < now - ttl_s * 1000
+            if claim_timeout_s is not None:
+                expired = expired | (
+                    _handled_calls.c.response.is_(None) & (_handled_calls.c.handled_at < now - claim_timeout_s * 1000)
+                )
+            conn.execute(_handled_calls.delete().where(expired))
+            claim = insert(_handled_calls).values(call_sid=call_sid, handled_at=now, response=None)
+            return conn.execute(claim.on_conflict_do_nothing(index_elements=['call_sid'])).rowcount == 1
+    except Exception as e:
+        print(e)
+        return True
+
+
+def save_call_response(call_sid: str, response: str) -> None:
+    try:
+        with get_connection_source().begin() as conn:
+            conn.execute(
+                _handled_calls.update().where(_handled_calls.c.call_sid == call_sid).values(response=response)
+            )
+    except Exception as e:
+        print(e)
+
+
+def get_call_response(call_sid: str) -> str | None:
+    """Return the response to the claimed call, or None if the call is still being handled or was not claimed."""
+    try:
+        with get_connection_source().begin() as conn:
+            return conn.execute(
+                select(_handled_calls.c.response).where(_handled_calls.c.call_sid == call_sid)
+            ).scalar_one_or_none()
+    except Exception as e:
+        print(e)
+        return None
\ No newline at end of file
@@ -1,12 +1,12 @@
-from time import time
+from fleet_notifications import clock
 
 
 def _time_in_ms() -> int:
     """Time in miliseconds."""
-    return int(time() * 1000)  # pragma: no cover
+    return int(clock.time() * 1000)  # pragma: no cover
 
 
 
 def timestamp() -> int:
     """Timestamp in milliseconds."""
-    return _time_in_ms()
\ No newline at end of file
+    return _time_in_ms()
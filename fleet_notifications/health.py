@@ -0,0 +1,110 @@
+import logging, threading, time
+
+from flask import jsonify
+
+import fleet_notifications.database.database_controller as notifications_db
+from fleet_notifications import clock
+from fleet_notifications.state_checker import OrderStateChecker
+from fleet_notifications.incoming_call_endpoint import FlaskAppWrapper
+from fleet_notifications.script_args.configs import Health
+from fleet_notifications.logs import LOGGER_NAME
+
+
+logger = logging.getLogger(LOGGER_NAME)
+
+
+class HealthMonitor:
+    """Reports the liveness and readiness of the service for orchestrators.
+
+    The reports are built from the progress recorded by the state checkers of all sites and from the result
+    of the last database check, which runs periodically in a background thread, so the probes never wait
+    for the API or the database."""
+
+    def __init__(self, state_checkers: OrderStateChecker | list[OrderStateChecker], config: Health):
+        self._state_checkers = state_checkers if isinstance(state_checkers, list) else [state_checkers]
+        self._max_poll_age_s = config.max_poll_age_s
+        self._max_queue_depth = config.max_queue_depth
+        self._db_check_interval_s = config.db_check_interval_s
+        self._db_connected = False
+        self._db_checked_at: float | None = None
+        self._thread = threading.Thread(target=self._check_database_periodically, daemon=True, name="health-check")
+
+
+    def start(self) -> None:
+        """Start the periodic database check."""
+        self._thread.start()
+
+
+    def report(self) -> dict[str, object]:
+        """Return the current state of the service. The state checkers are listed in the order of the sites."""
+        now = clock.monotonic()
+        return {
+            "checkers": [self._checker_report(checker, now) for checker in self._state_checkers],
+            "database_connected": self._db_connected,
+            "database_check_age_s": None if self._db_checked_at is None else round(now - self._db_checked_at, 3),
+            "queue_depth": self._state_checkers[0].dispatcher.queue_depth(),
+        }
+
+
+    def problems(self, report: dict[str, object]) -> list[str]:
+        """Return the reasons why the service is not ready to handle its work, based on the `report`."""
+        problems = []
+        for checker in report["checkers"]:  # type: ignore
+            site = f" (site '{checker['site']}')" if checker["site"] else ""
+            if not checker["alive"]:
+                problems.append(f"The state checker thread is not running{site}.")
+            poll_age_s = checker["last_poll_age_s"]
+            if poll_age_s is None or poll_age_s > self._max_poll_age_s:
+                problems.append(f"No order states were received from the Fleet Management API recently{site}.")
+        if not report["database_connected"]:
+            problems.append("The database is not available.")
+        if report["queue_depth"] > self._max_queue_depth:  # type: ignore
+            problems.append("Too many notifications are waiting to be placed.")
+        return problems
+
+
+    def _healthz(self):
+        """Liveness probe. Fails only if a state checker thread has died."""
+        report = self.report()
+        alive = all(checker["alive"] for checker in report["checkers"])  # type: ignore
+        return jsonify(report), 200 if alive else 503
+
+
+    def _readyz(self):
+        """Readiness probe. Fails if the state checker does not receive states, the database is not available
+        or the notifications are piling up."""
+        report = self.report()
+        problems = self.problems(report)
+        return jsonify({**report, "problems": problems}), 503 if problems else 200
+
+
+    def add_endpoints(self, app: FlaskAppWrapper) -> None:
+        """Register the health endpoints in the app."""
+        app.add_endpoint("/healthz", "healthz", self._healthz, methods=['GET'])
+        app.add_endpoint("/readyz", "readyz", self._readyz, methods=['GET'])
+
+
+    @staticmethod
+    def _checker_report(checker: OrderStateChecker, now: float) -> dict[str, object]:
+        return {
+            "site": checker.site,
+            "alive": checker.thread.is_alive(),
+            "consecutive_errors": checker.consecutive_errors,
+            "fleet_management_circuit": checker.long_poll.circuit_breaker.state.value,
+            "last_poll_age_s": None if checker.last_poll_at is None else round(now - checker.last_poll_at, 3),
+            "since": checker.since,
+            "since_lag_s": round(clock.time() - checker.since / 1000, 3) if checker.since else None,
+        }
+
+
+    def _check_database_periodically(self) -> None:
+        while True:
+            connected = notifications_db.is_connected()
+            if connected != self._db_connected:
+                logger.log(
+                    logging.INFO if connected else logging.WARNING,
+                    "Database is %s.", "available" if connected else "not available"
+                )
+            self._db_connected = connected
+            self._db_checked_at = clock.monotonic()
+            time.sleep(self._db_check_interval_s)
@@ -1,19 +1,27 @@
-import logging, time
+import collections, contextvars, dataclasses, hmac, logging, math, threading
 
-from flask import abort, Flask, request
+from flask import abort, Flask, jsonify, request
+from concurrent.futures import Future, ThreadPoolExecutor
 from functools import wraps
+from werkzeug.serving import BaseWSGIServer, make_server
 from twilio.twiml.voice_response import VoiceResponse # type: ignore
-from twilio.request_validator import RequestValidator # type: ignore
 from fleet_notifications.script_args.configs import Twilio, HTTPServer
-from fleet_management_http_client_python import ApiClient, CarActionApi, CarStateApi, CarActionStatus, CarStatus, CarApi # type: ignore
-from fleet_notifications.logs import LOGGER_NAME
+from fleet_management_http_client_python import ApiClient, CarActionApi, CarActionStatus, CarStatus # type: ignore
+from fleet_notifications.logs import LOGGER_NAME, log_context
+from fleet_notifications import clock, metrics, profiling
+from fleet_notifications.request_gate import RequestGate, normalize_phone_number
+from fleet_notifications.single_flight import SingleFlight
+from fleet_notifications.single_flight_api import SingleFlightCarApi, SingleFlightCarStateApi
+import fleet_notifications.database.database_controller as notifications_db
 
 
 WAITING_TIME_PERIOD = 1
+ADMIN_API_KEY_HEADER = "X-Admin-Api-Key"
+RESPONSE_POLL_INTERVAL = 0.2
+CALL_STATUS_PATH = "/v2/notifications/handle-call/status"
+CALL_STATUS_POLL_INTERVAL = 2
 logger = logging.getLogger(LOGGER_NAME)
 
-flask_app = Flask(__name__)
-
 
 class InvalidCarName(Exception):
     pass
@@ -21,6 +29,28 @@ class InvalidCarName(Exception):
 class StateSwitchTimeout(Exception):
     pass
 
+class CallInProgress(Exception):
+    pass
+
+
+@dataclasses.dataclass
+class _Site:
+    """APIs of a site whose cars can be paused by the callers."""
+    car_api: SingleFlightCarApi
+    car_state_api: SingleFlightCarStateApi
+    car_action_api: CarActionApi
+    # Callers asking about a car in transition get the outcome of the transition in progress
+    car_transitions: SingleFlight[int, str]
+
+    @classmethod
+    def create(cls, api_client: ApiClient) -> "_Site":
+        return cls(
+            SingleFlightCarApi(api_client),
+            SingleFlightCarStateApi(api_client),
+            CarActionApi(api_client),
+            SingleFlight[int, str](name="car_transition")
+        )
+
 
 class FlaskAppWrapper(object):
     def __init__(self, app, **configs):
@@ -39,69 +69,182 @@ class FlaskAppWrapper(object):
 
 
 class IncomingCallHandler:
-    def __init__(self, twilio_config: Twilio, server_config: HTTPServer, api_client: ApiClient, allow_http: bool):
+    def __init__(
+        self,
+        twilio_config: Twilio,
+        server_config: HTTPServer,
+        api_client: ApiClient | list[ApiClient],
+        allow_http: bool
+    ):
+        """If API clients of more sites are given, the car of the caller is searched for on all sites
+        and the car is paused through the API of the site it was found on."""
+        api_clients = api_client if isinstance(api_client, list) else [api_client]
         self.twilio_auth_token = twilio_config.auth_token
         self.allowed_incoming_phone_numbers = twilio_config.call_handling.allowed_incoming_phone_numbers
+        self._car_names = self._index_car_names(self.allowed_incoming_phone_numbers)
+        self.request_gate = RequestGate(
+            self.twilio_auth_token, self.allowed_incoming_phone_numbers, twilio_config.call_handling.request_gate
+        )
+        self.idempotency_ttl_s = twilio_config.call_handling.idempotency.ttl_s
+        self.duplicate_wait_s = twilio_config.call_handling.idempotency.wait_s
+        self._handled_calls = SingleFlight[str, str](ttl_s=self.idempotency_ttl_s, name="handle_call")
+        self._duplicate_calls = metrics.counter("handle_call_duplicates")
         self.action_timeout_s = twilio_config.call_handling.car_action_change_timeout_s
-        self.car_action_api = CarActionApi(api_client)
-        self.car_state_api = CarStateApi(api_client)
-        self.car_api = CarApi(api_client)
+        self.async_mode = twilio_config.call_handling.async_mode
+        self._call_jobs_executor = ThreadPoolExecutor(
+            max_workers=twilio_config.call_handling.async_workers, thread_name_prefix="call-job"
+        )
+        self._call_jobs: collections.OrderedDict[str, tuple[float, Future[str]]] = collections.OrderedDict()
+        self._call_jobs_lock = threading.Lock()
+        # A call is handled within two transitions of the car, or the wait for another process handling the call;
+        # a claim without a response after that was left by a process that stopped and the call is claimed again
+        self._claim_timeout_s = 2 * self.action_timeout_s + self.duplicate_wait_s
+        self._max_call_status_polls = math.ceil(self._claim_timeout_s / CALL_STATUS_POLL_INTERVAL) + 1
+        self._sites = [_Site.create(site_api_client) for site_api_client in api_clients]
         self.server_port = server_config.port
+        self.admin_api_key = server_config.admin_api_key
         self.allow_http = allow_http
+        if allow_http and not twilio_config.call_handling.request_gate.client_address_header:
+            logger.warning(
+                "HTTP is allowed for a service behind a proxy, but the client address header of the request gate "
+                "is not set; all requests to the handle-call endpoint share the rate limit of the proxy address."
+            )
+
+
+    # The APIs of the first site, which is the only one if a single API client is given
+    @property
+    def car_api(self) -> SingleFlightCarApi:
+        return self._sites[0].car_api
+
+    @car_api.setter
+    def car_api(self, car_api: SingleFlightCarApi) -> None:
+        self._sites[0].car_api = car_api
+
+    @property
+    def car_state_api(self) -> SingleFlightCarStateApi:
+        return self._sites[0].car_state_api
+
+    @car_state_api.setter
+    def car_state_api(self, car_state_api: SingleFlightCarStateApi) -> None:
+        self._sites[0].car_state_api = car_state_api
+
+    @property
+    def car_action_api(self) -> CarActionApi:
+        return self._sites[0].car_action_api
+
+    @car_action_api.setter
+    def car_action_api(self, car_action_api: CarActionApi) -> None:
+        self._sites[0].car_action_api = car_action_api
+
+
+    def update_allowlist(self, allowed_incoming_phone_numbers: dict[str, str]) -> None:
+        """Replace the phone numbers allowed to call and the names of their cars. The calls being handled
+        keep the car they were assigned."""
+        self.allowed_incoming_phone_numbers = allowed_incoming_phone_numbers
+        self._car_names = self._index_car_names(allowed_incoming_phone_numbers)
+        self.request_gate.set_allowed_phone_numbers(allowed_incoming_phone_numbers)
+
+
+    @staticmethod
+    def _index_car_names(allowed_incoming_phone_numbers: dict[str, str]) -> dict[str, str]:
+        return {
+            normalize_phone_number(phone_number): car_name
+            for phone_number, car_name in allowed_incoming_phone_numbers.items()
+        }
 
 
-    def _car_action_status_occurred(self, awaited_statuses: set[CarActionStatus], car_id: int) -> bool:
+    def _car_action_status_occurred(
+        self, awaited_statuses: set[CarActionStatus], car_id: int, site: _Site | None = None
+    ) -> bool:
         """Wait for the action status of the car with ID equal to car_id to change to one of the specified statuses.
         The set of awaited statuses must not be empty. Return True if the awaited status occured before timeout,
-        False otherwise."""
+        False otherwise. The car belongs to the `site`, the first site by default."""
+        site = site or self._sites[0]
         timeout_count = 0
-        while self.car_action_api.get_car_action_states(car_id, last_n=1)[0].action_status not in awaited_statuses:
-            time.sleep(WAITING_TIME_PERIOD)
+        while site.car_action_api.get_car_action_states(car_id, last_n=1)[0].action_status not in awaited_statuses:
+            clock.sleep(WAITING_TIME_PERIOD)
             timeout_count += WAITING_TIME_PERIOD
             if timeout_count > self.action_timeout_s:
                 return False
         return True
 
 
-    def _car_status_occured(self, awaited_statuses: set[CarStatus], car_id: int) -> bool:
+    def _car_status_occured(self, awaited_statuses: set[CarStatus], car_id: int, site: _Site | None = None) -> bool:
         """Wait for the status of the car with ID equal to car_id to change to one of the specified statuses.
         The set of awaited statuses must not be empty. Return True if the awaited status occured before timeout,
-        False otherwise."""
+        False otherwise. The car belongs to the `site`, the first site by default."""
+        site = site or self._sites[0]
         timeout_count = 0
-        while self.car_state_api.get_car_states(car_id, last_n=1)[0].status not in awaited_statuses:
-            time.sleep(WAITING_TIME_PERIOD)
+        while site.car_state_api.get_car_states(car_id, last_n=1)[0].status not in awaited_statuses:
+            clock.sleep(WAITING_TIME_PERIOD)
             timeout_count += WAITING_TIME_PERIOD
             if timeout_count > self.action_timeout_s:
                 return False
         return True
 
 
-    def _get_car_id_from_name(self, name: str) -> int:
-        """Get the car ID from its name"""
-        for car in self.car_api.get_cars():
+    def _get_car_id_from_name(self, name: str, site: _Site | None = None) -> int:
+        """Get the car ID from its name on the `site`, the first site by default."""
+        for car in (site or self._sites[0]).car_api.get_cars():
             if car.name == name:
                 return car.id
         raise InvalidCarName(f"Car with name: {name} not found.")
 
 
+    def _find_car(self, name: str) -> tuple[int, _Site]:
+        """Get the car ID from its name and the site the car belongs to. The car is searched for on all sites;
+        if more sites have a car with the name, it is not known which car the caller means, so none is returned."""
+        found = []
+        for site in self._sites:
+            try:
+                found.append((self._get_car_id_from_name(name, site), site))
+            except InvalidCarName:
+                continue
+        if not found:
+            raise InvalidCarName(f"Car with name: {name} not found.")
+        if len(found) > 1:
+            raise InvalidCarName(f"Car with name: {name} found on {len(found)} sites, the car names must be unique.")
+        return found[0]
+
+
+    @staticmethod
+    def _validate_twilio_request(f=None, *, limit_rate: bool = True):
+        """Validates that incoming requests genuinely originated from Twilio. The rate of requests
+        from a single source is limited unless `limit_rate` is False."""
+        def decorator(f):
+            @wraps(f)
+            def decorated_function(*args, **kwargs):
+                call_handler = args[0]
+                url = request.url
+                if call_handler.allow_http:
+                    url = url.replace('http://', 'https://')
+                rejection = call_handler.request_gate.check(
+                    url,
+                    request.form,
+                    request.values,
+                    request.headers.get('X-Twilio-Signature', ''),
+                    call_handler.request_gate.client_address(request.remote_addr or '', request.headers),
+                    limit_rate=limit_rate)
+                if rejection is None:
+                    return f(*args, **kwargs)
+                else:
+                    return abort(rejection.http_status)
+            return decorated_function
+        return decorator if f is None else decorator(f)
+
+
     @staticmethod
-    def _validate_twilio_request(f):
-        """Validates that incoming requests genuinely originated from Twilio"""
+    def _validate_admin_request(f):
+        """Validates that requests to the admin endpoints contain the admin API key in the `X-Admin-Api-Key`
+        header. The key is not accepted in the query string, which is written to the access log."""
         @wraps(f)
         def decorated_function(*args, **kwargs):
             call_handler = args[0]
-            url = request.url
-            if call_handler.allow_http:
-                url = url.replace('http://', 'https://')
-            validator = RequestValidator(call_handler.twilio_auth_token)
-            request_valid = validator.validate(
-                url,
-                request.form,
-                request.headers.get('X-Twilio-Signature', ''))
-            if request_valid and request.values['From'] in call_handler.allowed_incoming_phone_numbers.keys():
+            api_key = request.headers.get(ADMIN_API_KEY_HEADER, '')
+            if call_handler.admin_api_key and hmac.compare_digest(api_key, call_handler.admin_api_key):
                 return f(*args, **kwargs)
             else:
-                return abort(403)
+                return abort(401)
         return decorated_function
 
 
@@ -110,36 +253,217 @@ class IncomingCallHandler:
         return self.handle_call_function(request.values)
 
 
+    @_validate_twilio_request(limit_rate=False)
+    def _handle_call_status(self):
+        return self.call_status_function(request.values)
+
+
     def handle_call_function(self, request_values):
-        """Handle incoming calls from Twilio"""
+        """Handle incoming calls from Twilio. Requests with the `CallSid` of a handled call, e.g. retried by Twilio
+        after a timeout, get the response to the first request instead of toggling the car again.
+
+        In the async mode, the call is handled by a background job and the response asks Twilio to wait
+        and request the call status route, which returns the response of the job once it is finished."""
+        call_sid = request_values.get('CallSid')
+        with log_context(call_sid=call_sid, caller=request_values.get('From')):
+            if self.async_mode and call_sid:
+                return self._start_call_job(call_sid, request_values)
+            return self._process_call(call_sid, request_values)
+
+
+    def call_status_function(self, request_values) -> str:
+        """Return the response of the finished job handling the call, or ask Twilio to wait and request
+        the status again."""
+        call_sid = request_values.get('CallSid', '')
+        try:
+            poll = int(request_values.get('poll', 1))
+        except ValueError:
+            poll = 1
+        with log_context(call_sid=call_sid):
+            response = self._call_job_response(call_sid)
+            if response is not None:
+                return response
+            if poll >= self._max_call_status_polls:
+                logger.warning("Call %s was not handled in time.", call_sid)
+                return self._call_in_progress_response()
+            return self._wait_for_call_job_response(poll + 1)
+
+
+    def _process_call(self, call_sid: str | None, request_values) -> str:
+        with profiling.iteration("webhook"):
+            if not call_sid:
+                return self._toggle_car_pause(request_values)
+            try:
+                return self._handled_calls.do(call_sid, lambda: self._handle_call_once(call_sid, request_values))
+            except CallInProgress:
+                return self._call_in_progress_response()
+
+
+    def _start_call_job(self, call_sid: str, request_values) -> str:
+        """Start the job handling the call, unless it was already started, and acknowledge the call."""
+        with self._call_jobs_lock:
+            self._remove_old_call_jobs()
+            if call_sid not in self._call_jobs:
+                # The job runs in the context of the request, so its logs keep the call SID and the caller
+                context = contextvars.copy_context()
+                self._call_jobs[call_sid] = (clock.monotonic(), self._call_jobs_executor.submit(
+                    context.run, self._process_call, call_sid, dict(request_values)
+                ))
         resp = VoiceResponse()
+        resp.say("Processing the request.")
+        return self._wait_for_call_job_response(1, resp)
+
 
+    def _call_job_response(self, call_sid: str) -> str | None:
+        """The response of the job handling the call. If the call is not handled by this process,
+        the response saved in the database by the process handling it is returned. None if not finished."""
+        with self._call_jobs_lock:
+            job = self._call_jobs.get(call_sid)
+        if job is None:
+            return notifications_db.get_call_response(call_sid)
+        _, future = job
+        if not future.done():
+            return None
         try:
-            car_id = self._get_car_id_from_name(self.allowed_incoming_phone_numbers[request_values['From']])
-            action_status = self.car_action_api.get_car_action_states(car_id, last_n=1)[0].action_status
+            return future.result()
+        except Exception as e:
+            logger.error("An error occured while handling a call: %s", e)
+            resp = VoiceResponse()
+            resp.say("An error occured while handling the call.")
+            return str(resp)
 
-            if action_status == CarActionStatus.PAUSED:
-                self.car_action_api.unpause_car(car_id)
-                if not self._car_action_status_occurred([CarActionStatus.NORMAL], car_id):
-                    raise StateSwitchTimeout("Car did not enter NORMAL action state in time.")
-                logger.info(f"Car {car_id} successfully unpaused.")
-                resp.say("Car successfully unpaused.")
-            else:
-                self.car_action_api.pause_car(car_id)
-                if not self._car_action_status_occurred([CarActionStatus.PAUSED], car_id):
-                    raise StateSwitchTimeout("Car did not enter PAUSED action state in time.")
-                if not self._car_status_occured([CarStatus.IDLE, CarStatus.OUT_OF_ORDER], car_id):
-                    raise StateSwitchTimeout("Car did not enter IDLE state in time.")
-                logger.info(f"Car {car_id} successfully paused.")
-                resp.say("Car successfully paused.")
+
+    def _remove_old_call_jobs(self) -> None:
+        """Remove the finished jobs started before the idempotency TTL. Must be called with the jobs lock."""
+        expired_before = clock.monotonic() - self.idempotency_ttl_s
+        while self._call_jobs:
+            started_at, future = next(iter(self._call_jobs.values()))
+            if started_at > expired_before or not future.done():
+                return
+            self._call_jobs.popitem(last=False)
+
+
+    @staticmethod
+    def _wait_for_call_job_response(poll: int, resp: VoiceResponse | None = None) -> str:
+        """TwiML making Twilio wait and request the call status route again."""
+        resp = resp or VoiceResponse()
+        resp.pause(length=CALL_STATUS_POLL_INTERVAL)
+        # The poll number makes every status request (and its signature) unique
+        resp.redirect(f"{CALL_STATUS_PATH}?poll={poll}", method="POST")
+        return str(resp)
+
+
+    @staticmethod
+    def _call_in_progress_response() -> str:
+        resp = VoiceResponse()
+        resp.say("The call is still being handled.")
+        return str(resp)
+
+
+    def _handle_call_once(self, call_sid: str, request_values) -> str:
+        """Toggle the car pause unless the call was claimed in the database, possibly by another process.
+        In that case, wait for the response to the call. Raise CallInProgress if it is not available in time."""
+        if notifications_db.claim_call(call_sid, self.idempotency_ttl_s, self._claim_timeout_s):
+            response = self._toggle_car_pause(request_values)
+            notifications_db.save_call_response(call_sid, response)
+            return response
+        self._duplicate_calls.inc()
+        logger.info("Call %s is already being handled, waiting for its response.", call_sid)
+        deadline = clock.monotonic() + self.duplicate_wait_s
+        while (response := notifications_db.get_call_response(call_sid)) is None:
+            if clock.monotonic() >= deadline:
+                raise CallInProgress(f"Call {call_sid} was not handled in time.")
+            clock.sleep(RESPONSE_POLL_INTERVAL)
+        return response
+
+
+    def _toggle_car_pause(self, request_values) -> str:
+        """Pause the car assigned to the calling number, or unpause it if it is paused.
+        Return the TwiML response describing the result."""
+        resp = VoiceResponse()
+
+        try:
+            with profiling.phase("find_car"):
+                car_id, site = self._find_car(self._car_names[normalize_phone_number(request_values['From'])])
+            with log_context(car_id=car_id):
+                resp.say(site.car_transitions.do(car_id, lambda: self._switch_car_action(car_id, site)))
         except Exception as e:
-            logger.error(f"An error occured while handling a call: {e}", exc_info=True)
+            logger.error("An error occured while handling a call: %s", e, exc_info=True)
             resp.say("An error occured while handling the call.")
         
         return str(resp)
 
 
-    def run_app(self):
-        app = FlaskAppWrapper(flask_app)
+    def _switch_car_action(self, car_id: int, site: _Site | None = None) -> str:
+        """Pause or unpause the car of the `site` (the first site by default) and wait for it to switch its state.
+        Return the message for the caller. Raise StateSwitchTimeout if the car does not switch its state in time."""
+        site = site or self._sites[0]
+        with profiling.phase("get_action_state"):
+            action_status = site.car_action_api.get_car_action_states(car_id, last_n=1)[0].action_status
+
+        if action_status == CarActionStatus.PAUSED:
+            with profiling.phase("send_action"):
+                site.car_action_api.unpause_car(car_id)
+            with profiling.phase("wait_for_state"):
+                if not self._car_action_status_occurred([CarActionStatus.NORMAL], car_id, site):
+                    raise StateSwitchTimeout("Car did not enter NORMAL action state in time.")
+            logger.info("Car %s successfully unpaused.", car_id)
+            return "Car successfully unpaused."
+        else:
+            with profiling.phase("send_action"):
+                site.car_action_api.pause_car(car_id)
+            with profiling.phase("wait_for_state"):
+                if not self._car_action_status_occurred([CarActionStatus.PAUSED], car_id, site):
+                    raise StateSwitchTimeout("Car did not enter PAUSED action state in time.")
+                if not self._car_status_occured([CarStatus.IDLE, CarStatus.OUT_OF_ORDER], car_id, site):
+                    raise StateSwitchTimeout("Car did not enter IDLE state in time.")
+            logger.info("Car %s successfully paused.", car_id)
+            return "Car successfully paused."
+
+
+    @_validate_admin_request
+    def _metrics(self):
+        """Return the current values of the application metrics."""
+        return jsonify(metrics.snapshot())
+
+
+    @_validate_admin_request
+    def _profiler(self):
+        """Start or stop the sampling profiler (POST with `action` set to `start` or `stop`)
+        and return its current report."""
+        profiler = profiling.get_profiler()
+        if request.method == 'POST':
+            action = request.values.get('action', '')
+            if action == 'start':
+                profiler.start()
+            elif action == 'stop':
+                profiler.stop()
+            else:
+                return abort(400)
+        return jsonify(profiler.report())
+
+
+    def add_endpoints(self, app: FlaskAppWrapper) -> None:
+        """Register the endpoints of the handler in the app."""
         app.add_endpoint("/v2/notifications/handle-call", "handle_call", self._handle_call, methods=['GET', 'POST'])
-        app.run(host='0.0.0.0', port=self.server_port)
+        if self.async_mode:
+            app.add_endpoint(CALL_STATUS_PATH, "handle_call_status", self._handle_call_status, methods=['GET', 'POST'])
+        if self.admin_api_key:
+            app.add_endpoint("/v2/notifications/metrics", "metrics", self._metrics, methods=['GET'])
+            app.add_endpoint(
+                "/v2/notifications/admin/profiler", "profiler", self._profiler, methods=['GET', 'POST']
+            )
+
+
+    def create_server(self, *extensions) -> BaseWSGIServer:
+        """Create the server of the app with the endpoints of the handler and of the `extensions`, which register
+        their endpoints by their own `add_endpoints` method (e.g. the health monitor)."""
+        app = FlaskAppWrapper(Flask(__name__))
+        self.add_endpoints(app)
+        for extension in extensions:
+            extension.add_endpoints(app)
+        return make_server('0.0.0.0', self.server_port, app.app, threaded=True)
+
+
+    def run_app(self, *extensions) -> None:
+        self.create_server(*extensions).serve_forever()
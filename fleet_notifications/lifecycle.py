@@ -0,0 +1,106 @@
+import logging, signal, threading, time
+
+from werkzeug.serving import BaseWSGIServer
+
+import fleet_notifications.database.database_controller as notifications_db
+from fleet_notifications.state_checker import OrderStateChecker
+from fleet_notifications.notification_dispatcher import NotificationPriority
+from fleet_notifications.script_args.configs import Shutdown
+from fleet_notifications.tracing import stop_tracing
+from fleet_notifications.logs import LOGGER_NAME, stop_logging
+
+
+logger = logging.getLogger(LOGGER_NAME)
+
+
+class LifecycleManager:
+    """Runs the service and stops it gracefully on SIGTERM or SIGINT.
+
+    On shutdown, the HTTP server stops accepting requests, the state checkers stop and save their `since`
+    watermarks, and the dispatcher shared by the checkers gets the time left until the deadline to place
+    the queued notifications. Notifications not placed in time are saved in the database and queued again
+    on the next start."""
+
+    def __init__(
+        self,
+        state_checkers: OrderStateChecker | list[OrderStateChecker],
+        server: BaseWSGIServer,
+        config: Shutdown
+    ):
+        self._state_checkers = state_checkers if isinstance(state_checkers, list) else [state_checkers]
+        self._dispatcher = self._state_checkers[0].dispatcher
+        self._server = server
+        self._timeout_s = config.timeout_s
+        self._shutdown_requested = threading.Event()
+
+
+    def install_signal_handlers(self) -> None:
+        """Request the shutdown on SIGTERM and SIGINT. Must be called from the main thread."""
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self._on_signal)
+
+
+    def request_shutdown(self) -> None:
+        """Stop serving the HTTP requests. The components are then stopped by the `run` method."""
+        if self._shutdown_requested.is_set():
+            return
+        self._shutdown_requested.set()
+        # The server waits for the serving loop to exit, so it must not be shut down from the serving thread
+        threading.Thread(target=self._server.shutdown, name="shutdown").start()
+
+
+    def run(self) -> None:
+        """Start the state checkers and serve the HTTP requests until the shutdown is requested,
+        then stop the service."""
+        self._restore_pending_notifications()
+        for state_checker in self._state_checkers:
+            state_checker.start_thread()
+        try:
+            self._server.serve_forever()
+        finally:
+            self._shutdown()
+
+
+    def _on_signal(self, signum: int, frame) -> None:
+        logger.info("Received %s, shutting down.", signal.Signals(signum).name)
+        self.request_shutdown()
+
+
+    def _restore_pending_notifications(self) -> None:
+        pending = notifications_db.pop_pending_notifications()
+        if pending:
+            logger.info("Queueing %s notifications not placed before the last shutdown.", len(pending))
+        for notification in pending:
+            self._dispatcher.dispatch(
+                notification.phone_number,
+                notification.under_test,
+                NotificationPriority(notification.priority),
+                notification.origin_timestamp
+            )
+
+
+    def _shutdown(self) -> None:
+        deadline = time.monotonic() + self._timeout_s
+        self._server.server_close()
+        for state_checker in self._state_checkers:
+            state_checker.stop(self._time_left(deadline))
+        unplaced = self._dispatcher.shutdown(self._time_left(deadline))
+        if unplaced:
+            logger.warning(
+                "%s notifications were not placed before the shutdown, they will be placed after the restart.",
+                len(unplaced)
+            )
+            notifications_db.add_pending_notifications([
+                notifications_db.PendingNotification(
+                    job.phone_number, job.under_test, job.priority.value, job.origin_timestamp_ms
+                )
+                for job in unplaced
+            ])
+        logger.info("Shutdown complete.")
+        stop_tracing()
+        stop_logging()
+
+
+    @staticmethod
+    def _time_left(deadline: float) -> float:
+        return max(0.0, deadline - time.monotonic())
@@ -1,14 +1,103 @@
 from __future__ import annotations
+import atexit
+import contextlib
+import contextvars
+import datetime
+import json
 import logging.handlers
 import os
 import logging.config
+import queue
+from typing import Iterator
 
 from .script_args.configs import ScriptConfig as _ScriptConfig, Logging as _Logging
+from . import metrics as _metrics
 
 
 _DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 LOGGER_NAME = "werkzeug"
 
+_queue_listener: logging.handlers.QueueListener | None = None
+# Handlers added to the logger by the last call of `configure_logging`
+_installed_handlers: list[logging.Handler] = []
+_log_context: contextvars.ContextVar[dict[str, object]] = contextvars.ContextVar("log_context", default={})
+_STANDARD_RECORD_ATTRIBUTES = frozenset(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "context"}
+
+
+@contextlib.contextmanager
+def log_context(**fields: object) -> Iterator[None]:
+    """Add the fields (e.g. `order_id`, `car_id`, `call_sid`) to all records logged in the block.
+
+    The context is bound to the current thread (or a copy of the context passed to another thread
+    with `contextvars.copy_context`). Nested blocks extend the context of the enclosing block."""
+    token = _log_context.set({**_log_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+
+class _ContextFilter(logging.Filter):
+    """Attaches the current log context to the record. The context is captured once, in the thread
+    that created the record, so it survives passing the record through the logging queue."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "context"):
+            record.context = _log_context.get()
+        return True
+
+
+class _JsonFormatter(logging.Formatter):
+    """Formats records as single-line JSON objects with the log context and the extra fields
+    (e.g. timings passed as `extra={"duration_ms": ...}`) as top-level keys."""
+
+    def __init__(self, component_name: str):
+        super().__init__()
+        self._component_name = "-".join(component_name.lower().split())
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict[str, object] = {
+            "timestamp": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "component": self._component_name,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "context", {}))
+        entry.update(
+            (key, value) for key, value in record.__dict__.items() if key not in _STANDARD_RECORD_ATTRIBUTES
+        )
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that never blocks the logging thread.
+
+    If the queue is full, the record is dropped and counted. The record is passed to the listener without
+    formatting, so the message is built by the listener thread and not on the hot path of the caller."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self._dropped = _metrics.counter("log_records_dropped")
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            # Traceback objects must not outlive the caller's frame, so the exception is formatted here
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self._dropped.inc()
+
 
 def configure_logging(component_name: str, config: _ScriptConfig) -> None:
     """Configure the logging for the application.
@@ -16,26 +105,55 @@ def configure_logging(component_name: str, config: _ScriptConfig) -> None:
     The component name is written in the log messages to identify the source of the log message.
 
     The logging configuration is read from a JSON file. If the file is not found, a default configuration is used.
+    If the queue is enabled in the configuration, the records are passed to the handlers by a background thread.
+
+    If the logging was already configured, the handlers are replaced by the new ones. The new handlers are added
+    before the old ones are removed, so no record is lost while the configuration is reloaded.
     """
+    global _installed_handlers, _queue_listener
     try:
+        previous_handlers, previous_listener = _installed_handlers, _queue_listener
         log_config = config.logging
-
+        handlers: list[logging.Handler] = []
         if log_config.console.use:
-            _configure_logging_to_console(log_config.console, component_name)
+            handlers.append(_configure_logging_to_console(log_config.console, component_name))
         if log_config.file.use:
-            _configure_logging_to_file(log_config.file, component_name)
+            handlers.append(_configure_logging_to_file(log_config.file, component_name))
+        if log_config.format == "json":
+            for handler in handlers:
+                handler.setFormatter(_JsonFormatter(component_name))
+
+        if log_config.queue.use:
+            installed_handlers = [_use_queue(handlers, log_config.queue.max_size)]
+        else:
+            installed_handlers = handlers
+            _queue_listener = None
+            for handler in handlers:
+                _use_handler(handler)
+        # The logger passes every record the handlers would accept, so the level is fully determined
+        # by the handlers. Records below the level of all handlers are not created at all.
         logging.getLogger(LOGGER_NAME).setLevel(
-            logging.DEBUG
-        )  # This ensures the logging level will be fully determined by the handlers
+            min((handler.level for handler in handlers), default=logging.DEBUG)
+        )
+        _installed_handlers = installed_handlers
+        _remove_handlers(previous_handlers, previous_listener)
     except ValueError as ve:
-        logging.error(f"{component_name}: Configuration error: {ve}")
+        logging.error("%s: Configuration error: %s", component_name, ve)
         raise
     except Exception as e:
-        logging.error(f"{component_name}: Error when configuring logging: {e}")
+        logging.error("%s: Error when configuring logging: %s", component_name, e)
         raise
 
 
-def _configure_logging_to_console(config: _Logging.HandlerConfig, component_name: str):
+def stop_logging() -> None:
+    """Pass all queued records to the handlers and stop the background logging thread, if used."""
+    global _queue_listener
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        _queue_listener = None
+
+
+def _configure_logging_to_console(config: _Logging.HandlerConfig, component_name: str) -> logging.Handler:
     """Configure the logging to the console.
 
     The console logging is configured to use the logging level and format specified in the configuration.
@@ -43,10 +161,10 @@ def _configure_logging_to_console(config: _Logging.HandlerConfig, component_name
     handler = logging.StreamHandler()
     handler.setLevel(config.level)
     _add_formatter(handler, component_name)
-    _use_handler(handler)
+    return handler
 
 
-def _configure_logging_to_file(config: _Logging.HandlerConfig, component_name: str) -> None:
+def _configure_logging_to_file(config: _Logging.HandlerConfig, component_name: str) -> logging.Handler:
     """Configure the logging to a file.
 
     The file logging is configured to use the logging level and format specified in the configuration.
@@ -59,7 +177,37 @@ def _configure_logging_to_file(config: _Logging.HandlerConfig, component_name: s
     handler = logging.handlers.RotatingFileHandler(file_path, maxBytes=10485760, backupCount=5)
     handler.setLevel(config.level)
     _add_formatter(handler, component_name)
-    _use_handler(handler)
+    return handler
+
+
+def _use_queue(handlers: list[logging.Handler], max_size: int) -> logging.Handler:
+    """Add a handler passing the records through a bounded queue to a listener thread, which then
+    passes them to the `handlers`. Returns the added handler."""
+    global _queue_listener
+    if _queue_listener is None:
+        atexit.register(stop_logging)
+    log_queue: queue.Queue = queue.Queue(maxsize=max_size)
+    _queue_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _queue_listener.start()
+    queue_handler = _DroppingQueueHandler(log_queue)
+    queue_handler.setLevel(min((handler.level for handler in handlers), default=logging.DEBUG))
+    _use_handler(queue_handler)
+    return queue_handler
+
+
+def _remove_handlers(
+    handlers: list[logging.Handler], listener: logging.handlers.QueueListener | None
+) -> None:
+    """Remove the handlers from the logger, pass the records queued for the `listener` to its handlers
+    and close all of them."""
+    logger = logging.getLogger(LOGGER_NAME)
+    for handler in handlers:
+        logger.removeHandler(handler)
+    if listener is not None:
+        listener.stop()
+        handlers = handlers + list(listener.handlers)
+    for handler in handlers:
+        handler.close()
 
 
 def _add_formatter(handler: logging.Handler, component_name: str) -> None:
@@ -70,6 +218,7 @@ def _add_formatter(handler: logging.Handler, component_name: str) -> None:
 
 def _use_handler(handler: logging.Handler) -> None:
     """Add handler to the logger."""
+    handler.addFilter(_ContextFilter())
     logging.getLogger(LOGGER_NAME).addHandler(handler)
 
 
@@ -79,4 +228,4 @@ def _log_format(component_name: str) -> str:
 
 
 def _log_file_name(component_name: str) -> str:
-    return "_".join(component_name.lower().split())
\ No newline at end of file
+    return "_".join(component_name.lower().split())
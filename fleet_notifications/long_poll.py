@@ -0,0 +1,190 @@
+import enum, logging, random, threading
+from typing import Callable, TypeVar
+
+import urllib3.exceptions
+from fleet_management_http_client_python.exceptions import ( # type: ignore
+    ApiException,
+    ForbiddenException,
+    ServiceException,
+    UnauthorizedException,
+)
+
+from fleet_notifications import clock, metrics
+from fleet_notifications.script_args.configs import FleetManagementServer
+from fleet_notifications.logs import LOGGER_NAME
+
+
+logger = logging.getLogger(LOGGER_NAME)
+
+T = TypeVar("T")
+
+
+class FailureKind(enum.Enum):
+    TIMEOUT = "timeout"
+    CONNECTION = "connection"
+    AUTH = "auth"
+    SERVER = "server"
+    CLIENT = "client"
+
+
+class CircuitState(enum.Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+def classify_failure(e: Exception) -> FailureKind | None:
+    """Return the kind of the failure of a request to the Fleet Management API, or None if the exception
+    is not caused by the request."""
+    if isinstance(e, (UnauthorizedException, ForbiddenException)):
+        return FailureKind.AUTH
+    if isinstance(e, ServiceException):
+        return FailureKind.SERVER
+    if isinstance(e, ApiException):
+        return FailureKind.CLIENT
+    if isinstance(e, urllib3.exceptions.MaxRetryError) and e.reason is not None:
+        return classify_failure(e.reason)
+    if isinstance(e, urllib3.exceptions.TimeoutError):
+        return FailureKind.TIMEOUT
+    if isinstance(e, urllib3.exceptions.HTTPError):
+        return FailureKind.CONNECTION
+    return None
+
+
+class CircuitBreaker:
+    """Stops requests to a failing server for a while.
+
+    The circuit opens after `failure_threshold` consecutive failures. While it is open, no requests are sent.
+    After `open_s`, a single trial request is allowed (half-open circuit); the circuit closes if it succeeds
+    and opens again otherwise."""
+
+    def __init__(self, failure_threshold: int, open_s: float):
+        self._failure_threshold = failure_threshold
+        self._open_s = open_s
+        self._consecutive_failures = 0
+        self._opened_at: float | None = None
+        self._opened = metrics.counter("fleet_management_circuit_opened")
+
+    @property
+    def state(self) -> CircuitState:
+        if self._opened_at is None:
+            return CircuitState.CLOSED
+        if clock.monotonic() - self._opened_at < self._open_s:
+            return CircuitState.OPEN
+        return CircuitState.HALF_OPEN
+
+    def time_until_trial(self) -> float:
+        """Seconds left until a trial request is allowed, 0 if requests are allowed."""
+        if self._opened_at is None:
+            return 0.0
+        return max(0.0, self._opened_at + self._open_s - clock.monotonic())
+
+    def record_success(self) -> None:
+        self._consecutive_failures = 0
+        self._opened_at = None
+
+    def record_failure(self) -> None:
+        self._consecutive_failures += 1
+        if self.state == CircuitState.HALF_OPEN or (
+            self._opened_at is None and self._consecutive_failures >= self._failure_threshold
+        ):
+            if self._opened_at is None:
+                logger.warning(
+                    "Fleet Management API failed %s times in a row, pausing requests for %s s.",
+                    self._consecutive_failures, self._open_s
+                )
+                self._opened.inc()
+            self._opened_at = clock.monotonic()
+
+
+class LongPollClient:
+    """Runs the long-poll requests to the Fleet Management API.
+
+    A failed request is followed by an exponential backoff with jitter and requests are paused by the circuit
+    breaker during an outage. A single request timing out is repeated at once, as the server may hold the long poll
+    longer than the timeout if nothing happens; repeated timeouts mean the server does not respond and are handled
+    as failures. Only the first failure of an outage is logged as a warning, so an outage does not
+    flood the log; the recovery is logged with the duration of the outage."""
+
+    def __init__(self, config: FleetManagementServer.LongPoll, stopped: threading.Event | None = None):
+        self._request_timeout_s = config.request_timeout_s
+        self._backoff_base_s = config.backoff_base_s
+        self._backoff_max_s = config.backoff_max_s
+        self._stopped = stopped or threading.Event()
+        self.circuit_breaker = CircuitBreaker(config.failure_threshold, config.circuit_open_s)
+        self.consecutive_failures = 0
+        self.consecutive_timeouts = 0
+        # Whether the last poll got a response from the server
+        self.responded = False
+        self._outage_started_at: float | None = None
+        self._requests = metrics.counter("fleet_management_long_poll_requests")
+        self._recovery_time = metrics.summary("fleet_management_recovery_s")
+
+
+    def poll(self, request: Callable[[float], list[T]]) -> list[T]:
+        """Run the `request` with the request timeout (in seconds) as its argument and return its result.
+
+        If the request fails, wait for the backoff and return an empty list. The first request timing out
+        in a row is not considered a failure. Exceptions not caused by the request are raised."""
+        self.responded = False
+        if self._wait(self.circuit_breaker.time_until_trial()):
+            return []
+        self._requests.inc()
+        try:
+            result = request(self._request_timeout_s)
+        except Exception as e:
+            kind = classify_failure(e)
+            if kind is None:
+                raise
+            metrics.counter(f"fleet_management_long_poll_errors_{kind.value}").inc()
+            if kind == FailureKind.TIMEOUT:
+                self.consecutive_timeouts += 1
+                if self.consecutive_timeouts == 1:
+                    return []
+            self._on_failure(kind, e)
+            return []
+        self.responded = True
+        self._on_success()
+        return result
+
+
+    def _on_success(self) -> None:
+        if self._outage_started_at is not None:
+            outage_s = clock.monotonic() - self._outage_started_at
+            self._recovery_time.observe(outage_s)
+            logger.info(
+                "Fleet Management API is available again after %.1f s and %s failed requests.",
+                outage_s, self.consecutive_failures
+            )
+            self._outage_started_at = None
+        self.consecutive_failures = 0
+        self.consecutive_timeouts = 0
+        self.circuit_breaker.record_success()
+
+
+    def _on_failure(self, kind: FailureKind, e: Exception) -> None:
+        self.consecutive_failures += 1
+        self.circuit_breaker.record_failure()
+        delay = self._backoff_delay()
+        if self._outage_started_at is None:
+            self._outage_started_at = clock.monotonic()
+            if kind == FailureKind.AUTH:
+                logger.error("Fleet Management API rejected the API key: %s", e)
+            else:
+                logger.warning("Request to the Fleet Management API failed (%s): %s", kind.value, e)
+        else:
+            logger.debug(
+                "Request to the Fleet Management API failed again (%s), retrying in %.2f s.", kind.value, delay
+            )
+        self._wait(delay)
+
+
+    def _backoff_delay(self) -> float:
+        """Exponential backoff with full jitter."""
+        ceiling = min(self._backoff_max_s, self._backoff_base_s * 2 ** (self.consecutive_failures - 1))
+        return random.uniform(0, ceiling)
+
+
+    def _wait(self, delay_s: float) -> bool:
+        """Wait for `delay_s` seconds or until the client is stopped. Return True if stopped."""
+        return clock.wait(self._stopped, delay_s) if delay_s > 0 else self._stopped.is_set()
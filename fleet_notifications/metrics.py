@@ -0,0 +1,138 @@
+import bisect
+import itertools
+import threading
+
+
+class Counter:
+    """Monotonically increasing counter, safe to increment from multiple threads."""
+
+    def __init__(self) -> None:
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+    def snapshot(self) -> int:
+        return self._value
+
+
+class Summary:
+    """Tracks count, sum and maximum of observed values (e.g. wait times in seconds)."""
+
+    def __init__(self) -> None:
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._count += 1
+            self._sum += value
+            self._max = max(self._max, value)
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def sum(self) -> float:
+        return self._sum
+
+    def snapshot(self) -> dict[str, float]:
+        with self._lock:
+            return {
+                "count": self._count,
+                "sum": self._sum,
+                "max": self._max,
+                "mean": self._sum / self._count if self._count else 0.0,
+            }
+
+
+class Histogram:
+    """Counts observed values in cumulative buckets given by their upper bounds."""
+
+    DEFAULT_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self._buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self._buckets) + 1)
+        self._summary = Summary()
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+        self._summary.observe(value)
+
+    def snapshot(self) -> dict[str, object]:
+        with self._lock:
+            counts = list(self._counts)
+        cumulative = list(itertools.accumulate(counts))
+        buckets = {str(bound): count for bound, count in zip(self._buckets, cumulative)}
+        buckets["+Inf"] = cumulative[-1]
+        return {**self._summary.snapshot(), "buckets": buckets}
+
+
+class MetricsRegistry:
+    """Named collection of metrics. Metrics are created on first access."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Counter | Summary | Histogram] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str) -> Counter:
+        return self._get_or_create(name, Counter)
+
+    def summary(self, name: str) -> Summary:
+        return self._get_or_create(name, Summary)
+
+    def histogram(self, name: str) -> Histogram:
+        return self._get_or_create(name, Histogram)
+
+    def snapshot(self) -> dict[str, object]:
+        """Return the current values of all metrics, keyed by metric name."""
+        with self._lock:
+            metrics = dict(self._metrics)
+        return {name: metric.snapshot() for name, metric in sorted(metrics.items())}
+
+    def _get_or_create(self, name: str, metric_type: type):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = metric_type()
+                self._metrics[name] = metric
+            elif not isinstance(metric, metric_type):
+                raise TypeError(f"Metric '{name}' is already registered as {type(metric).__name__}.")
+            return metric
+
+
+_registry = MetricsRegistry()
+
+
+def get_registry() -> MetricsRegistry:
+    """Return the registry shared by the whole application."""
+    return _registry
+
+
+def counter(name: str) -> Counter:
+    return _registry.counter(name)
+
+
+def summary(name: str) -> Summary:
+    return _registry.summary(name)
+
+
+def histogram(name: str) -> Histogram:
+    return _registry.histogram(name)
+
+
+def snapshot() -> dict[str, object]:
+    return _registry.snapshot()
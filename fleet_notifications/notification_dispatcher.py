@@ -0,0 +1,183 @@
+import contextvars, dataclasses, enum, logging, threading, time
+from collections import deque
+
+from fleet_notifications import clock, metrics, tracing
+from fleet_notifications.notifications_client import NotificationClient
+from fleet_notifications.script_args.configs import Twilio
+from fleet_notifications.logs import LOGGER_NAME
+
+
+logger = logging.getLogger(LOGGER_NAME)
+
+
+class NotificationPriority(enum.Enum):
+    ADMIN = "admin"
+    CUSTOMER = "customer"
+    TEST = "test"
+
+
+@dataclasses.dataclass
+class NotificationJob:
+    phone_number: str
+    under_test: bool
+    priority: NotificationPriority
+    origin_timestamp_ms: int | None = None
+    queue_span: tracing.Span | None = None
+    enqueued_at: float = dataclasses.field(default_factory=clock.monotonic)
+    context: contextvars.Context = dataclasses.field(default_factory=contextvars.copy_context)
+    # Set once the call was requested from Twilio, the notification must not be placed again after that
+    placed: threading.Event = dataclasses.field(default_factory=threading.Event)
+
+
+class NotificationDispatcher:
+    """Places notification calls from a pool of worker threads.
+
+    Every priority class has its own queue. Workers take jobs from the queues using a smooth weighted
+    round robin, so a class gets a share of the workers proportional to its weight whenever several
+    classes are waiting. A number of workers can be reserved for admin notifications only, which keeps
+    them responsive even when all other workers are busy with long-running calls."""
+
+    def __init__(self, notification_client: NotificationClient, config: Twilio.Notifications.Dispatcher):
+        self._notification_client = notification_client
+        self._n_of_workers = config.workers
+        self._n_of_reserved_admin_workers = min(config.reserved_admin_workers, config.workers - 1)
+        self._weights = {
+            NotificationPriority.ADMIN: config.admin_weight,
+            NotificationPriority.CUSTOMER: config.customer_weight,
+            NotificationPriority.TEST: config.test_weight,
+        }
+        self._queues = {priority: deque[NotificationJob]() for priority in NotificationPriority}
+        self._current_weights = {priority: 0 for priority in NotificationPriority}
+        self._condition = threading.Condition()
+        self._workers: list[threading.Thread] = []
+        # The job each worker is placing, by the name of the worker
+        self._running: dict[str, NotificationJob] = {}
+        self._closing = False
+        self._closed = False
+
+
+    @property
+    def notification_client(self) -> NotificationClient:
+        return self._notification_client
+
+
+    def dispatch(
+        self,
+        phone_number: str,
+        under_test: bool,
+        priority: NotificationPriority,
+        origin_timestamp_ms: int | None = None
+    ) -> None:
+        """Queue a notification call. Calls to cars under test are always queued with the TEST priority.
+
+        The `origin_timestamp_ms` is the timestamp of the order state that triggered the notification,
+        used to measure the end-to-end lag of the notification."""
+        if under_test:
+            priority = NotificationPriority.TEST
+        self._start_workers()
+        queue_span = tracing.start_span("notification.queue", priority=priority.value)
+        with self._condition:
+            if self._closed:
+                logger.warning("Notification for %s not queued, the dispatcher is shut down.", phone_number)
+                return
+            self._queues[priority].append(
+                NotificationJob(phone_number, under_test, priority, origin_timestamp_ms, queue_span)
+            )
+            self._condition.notify_all()
+        logger.debug("Notification for %s queued with priority %s.", phone_number, priority.value)
+
+
+    def queue_depth(self) -> int:
+        """Return the number of notifications waiting for a worker."""
+        with self._condition:
+            return sum(len(queue) for queue in self._queues.values())
+
+
+    def shutdown(self, timeout_s: float) -> list[NotificationJob]:
+        """Stop the workers once they have placed all queued notifications, waiting at most `timeout_s`.
+        Return the notifications that were not placed in time, i.e. the notifications taken by the workers
+        but not yet requested from Twilio followed by the queued notifications, which are removed from the queues.
+        Calls already requested from Twilio are left to the daemon workers and are not returned, so the restarted
+        service does not call the same number again."""
+        deadline = time.monotonic() + timeout_s
+        with self._condition:
+            self._closing = True
+            self._condition.notify_all()
+            workers = list(self._workers)
+        for worker in workers:
+            worker.join(max(0.0, deadline - time.monotonic()))
+        with self._condition:
+            self._closed = True
+            not_placed = [job for job in self._running.values() if not job.placed.is_set()]
+            n_of_calls_in_progress = len(self._running) - len(not_placed)
+            remaining = [job for queue in self._queues.values() for job in queue]
+            for queue in self._queues.values():
+                queue.clear()
+        if n_of_calls_in_progress:
+            logger.warning(
+                "%s notification calls are still in progress after the shutdown timeout.", n_of_calls_in_progress
+            )
+        return not_placed + remaining
+
+
+    def _start_workers(self) -> None:
+        with self._condition:
+            if self._workers:
+                return
+            for i in range(self._n_of_workers):
+                allowed = (
+                    (NotificationPriority.ADMIN,) if i < self._n_of_reserved_admin_workers
+                    else tuple(NotificationPriority)
+                )
+                worker = threading.Thread(
+                    target=self._work, args=(allowed,), daemon=True, name=f"notification-worker-{i}"
+                )
+                self._workers.append(worker)
+                worker.start()
+
+
+    def _work(self, allowed: tuple[NotificationPriority, ...]) -> None:
+        while (job := self._take_job(allowed)) is not None:
+            metrics.summary(f"notification_queue_wait_s_{job.priority.value}").observe(
+                clock.monotonic() - job.enqueued_at
+            )
+            if job.queue_span is not None:
+                job.queue_span.end()
+            try:
+                # The call runs in the context of the dispatching thread, so its logs keep the order and car IDs
+                # and its spans belong to the trace of the order state
+                job.context.run(
+                    self._notification_client.call_phone, job.phone_number, job.under_test, job.origin_timestamp_ms,
+                    on_placing=job.placed.set
+                )
+            except Exception as e:
+                logger.error("Unexpected error while notifying %s: %s", job.phone_number, e, exc_info=True)
+            finally:
+                with self._condition:
+                    self._running.pop(threading.current_thread().name, None)
+
+
+    def _take_job(self, allowed: tuple[NotificationPriority, ...]) -> NotificationJob | None:
+        """Wait for the next job. Return None if the dispatcher is shutting down and no job is left for the worker."""
+        with self._condition:
+            while True:
+                job = None if self._closed else self._next_job(allowed)
+                if job is not None:
+                    self._running[threading.current_thread().name] = job
+                if job is not None or self._closing:
+                    return job
+                self._condition.wait()
+
+
+    def _next_job(self, allowed: tuple[NotificationPriority, ...]) -> NotificationJob | None:
+        """Pick the next job with the smooth weighted round robin. Must be called with the condition held."""
+        waiting = [priority for priority in allowed if self._queues[priority]]
+        if not waiting:
+            return None
+        total_weight = 0
+        for priority in waiting:
+            self._current_weights[priority] += self._weights[priority]
+            total_weight += self._weights[priority]
+        chosen = max(waiting, key=lambda priority: self._current_weights[priority])
+        self._current_weights[chosen] -= total_weight
+        return self._queues[chosen].popleft()
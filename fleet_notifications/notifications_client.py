@@ -1,10 +1,13 @@
-import logging, time, requests # type: ignore
+import logging, threading, requests # type: ignore
+from typing import Callable
 
 from twilio.rest import Client # type: ignore
 from twilio.rest.api.v2010.account.call import CallInstance # type: ignore
 
+from fleet_notifications import clock, metrics, tracing
 from fleet_notifications.script_args.configs import Twilio
-from fleet_notifications.logs import LOGGER_NAME
+from fleet_notifications.rate_limiter import TwilioRateLimiter
+from fleet_notifications.logs import LOGGER_NAME, log_context
 
 
 PICK_UP_WAIT_INTERVAL = 2
@@ -19,11 +22,46 @@ class NotificationClient:
         self._url = twilio_config.notifications.play_sound_url
         self._n_of_repeated_calls = twilio_config.notifications.repeated_calls
         self._call_status_timeout_s = twilio_config.notifications.call_status_timeout_s
-        self._client = Client(self._account_sid, self._auth_token)
-
-
-    def call_phone(self, phone_number: str, under_test: bool) -> None:
-        """Calls the provided phone number and plays a sound. If the call is not picked up, it will be repeated."""
+        self._client_instance: Client | None = None
+        self._client_lock = threading.Lock()
+        self._rate_limiter = TwilioRateLimiter(twilio_config.notifications.rate_limit)
+
+
+    def update_settings(self, notifications_config: Twilio.Notifications) -> None:
+        """Use the sound URL, the number of repeated calls and the call status timeout of the configuration
+        for the next calls. The rate limits and the Twilio credentials are not changed."""
+        self._url = notifications_config.play_sound_url
+        self._n_of_repeated_calls = notifications_config.repeated_calls
+        self._call_status_timeout_s = notifications_config.call_status_timeout_s
+
+
+    @property
+    def _client(self) -> Client:
+        """The Twilio client, created on the first call, so it does not delay the start of the service."""
+        if self._client_instance is None:
+            with self._client_lock:
+                if self._client_instance is None:
+                    self._client_instance = Client(self._account_sid, self._auth_token)
+        return self._client_instance
+
+
+    @_client.setter
+    def _client(self, client: Client) -> None:
+        self._client_instance = client
+
+
+    def call_phone(
+        self,
+        phone_number: str,
+        under_test: bool,
+        origin_timestamp_ms: int | None = None,
+        on_placing: Callable[[], None] | None = None
+    ) -> None:
+        """Calls the provided phone number and plays a sound. If the call is not picked up, it will be repeated.
+
+        If the `origin_timestamp_ms` of the order state triggering the call is given, the time from the state
+        to the first placed call is recorded as the end-to-end lag of the notification. The `on_placing` callback
+        is called right before every call is requested from Twilio."""
         if not under_test:
             if phone_number == "":
                 logger.warning("No phone number provided.")
@@ -31,18 +69,32 @@ class NotificationClient:
             if not self._check_url_exists():
                 logger.error("The provided audio file URL does not exist.")
 
-            logger.info("Calling phone number: " + phone_number)
+            logger.info("Calling phone number: %s", phone_number)
             try:
-                for _ in range(self._n_of_repeated_calls):
-                    sid = self._client.calls.create(
-                        to=phone_number,
-                        from_=self._from_number,
-                        twiml=f'<Response><Play loop="10">{self._url}</Play></Response>'
-                    )
-                    if self._wait_for_pickup(sid):
-                        break
+                for attempt in range(self._n_of_repeated_calls):
+                    with tracing.span("twilio.calls.create", attempt=attempt) as create_span:
+                        sid = self._rate_limiter.create(lambda: self._create_call(phone_number, on_placing))
+                        if create_span is not None:
+                            create_span.set_attribute("call_sid", sid.sid)
+                    if attempt == 0 and origin_timestamp_ms is not None:
+                        metrics.histogram("notification_end_to_end_lag_s").observe(
+                            clock.time() - origin_timestamp_ms / 1000
+                        )
+                    with log_context(call_sid=sid.sid), tracing.span("twilio.pickup", call_sid=sid.sid):
+                        if self._wait_for_pickup(sid):
+                            break
             except Exception as e:
-                logger.error(f"An error occured while handling a call to number {phone_number} : {e}")
+                logger.error("An error occured while handling a call to number %s : %s", phone_number, e)
+
+
+    def _create_call(self, phone_number: str, on_placing: Callable[[], None] | None) -> CallInstance:
+        if on_placing is not None:
+            on_placing()
+        return self._client.calls.create(
+            to=phone_number,
+            from_=self._from_number,
+            twiml=f'<Response><Play loop="10">{self._url}</Play></Response>'
+        )
 
 
     def _check_url_exists(self) -> bool:
@@ -68,20 +120,28 @@ class NotificationClient:
     def _wait_for_pickup(self, sid: CallInstance) -> bool:
         """Returns true if the call was picked up within a certain time frame, and if polling twilio timeouts.
         Otherwise returns false."""
-        logger.info("Waiting for pickup: " + sid.sid)
+        logger.info("Waiting for pickup: %s", sid.sid)
+        start = clock.monotonic()
         call = self._client.calls.get(sid.sid)
-        call_status = call.fetch().status
+        call_status = self._rate_limiter.fetch(call.fetch).status
         timeout_count = 0
 
         while (not self._is_call_picked_up(call_status)):
-            time.sleep(PICK_UP_WAIT_INTERVAL)
-            call_status = call.fetch().status
+            clock.sleep(PICK_UP_WAIT_INTERVAL)
+            call_status = self._rate_limiter.fetch(call.fetch).status
             timeout_count += PICK_UP_WAIT_INTERVAL
             if timeout_count > self._call_status_timeout_s:
-                logger.warning("Call polling timed out.")
+                logger.warning("Call polling timed out.", extra=self._pickup_timing(start))
                 return True
 
+        logger.debug("Call %s ended ringing with status %s.", sid.sid, call_status, extra=self._pickup_timing(start))
         if call_status == CallInstance.Status.FAILED:
-            logger.error(f"Call: {sid.sid} failed.")
+            logger.error("Call: %s failed.", sid.sid)
             return True
         return call_status != CallInstance.Status.NO_ANSWER
+
+
+    @staticmethod
+    def _pickup_timing(start: float) -> dict[str, float]:
+        """Timing fields of the pickup polling started at `start` (monotonic time) for the structured logs."""
+        return {"pickup_wait_ms": round((clock.monotonic() - start) * 1000, 3)}
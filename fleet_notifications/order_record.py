@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from fleet_management_http_client_python import Order, OrderStatus # type: ignore
+
+
+class OrderRecord:
+    """Fields of an order read by the state checker.
+
+    The checker keeps a record for every active order of the fleet, so the record holds plain values
+    in slots instead of the complete `Order` model with its nested states and phone objects."""
+
+    __slots__ = ("id", "car_id", "status", "timestamp", "notification_phone")
+
+    def __init__(
+        self,
+        id: int,
+        car_id: int,
+        status: OrderStatus | None,
+        timestamp: int,
+        notification_phone: str | None
+    ):
+        self.id = id
+        self.car_id = car_id
+        self.status = status
+        self.timestamp = timestamp
+        self.notification_phone = notification_phone
+
+    @classmethod
+    def from_order(cls, order: Order) -> OrderRecord:
+        last_state = order.last_state
+        return cls(
+            order.id,
+            order.car_id,
+            last_state.status if last_state is not None else None,
+            (last_state.timestamp or 0) if last_state is not None else 0,
+            order.notification_phone.phone if order.notification_phone is not None else None
+        )
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status == OrderStatus.DONE or self.status == OrderStatus.CANCELED
+
+    def __repr__(self) -> str:
+        return (
+            f"OrderRecord(id={self.id}, car_id={self.car_id}, status={self.status}, "
+            f"timestamp={self.timestamp}, notification_phone={self.notification_phone!r})"
+        )
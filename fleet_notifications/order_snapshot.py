@@ -0,0 +1,76 @@
+import logging, os, struct
+from typing import Iterable
+
+from fleet_management_http_client_python import OrderStatus # type: ignore
+from fleet_notifications.order_record import OrderRecord
+from fleet_notifications.logs import LOGGER_NAME
+
+
+# Header: magic, format version, number of records
+_HEADER = struct.Struct("<4sHI")
+# Record: order ID, car ID, timestamp, length of the status, length of the notification phone
+_RECORD = struct.Struct("<qqqBH")
+_MAGIC = b"FNOS"
+_VERSION = 1
+_NO_PHONE = 0xFFFF
+logger = logging.getLogger(LOGGER_NAME)
+
+
+def snapshot_path(directory: str, site: str = "") -> str:
+    """Path of the snapshot of the site, named like the table of its orders."""
+    return os.path.join(directory, f"orders_{site}.snapshot" if site else "orders.snapshot")
+
+
+def write_snapshot(path: str, records: Iterable[OrderRecord]) -> None:
+    """Write the order records to the file. The file is replaced at once, so a reader never sees
+    a partially written snapshot."""
+    chunks = []
+    for record in records:
+        status = record.status.value.encode() if record.status is not None else b""
+        phone = record.notification_phone.encode() if record.notification_phone is not None else b""
+        chunks.append(_RECORD.pack(
+            record.id, record.car_id, record.timestamp, len(status),
+            len(phone) if record.notification_phone is not None else _NO_PHONE
+        ))
+        chunks.append(status)
+        chunks.append(phone)
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as file:
+        file.write(_HEADER.pack(_MAGIC, _VERSION, len(chunks) // 3))
+        file.write(b"".join(chunks))
+    os.replace(temporary_path, path)
+
+
+def read_snapshot(path: str) -> list[OrderRecord] | None:
+    """Read the order records from the file. Returns None if there is no snapshot or it cannot be read."""
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        logger.warning("Unable to read the order snapshot %s: %s", path, e)
+        return None
+    try:
+        magic, version, n_of_records = _HEADER.unpack_from(data)
+        if magic != _MAGIC or version != _VERSION:
+            logger.warning("Order snapshot %s has an unknown format, it is ignored.", path)
+            return None
+        records = []
+        offset = _HEADER.size
+        for _ in range(n_of_records):
+            order_id, car_id, timestamp, status_length, phone_length = _RECORD.unpack_from(data, offset)
+            offset += _RECORD.size
+            status = OrderStatus(data[offset:offset + status_length].decode()) if status_length else None
+            offset += status_length
+            phone = None
+            if phone_length != _NO_PHONE:
+                phone = data[offset:offset + phone_length].decode()
+                offset += phone_length
+            records.append(OrderRecord(order_id, car_id, status, timestamp, phone))
+        if offset != len(data):
+            raise ValueError(f"expected {offset} bytes, found {len(data)}")
+        return records
+    except (struct.error, ValueError) as e:
+        logger.warning("Order snapshot %s is corrupted, it is ignored: %s", path, e)
+        return None
@@ -0,0 +1,226 @@
+from __future__ import annotations
+import collections, contextlib, contextvars, heapq, itertools, logging, signal, sys, threading, time
+from typing import Iterator
+
+from fleet_notifications import metrics
+from fleet_notifications.script_args.configs import Profiling
+from fleet_notifications.logs import LOGGER_NAME
+
+
+logger = logging.getLogger(LOGGER_NAME)
+
+_current_profile: contextvars.ContextVar[IterationProfile | None] = contextvars.ContextVar(
+    "current_profile", default=None
+)
+_recorder: SlowIterationRecorder | None = None
+
+
+class IterationProfile:
+    """Durations of the phases of a single iteration of a loop (e.g. of the state checker)."""
+
+    __slots__ = ("loop", "labels", "phases", "duration_s", "discarded")
+
+    def __init__(self, loop: str, labels: dict[str, object]):
+        self.loop = loop
+        self.labels = labels
+        self.phases: dict[str, float] = {}
+        self.duration_s = 0.0
+        self.discarded = False
+
+    def add(self, phase: str, duration_s: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + duration_s
+
+    def discard(self) -> None:
+        """Do not record the iteration (e.g. if the iteration did no work)."""
+        self.discarded = True
+
+    def describe(self) -> str:
+        phases = ", ".join(f"{phase}={duration_s * 1000:.1f} ms" for phase, duration_s in self.phases.items())
+        labels = "".join(f" {key}={value}" for key, value in self.labels.items())
+        return f"{self.loop}{labels}: {self.duration_s * 1000:.1f} ms ({phases})"
+
+
+class SlowIterationRecorder:
+    """Records the phase durations of finished iterations as metrics and periodically logs the slowest
+    iterations since the previous dump."""
+
+    def __init__(self, n_of_slowest: int, dump_interval_s: float):
+        self._n_of_slowest = n_of_slowest
+        self._dump_interval_s = dump_interval_s
+        self._slowest: list[tuple[float, int, IterationProfile]] = []
+        self._sequence = itertools.count()
+        self._last_dump = time.monotonic()
+        self._lock = threading.Lock()
+
+
+    def record(self, profile: IterationProfile) -> None:
+        metrics.summary(f"{profile.loop}_iteration_s").observe(profile.duration_s)
+        for phase, duration_s in profile.phases.items():
+            metrics.summary(f"{profile.loop}_phase_{phase}_s").observe(duration_s)
+        if self._n_of_slowest == 0:
+            return
+        with self._lock:
+            entry = (profile.duration_s, next(self._sequence), profile)
+            if len(self._slowest) < self._n_of_slowest:
+                heapq.heappush(self._slowest, entry)
+            else:
+                heapq.heappushpop(self._slowest, entry)
+            if time.monotonic() - self._last_dump < self._dump_interval_s:
+                return
+            slowest, self._slowest = sorted(self._slowest, reverse=True), []
+            self._last_dump = time.monotonic()
+        logger.info(
+            "Slowest iterations in the last %s s:\n%s",
+            self._dump_interval_s, "\n".join(profile.describe() for _, _, profile in slowest)
+        )
+
+
+class SamplingProfiler:
+    """Statistical profiler periodically sampling the call stacks of all threads.
+
+    Stacks are counted in the collapsed format (frames from the outermost, separated by semicolons),
+    which can be turned into a flame graph by the usual tools."""
+
+    def __init__(self, interval_s: float = 0.005):
+        self.interval_s = interval_s
+        self._samples = collections.Counter[str]()
+        self._n_of_samples = 0
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+
+    def start(self) -> None:
+        """Start sampling. Samples from a previous run are discarded."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._samples.clear()
+            self._n_of_samples = 0
+            # Every run has its own event, so a new run does not resume a thread still being stopped
+            self._stopped = threading.Event()
+            self._thread = threading.Thread(
+                target=self._sample_periodically, args=(self._stopped,), daemon=True, name="sampling-profiler"
+            )
+            self._thread.start()
+        logger.info("Sampling profiler started.")
+
+
+    def stop(self) -> None:
+        """Stop sampling and log the most frequent stacks."""
+        with self._lock:
+            if self._thread is None:
+                return
+            self._stopped.set()
+            thread, self._thread = self._thread, None
+        # The sampling thread takes the lock after every sample, so it is joined without holding the lock
+        thread.join()
+        logger.info("Sampling profiler stopped after %s samples. Most frequent stacks:\n%s",
+                    self._n_of_samples, self.format_report())
+
+
+    def toggle(self) -> None:
+        if self.running:
+            self.stop()
+        else:
+            self.start()
+
+
+    def report(self, top: int = 20) -> dict[str, object]:
+        """Return the number of samples and the most frequent stacks with their counts."""
+        with self._lock:
+            most_common = self._samples.most_common(top)
+            n_of_samples = self._n_of_samples
+        return {
+            "running": self.running,
+            "samples": n_of_samples,
+            "stacks": [{"stack": stack, "count": count} for stack, count in most_common],
+        }
+
+
+    def format_report(self, top: int = 20) -> str:
+        report = self.report(top)
+        return "\n".join(f"{entry['count']:>8} {entry['stack']}" for entry in report["stacks"])  # type: ignore
+
+
+    def _sample_periodically(self, stopped: threading.Event) -> None:
+        own_id = threading.get_ident()
+        while not stopped.wait(self.interval_s):
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks = [
+                _collapse_stack(thread_names.get(thread_id, str(thread_id)), frame)
+                for thread_id, frame in sys._current_frames().items() if thread_id != own_id
+            ]
+            with self._lock:
+                self._samples.update(stacks)
+                self._n_of_samples += 1
+
+
+_profiler = SamplingProfiler()
+
+
+def get_profiler() -> SamplingProfiler:
+    """Return the sampling profiler shared by the whole application."""
+    return _profiler
+
+
+def configure_profiling(config: Profiling) -> None:
+    """Set the sampling interval and, if enabled in the configuration, start recording the phase timings
+    of the loop iterations."""
+    global _recorder
+    _profiler.interval_s = config.sample_interval_s
+    _recorder = SlowIterationRecorder(config.slowest_iterations, config.dump_interval_s) if config.use else None
+
+
+def install_signal_handler() -> None:
+    """Toggle the sampling profiler on SIGUSR1. Must be called from the main thread."""
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: _profiler.toggle())
+
+
+@contextlib.contextmanager
+def iteration(loop: str, **labels: object) -> Iterator[IterationProfile | None]:
+    """Time a single iteration of the loop. The durations of the phases run in the block are recorded
+    with the iteration. If the phase timing is disabled, the block is run with no profile."""
+    if _recorder is None:
+        yield None
+        return
+    profile = IterationProfile(loop, labels)
+    token = _current_profile.set(profile)
+    start = time.perf_counter()
+    try:
+        yield profile
+    finally:
+        profile.duration_s = time.perf_counter() - start
+        _current_profile.reset(token)
+        if not profile.discarded:
+            _recorder.record(profile)
+
+
+@contextlib.contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Add the duration of the block to the phase of the current iteration, if there is one."""
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(name, time.perf_counter() - start)
+
+
+def _collapse_stack(thread_name: str, frame) -> str:
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+        frame = frame.f_back
+    frames.append(thread_name)
+    return ";".join(reversed(frames))
@@ -0,0 +1,163 @@
+import logging, random, threading
+from typing import Callable, TypeVar
+
+from twilio.base.exceptions import TwilioRestException # type: ignore
+
+from fleet_notifications import clock, metrics
+from fleet_notifications.script_args.configs import Twilio
+from fleet_notifications.logs import LOGGER_NAME
+
+
+THROTTLING_STATUS_CODES = (429, 503)
+_BACKOFF_BASE_S = 1.0
+_RECOVERY_STEP = 0.1
+logger = logging.getLogger(LOGGER_NAME)
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """Token bucket rate limiter, shared by any number of threads.
+
+    Tokens are refilled continuously at `rate` tokens per second up to `capacity`. The rate can be changed
+    at runtime, which is used by the adaptive backoff."""
+
+    def __init__(self, rate: float, capacity: int):
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = float(capacity)
+        self._last_refill = clock.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    def set_rate(self, rate: float) -> None:
+        with self._lock:
+            self._refill(clock.monotonic())
+            self._rate = rate
+
+    def block_for(self, delay_s: float) -> None:
+        """Do not hand out any tokens for the next `delay_s` seconds."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, clock.monotonic() + delay_s)
+
+    def acquire(self) -> float:
+        """Wait until a token is available and take it. Returns the time spent waiting in seconds."""
+        start = clock.monotonic()
+        while True:
+            with self._lock:
+                now = clock.monotonic()
+                self._refill(now)
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return now - start
+                else:
+                    wait = (1 - self._tokens) / self._rate
+            clock.sleep(wait)
+
+    def try_acquire(self) -> bool:
+        """Take a token if one is available. Returns False instead of waiting if there is none."""
+        with self._lock:
+            now = clock.monotonic()
+            self._refill(now)
+            if now >= self._blocked_until and self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self._capacity, self._tokens + (now - self._last_refill) * self._rate)
+        self._last_refill = now
+
+
+class AdaptiveLimiter:
+    """Token bucket whose rate is halved whenever the server signals throttling and slowly recovers
+    to the configured rate on successful requests (additive increase, multiplicative decrease)."""
+
+    def __init__(self, name: str, rate: float, burst: int, max_backoff_s: float):
+        self.name = name
+        self._configured_rate = rate
+        self._min_rate = rate / 16
+        self._max_backoff_s = max_backoff_s
+        self._bucket = TokenBucket(rate, burst)
+        self._consecutive_throttles = 0
+        self._lock = threading.Lock()
+        self._wait_time = metrics.summary(f"twilio_rate_limiter_{name}_wait_s")
+        self._throttled = metrics.counter(f"twilio_rate_limiter_{name}_throttled")
+
+    @property
+    def rate(self) -> float:
+        return self._bucket.rate
+
+    def acquire(self) -> None:
+        self._wait_time.observe(self._bucket.acquire())
+
+    def on_success(self) -> None:
+        with self._lock:
+            self._consecutive_throttles = 0
+            if self._bucket.rate < self._configured_rate:
+                self._bucket.set_rate(
+                    min(self._configured_rate, self._bucket.rate + self._configured_rate * _RECOVERY_STEP)
+                )
+
+    def on_throttled(self) -> float:
+        """Reduce the request rate and pause the bucket. Returns the applied backoff delay in seconds."""
+        self._throttled.inc()
+        with self._lock:
+            self._consecutive_throttles += 1
+            self._bucket.set_rate(max(self._min_rate, self._bucket.rate / 2))
+            delay = min(self._max_backoff_s, _BACKOFF_BASE_S * 2 ** (self._consecutive_throttles - 1))
+            delay *= random.uniform(0.5, 1.0)
+            self._bucket.block_for(delay)
+        return delay
+
+
+class TwilioRateLimiter:
+    """Rate limiter for the Twilio REST API shared by all call sessions.
+
+    Creating calls and fetching call statuses have separate budgets. Requests rejected by Twilio
+    with one of the `THROTTLING_STATUS_CODES` are retried after an adaptive backoff."""
+
+    def __init__(self, config: Twilio.Notifications.RateLimit):
+        self._max_retries = config.max_retries
+        self.create_limiter = AdaptiveLimiter(
+            "create", config.calls_create_per_s, config.burst, config.max_backoff_s
+        )
+        self.fetch_limiter = AdaptiveLimiter(
+            "fetch", config.calls_fetch_per_s, config.burst, config.max_backoff_s
+        )
+
+
+    def create(self, request: Callable[[], T]) -> T:
+        """Run a request creating a call within the create budget."""
+        return self._run(self.create_limiter, request)
+
+
+    def fetch(self, request: Callable[[], T]) -> T:
+        """Run a request fetching a call within the fetch budget."""
+        return self._run(self.fetch_limiter, request)
+
+
+    def _run(self, limiter: AdaptiveLimiter, request: Callable[[], T]) -> T:
+        attempt = 0
+        while True:
+            limiter.acquire()
+            try:
+                result = request()
+            except TwilioRestException as e:
+                if e.status not in THROTTLING_STATUS_CODES or attempt >= self._max_retries:
+                    raise
+                attempt += 1
+                delay = limiter.on_throttled()
+                logger.warning(
+                    "Twilio throttled the '%s' request (HTTP %s), retrying in %.2f s with rate %.2f/s.",
+                    limiter.name, e.status, delay, limiter.rate
+                )
+                continue
+            limiter.on_success()
+            return result
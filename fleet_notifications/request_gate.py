@@ -0,0 +1,130 @@
+import collections, enum, logging, threading
+from typing import Mapping
+
+from twilio.request_validator import RequestValidator # type: ignore
+
+from fleet_notifications import metrics
+from fleet_notifications.rate_limiter import TokenBucket
+from fleet_notifications.script_args.configs import Twilio
+from fleet_notifications.logs import LOGGER_NAME
+
+
+_PHONE_NUMBER_SEPARATORS = str.maketrans("", "", " \t-.()")
+logger = logging.getLogger(LOGGER_NAME)
+
+
+def normalize_phone_number(phone_number: str) -> str:
+    """Remove the separators people write into phone numbers, so '+420 123-456 789' equals '+420123456789'."""
+    return phone_number.translate(_PHONE_NUMBER_SEPARATORS)
+
+
+class Rejection(enum.Enum):
+    NOT_ALLOWED = "not_allowed"
+    RATE_LIMITED = "rate_limited"
+    INVALID_SIGNATURE = "invalid_signature"
+
+    @property
+    def http_status(self) -> int:
+        return 429 if self == Rejection.RATE_LIMITED else 403
+
+
+class RequestGate:
+    """Decides if a request to the handle-call webhook is let through, with the cheapest checks first.
+
+    1. The caller must be in the allowlist, which is normalized once when the gate is created.
+    2. The Twilio signature is validated by a validator shared by all requests.
+    3. Each client address gets a token bucket, so a single source cannot occupy the worker threads. Only
+       the signed requests take tokens, so requests not sent by Twilio cannot use up the buckets of the genuine
+       ones. Behind a proxy, the address is read from the header the proxy sets (`client_address_header`);
+       otherwise all requests share the bucket of the proxy address.
+
+    Repeated requests with the same `CallSid`, e.g. retried by Twilio, are let through; the call handler
+    answers them with the response to the first request. Rejected requests are counted in the `webhook_rejected_<reason>` metrics."""
+
+    def __init__(
+        self,
+        auth_token: str,
+        allowed_phone_numbers: Mapping[str, str],
+        config: Twilio.CallHandling.RequestGate
+    ):
+        self._validator = RequestValidator(auth_token)
+        self._allowed_phone_numbers = frozenset(normalize_phone_number(number) for number in allowed_phone_numbers)
+        self._requests_per_s = config.requests_per_s
+        self._burst = config.burst
+        self._max_sources = config.max_sources
+        self._client_address_header = config.client_address_header
+        self._buckets: collections.OrderedDict[str, TokenBucket] = collections.OrderedDict()
+        self._buckets_lock = threading.Lock()
+        self._accepted = metrics.counter("webhook_accepted")
+        self._rejected = {rejection: metrics.counter(f"webhook_rejected_{rejection.value}") for rejection in Rejection}
+
+
+    def check(
+        self,
+        url: str,
+        form: Mapping[str, str],
+        values: Mapping[str, str],
+        signature: str,
+        source: str,
+        limit_rate: bool = True
+    ) -> Rejection | None:
+        """Check the request to `url` with the POST parameters `form`, all parameters `values` and
+        the `X-Twilio-Signature` header, sent from the `source` address. Returns the reason of the rejection,
+        or None if the request is accepted. The rate of the requests is not limited if `limit_rate` is False."""
+        rejection = self._check(url, form, values, signature, source, limit_rate)
+        if rejection is None:
+            self._accepted.inc()
+        else:
+            self._rejected[rejection].inc()
+            logger.debug("Request to the handle-call endpoint from %s rejected: %s.", source, rejection.value)
+        return rejection
+
+
+    def client_address(self, remote_address: str, headers: Mapping[str, str]) -> str:
+        """Address of the client the request came from. If the client address header is configured, its last
+        address is used, which is the one added by the proxy in front of the service; the addresses before it
+        are sent by the client and cannot be trusted."""
+        if self._client_address_header:
+            addresses = [address.strip() for address in headers.get(self._client_address_header, "").split(",")]
+            if addresses[-1]:
+                return addresses[-1]
+        return remote_address
+
+
+    def set_allowed_phone_numbers(self, allowed_phone_numbers: Mapping[str, str]) -> None:
+        """Replace the allowlist. The requests being checked use either the old or the new allowlist."""
+        self._allowed_phone_numbers = frozenset(normalize_phone_number(number) for number in allowed_phone_numbers)
+
+
+    def is_allowed(self, phone_number: str) -> bool:
+        return normalize_phone_number(phone_number) in self._allowed_phone_numbers
+
+
+    def _check(
+        self,
+        url: str,
+        form: Mapping[str, str],
+        values: Mapping[str, str],
+        signature: str,
+        source: str,
+        limit_rate: bool
+    ) -> Rejection | None:
+        if not self.is_allowed(values.get("From", "")):
+            return Rejection.NOT_ALLOWED
+        if not self._validator.validate(url, form, signature):
+            return Rejection.INVALID_SIGNATURE
+        if limit_rate and not self._bucket(source).try_acquire():
+            return Rejection.RATE_LIMITED
+        return None
+
+
+    def _bucket(self, source: str) -> TokenBucket:
+        with self._buckets_lock:
+            bucket = self._buckets.get(source)
+            if bucket is None:
+                bucket = self._buckets[source] = TokenBucket(self._requests_per_s, self._burst)
+                if len(self._buckets) > self._max_sources:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(source)
+            return bucket
@@ -1,4 +1,4 @@
-from .args import request_and_get_script_arguments, PositionalArgInfo
+from .args import request_and_get_script_arguments, load_script_config, PositionalArgInfo
 
 from .configs import (
     ScriptConfig,
@@ -21,6 +21,7 @@ class PositionalArgInfo:
 class ScriptArgs:
     argvals: dict[str, str | bool]
     config: _ScriptConfig
+    config_path: str = ""
 
 
 def request_and_get_script_arguments(
@@ -96,20 +97,25 @@ def load_config_file(path: str) -> dict[str, Any]:
         raise ValueError(f"Error when loading the config file: {e}")
 
 
+def load_script_config(config_path: str, argvals: dict[str, Any]) -> _ScriptConfig:
+    """Load and validate the configuration file and update it with the database arguments in `argvals`."""
+    config_dict = load_config_file(config_path)
+    config = _ScriptConfig(**config_dict)
+    _update_config_with_args(argvals, config)
+    return config
+
+
 def _parse_arguments(parser: argparse.ArgumentParser) -> ScriptArgs:
     args = parser.parse_args().__dict__
     config_path = args.pop("<config-file-path>")
     try:
-        config_dict = load_config_file(config_path)
-        config = _ScriptConfig(**config_dict)
-        _update_config_with_args(args, config)
-        return ScriptArgs(args, config)
+        return ScriptArgs(args, load_script_config(config_path, args), config_path)
 
     except ConfigFileNotFound as e:
-        logging.error(f"Configuration file not found. {e}")
+        logging.error("Configuration file not found. %s", e)
         raise
     except Exception as e:
-        logging.error(f"Check the configuration file ('{config_path}'). {e}")
+        logging.error("Check the configuration file ('%s'). %s", config_path, e)
         raise e
 
 
@@ -5,19 +5,53 @@ import pydantic
 
 
 LoggingLevel = Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+LogFormat = Literal["text", "json"]
 
 
 class ScriptConfig(pydantic.BaseModel):
     logging: Logging
     http_server: HTTPServer
-    fleet_management_server: FleetManagementServer
+    fleet_management_server: FleetManagementServer | list[FleetManagementServer]
     twilio: Twilio
     database: Database
+    tracing: Tracing = pydantic.Field(default_factory=lambda: Tracing())
+    profiling: Profiling = pydantic.Field(default_factory=lambda: Profiling())
+    health: Health = pydantic.Field(default_factory=lambda: Health())
+    shutdown: Shutdown = pydantic.Field(default_factory=lambda: Shutdown())
+    order_snapshot: OrderSnapshot = pydantic.Field(default_factory=lambda: OrderSnapshot())
+
+    @property
+    def fleet_management_servers(self) -> list[FleetManagementServer]:
+        """The Fleet Management servers of all sites watched by the service."""
+        if isinstance(self.fleet_management_server, list):
+            return self.fleet_management_server
+        return [self.fleet_management_server]
+
+    @pydantic.field_validator("fleet_management_server")
+    @classmethod
+    def validate_site_names(
+        cls, servers: FleetManagementServer | list[FleetManagementServer]
+    ) -> FleetManagementServer | list[FleetManagementServer]:
+        if isinstance(servers, list):
+            if not servers:
+                raise ValueError("At least one Fleet Management server must be configured.")
+            names = [server.name for server in servers]
+            if len(servers) > 1 and not all(names):
+                raise ValueError("Every Fleet Management server must have a name if more servers are configured.")
+            if len(set(names)) != len(names):
+                raise ValueError("Names of the Fleet Management servers must be unique.")
+        return servers
 
 
 class Logging(pydantic.BaseModel):
+    class QueueConfig(pydantic.BaseModel):
+        use: bool = False
+        max_size: pydantic.PositiveInt = 10000
+
     console: HandlerConfig
     file: HandlerConfig
+    queue: QueueConfig = pydantic.Field(default_factory=QueueConfig)
+    format: LogFormat = "text"
 
     class HandlerConfig(pydantic.BaseModel):
         level: LoggingLevel
@@ -32,11 +66,24 @@ class Logging(pydantic.BaseModel):
 
 class HTTPServer(pydantic.BaseModel):
     port: pydantic.PositiveInt
+    admin_api_key: str = ""
 
 
 class FleetManagementServer(pydantic.BaseModel):
+    class LongPoll(pydantic.BaseModel):
+        request_timeout_s: pydantic.PositiveFloat = 90.0
+        backoff_base_s: pydantic.PositiveFloat = 0.5
+        backoff_max_s: pydantic.PositiveFloat = 30.0
+        failure_threshold: pydantic.PositiveInt = 5
+        circuit_open_s: pydantic.PositiveFloat = 30.0
+        catch_up_page_size: pydantic.PositiveInt = 100
+        order_fetch_workers: pydantic.PositiveInt = 8
+
     base_uri: pydantic.AnyUrl
     api_key: str
+    name: str = pydantic.Field(default="", pattern=r"^[a-z0-9_]*$", max_length=50)
+    long_poll: LongPoll = pydantic.Field(default_factory=LongPoll)
+    single_flight_ttl_s: pydantic.NonNegativeFloat = 0.0
 
 
 class Twilio(pydantic.BaseModel):
@@ -47,13 +94,70 @@ class Twilio(pydantic.BaseModel):
     call_handling: CallHandling
 
     class Notifications(pydantic.BaseModel):
+        class RateLimit(pydantic.BaseModel):
+            calls_create_per_s: pydantic.PositiveFloat = 1.0
+            calls_fetch_per_s: pydantic.PositiveFloat = 10.0
+            burst: pydantic.PositiveInt = 1
+            max_retries: pydantic.NonNegativeInt = 3
+            max_backoff_s: pydantic.PositiveFloat = 30.0
+
+        class Dispatcher(pydantic.BaseModel):
+            workers: pydantic.PositiveInt = 8
+            reserved_admin_workers: pydantic.NonNegativeInt = 1
+            admin_weight: pydantic.PositiveInt = 6
+            customer_weight: pydantic.PositiveInt = 3
+            test_weight: pydantic.PositiveInt = 1
+
         play_sound_url: pydantic.AnyUrl
         repeated_calls: pydantic.PositiveInt
         call_status_timeout_s: pydantic.PositiveInt
+        rate_limit: RateLimit = pydantic.Field(default_factory=RateLimit)
+        dispatcher: Dispatcher = pydantic.Field(default_factory=Dispatcher)
 
     class CallHandling(pydantic.BaseModel):
+        class RequestGate(pydantic.BaseModel):
+            requests_per_s: pydantic.PositiveFloat = 0.5
+            burst: pydantic.PositiveInt = 10
+            max_sources: pydantic.PositiveInt = 10000
+            client_address_header: str = ""
+
+        class Idempotency(pydantic.BaseModel):
+            ttl_s: pydantic.PositiveFloat = 3600.0
+            wait_s: pydantic.PositiveFloat = 10.0
+
         car_action_change_timeout_s: pydantic.PositiveInt
         allowed_incoming_phone_numbers: dict[str, str]
+        request_gate: RequestGate = pydantic.Field(default_factory=RequestGate)
+        idempotency: Idempotency = pydantic.Field(default_factory=Idempotency)
+        async_mode: bool = False
+        async_workers: pydantic.PositiveInt = 16
+
+
+class Tracing(pydantic.BaseModel):
+    use: bool = False
+    path: str = "./log/traces.jsonl"
+
+
+class Profiling(pydantic.BaseModel):
+    use: bool = False
+    slowest_iterations: pydantic.NonNegativeInt = 5
+    dump_interval_s: pydantic.PositiveFloat = 300.0
+    sample_interval_s: pydantic.PositiveFloat = 0.005
+
+
+class Health(pydantic.BaseModel):
+    max_poll_age_s: pydantic.PositiveFloat = 120.0
+    max_queue_depth: pydantic.PositiveInt = 1000
+    db_check_interval_s: pydantic.PositiveFloat = 10.0
+
+
+class Shutdown(pydantic.BaseModel):
+    timeout_s: pydantic.PositiveFloat = 25.0
+
+
+class OrderSnapshot(pydantic.BaseModel):
+    directory: str = ""
+    interval_s: pydantic.PositiveFloat = 60.0
 
 
 class Database(pydantic.BaseModel):
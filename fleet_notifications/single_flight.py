@@ -0,0 +1,88 @@
+import collections, threading
+from typing import Callable, Generic, Hashable, TypeVar
+
+from fleet_notifications import clock, metrics
+
+
+K = TypeVar("K", bound=Hashable)
+T = TypeVar("T")
+
+
+class _Call(Generic[T]):
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: T | None = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight(Generic[K, T]):
+    """Runs a function at most once at a time for each key.
+
+    Callers with the key of a call in progress wait for it and get its result, or its exception. If `ttl_s`
+    is set, the result is also returned to the callers with the same key for `ttl_s` seconds after the call
+    finished; at most `max_size` results are kept. Failed calls are not remembered.
+
+    If `name` is set, the calls run and the calls sharing the result of another call are counted
+    in the `single_flight_<name>_executed` and `single_flight_<name>_shared` metrics."""
+
+    def __init__(self, ttl_s: float = 0.0, max_size: int = 10000, name: str = ""):
+        self._ttl_s = ttl_s
+        self._max_size = max_size
+        self._in_flight: dict[K, _Call[T]] = {}
+        self._results: collections.OrderedDict[K, tuple[float, T]] = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._executed = metrics.counter(f"single_flight_{name}_executed") if name else None
+        self._shared = metrics.counter(f"single_flight_{name}_shared") if name else None
+
+
+    def do(self, key: K, function: Callable[[], T]) -> T:
+        """Return the result of `function`, or of the call with the same `key` in progress or remembered."""
+        with self._lock:
+            now = clock.monotonic()
+            self._remove_expired(now)
+            if key in self._results:
+                self._count(self._shared)
+                return self._results[key][1]
+            call = self._in_flight.get(key)
+            leader = call is None
+            if call is None:
+                call = self._in_flight[key] = _Call()
+
+        if not leader:
+            self._count(self._shared)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result  # type: ignore
+
+        self._count(self._executed)
+        try:
+            call.result = function()
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self._in_flight.pop(key, None)
+            raise
+        finally:
+            call.done.set()
+        with self._lock:
+            self._in_flight.pop(key, None)
+            if self._ttl_s > 0:
+                self._results[key] = (clock.monotonic() + self._ttl_s, call.result)
+                if len(self._results) > self._max_size:
+                    self._results.popitem(last=False)
+        return call.result
+
+
+    def _remove_expired(self, now: float) -> None:
+        # All results have the same TTL, so they expire in the order they were added
+        while self._results and next(iter(self._results.values()))[0] <= now:
+            self._results.popitem(last=False)
+
+
+    @staticmethod
+    def _count(counter: metrics.Counter | None) -> None:
+        if counter is not None:
+            counter.inc()
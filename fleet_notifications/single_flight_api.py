@@ -0,0 +1,94 @@
+import threading, weakref
+from typing import Any, Callable, NamedTuple, TypeVar
+
+from fleet_management_http_client_python import ApiClient, CarApi, CarStateApi, OrderApi # type: ignore
+from fleet_notifications.single_flight import SingleFlight
+
+
+T = TypeVar("T")
+
+
+class _Flights(NamedTuple):
+    # Requests for the cars, whose results can be reused for a while
+    cars: SingleFlight[tuple, Any]
+    # Requests whose callers need the current data, e.g. the orders a new state belongs to or the car state
+    # polled until a transition finishes; only the requests in progress at the same time are shared
+    current: SingleFlight[tuple, Any]
+
+
+# The requests of all APIs created for a client share the in-flight calls, e.g. the state checker
+# and the handlers of the incoming calls asking for the same car at the same moment
+_flights: weakref.WeakKeyDictionary[ApiClient, _Flights] = weakref.WeakKeyDictionary()
+_flights_lock = threading.Lock()
+
+
+def _create_flights(cars_ttl_s: float) -> _Flights:
+    return _Flights(SingleFlight(ttl_s=cars_ttl_s, name="fleet_api"), SingleFlight(name="fleet_api"))
+
+
+def configure_single_flight(api_client: ApiClient, ttl_s: float) -> None:
+    """Share the results of the requests of the client for cars with identical requests for `ttl_s` seconds
+    after they finished. Must be called before the APIs of the client are created; without it, only identical
+    requests in progress at the same time are shared, which is always the case for orders and car states."""
+    with _flights_lock:
+        _flights[api_client] = _create_flights(ttl_s)
+
+
+def _flights_of(api_client: ApiClient) -> _Flights:
+    with _flights_lock:
+        flights = _flights.get(api_client)
+        if flights is None:
+            flights = _flights[api_client] = _create_flights(0.0)
+        return flights
+
+
+def _share(flight: SingleFlight[tuple, Any], request: Callable[..., T], args: tuple, kwargs: dict[str, Any]) -> T:
+    """Send the request, or wait for the identical request in progress and return its result."""
+    key = (request.__qualname__, args, tuple(sorted(kwargs.items())))
+    try:
+        hash(key)
+    except TypeError:
+        return request(*args, **kwargs)
+    return flight.do(key, lambda: request(*args, **kwargs))
+
+
+class SingleFlightCarApi(CarApi):
+    """CarApi whose identical concurrent requests share a single HTTP request. The returned models are
+    shared by the callers and must not be modified."""
+
+    def __init__(self, api_client: ApiClient | None = None):
+        super().__init__(api_client)
+        self._flights = _flights_of(self.api_client)
+
+    def get_car(self, *args, **kwargs):
+        return _share(self._flights.cars, super().get_car, args, kwargs)
+
+    def get_cars(self, *args, **kwargs):
+        return _share(self._flights.cars, super().get_cars, args, kwargs)
+
+
+class SingleFlightOrderApi(OrderApi):
+    """OrderApi whose identical concurrent requests share a single HTTP request. The returned models are
+    shared by the callers and must not be modified."""
+
+    def __init__(self, api_client: ApiClient | None = None):
+        super().__init__(api_client)
+        self._flights = _flights_of(self.api_client)
+
+    def get_order(self, *args, **kwargs):
+        return _share(self._flights.current, super().get_order, args, kwargs)
+
+    def get_orders(self, *args, **kwargs):
+        return _share(self._flights.current, super().get_orders, args, kwargs)
+
+
+class SingleFlightCarStateApi(CarStateApi):
+    """CarStateApi whose identical concurrent requests share a single HTTP request. The returned models are
+    shared by the callers and must not be modified."""
+
+    def __init__(self, api_client: ApiClient | None = None):
+        super().__init__(api_client)
+        self._flights = _flights_of(self.api_client)
+
+    def get_car_states(self, *args, **kwargs):
+        return _share(self._flights.current, super().get_car_states, args, kwargs)
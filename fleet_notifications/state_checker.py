@@ -1,10 +1,18 @@
-import logging, threading, time
+import logging, threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator
 
 import fleet_notifications.database.database_controller as notifications_db
-from fleet_management_http_client_python import ApiClient, CarApi, Order, OrderApi, OrderStateApi, OrderStatus, OrderState # type: ignore
+from fleet_management_http_client_python import ApiClient, Order, OrderStateApi, OrderStatus, OrderState # type: ignore
 from fleet_notifications.notifications_client import NotificationClient
-from fleet_notifications.script_args.configs import Twilio
-from fleet_notifications.logs import LOGGER_NAME
+from fleet_notifications.order_record import OrderRecord
+from fleet_notifications.order_snapshot import read_snapshot, snapshot_path, write_snapshot
+from fleet_notifications.single_flight_api import SingleFlightCarApi, SingleFlightOrderApi
+from fleet_notifications.notification_dispatcher import NotificationDispatcher, NotificationPriority
+from fleet_notifications import clock, profiling, tracing
+from fleet_notifications.long_poll import LongPollClient, classify_failure
+from fleet_notifications.script_args.configs import FleetManagementServer, OrderSnapshot, Twilio
+from fleet_notifications.logs import LOGGER_NAME, log_context
 
 
 THREAD_RESTART_DELAY = 2
@@ -12,143 +20,432 @@ logger = logging.getLogger(LOGGER_NAME)
 
 
 class OrderStateChecker:
-    def __init__(self, twilio_config: Twilio, api_client: ApiClient):
-        self.notification_client = NotificationClient(twilio_config)
-        self.car_api = CarApi(api_client)
-        self.order_api = OrderApi(api_client)
+    def __init__(
+        self,
+        twilio_config: Twilio,
+        api_client: ApiClient,
+        dispatcher: NotificationDispatcher | None = None,
+        long_poll_config: FleetManagementServer.LongPoll | None = None,
+        site: str = "",
+        snapshot_config: OrderSnapshot | None = None
+    ):
+        if dispatcher is None:
+            self.notification_client = NotificationClient(twilio_config)
+            self.dispatcher = NotificationDispatcher(self.notification_client, twilio_config.notifications.dispatcher)
+        else:
+            # Checkers of all sites share the dispatcher and the Twilio client with its rate limits
+            self.notification_client = dispatcher.notification_client
+            self.dispatcher = dispatcher
+        self.site = site
+        self.car_api = SingleFlightCarApi(api_client)
+        self.order_api = SingleFlightOrderApi(api_client)
         self.order_state_api = OrderStateApi(api_client)
-        self.orders = dict[int, Order]()
-        self.thread = threading.Thread(target=self._start, daemon=True)
+        self.orders = dict[int, OrderRecord]()
+        self._orders_high_water = 0
+        # Orders loaded without the snapshot record, fetched from the API when their states arrive
+        self._unreconciled_order_ids = set[int]()
+        snapshot_config = snapshot_config or OrderSnapshot()
+        self._snapshot_path = snapshot_path(snapshot_config.directory, site) if snapshot_config.directory else None
+        self._snapshot_interval_s = snapshot_config.interval_s
+        self._snapshot_saved_at = clock.monotonic()
+        self.thread = threading.Thread(target=self._start, daemon=True, name=f"state-checker-{site}".rstrip("-"))
+        self.since = 0
+        self.last_poll_at: float | None = None
+        self.consecutive_errors = 0
+        self._stopped = threading.Event()
+        self._processing_lock = threading.Lock()
+        long_poll_config = long_poll_config or FleetManagementServer.LongPoll()
+        self.long_poll = LongPollClient(long_poll_config, self._stopped)
+        self._catch_up_page_size = long_poll_config.catch_up_page_size
+        self._order_fetch_executor = ThreadPoolExecutor(
+            max_workers=long_poll_config.order_fetch_workers,
+            thread_name_prefix=f"order-fetch-{site}".rstrip("-")
+        )
 
 
     def _load_unfinished_orders(self) -> int:
         """Loads all unfinished orders from the database and returns the timestamp of the newest order."""
-        db_orders = notifications_db.get_orders()
+        db_orders = notifications_db.get_orders(self.site)
+        snapshot = read_snapshot(self._snapshot_path) if self._snapshot_path is not None else None
+        if snapshot is not None:
+            return self._load_orders_from_snapshot(db_orders, snapshot)
         for order in db_orders:
             try:
-                self.orders[order.id] = self.order_api.get_order(car_id=order.car_id, order_id=order.id)
+                self.orders[order.id] = OrderRecord.from_order(
+                    self.order_api.get_order(car_id=order.car_id, order_id=order.id)
+                )
             except Exception as e:
-                logger.warning(f"Unable to get order {order.id} from the api: {e}")
-                notifications_db.delete_order(order.id)
+                logger.warning("Unable to get order %s from the api: %s", order.id, e)
+                notifications_db.delete_order(order.id, self.site)
                 continue
+        return max((order.timestamp for order in self.orders.values()), default=0)
+
+
+    def _load_orders_from_snapshot(self, db_orders: list[Order], snapshot: list[OrderRecord]) -> int:
+        """Loads the unfinished orders from the snapshot of the order cache, without requests to the API,
+        and returns the timestamp of the newest order. The database decides which orders are unfinished;
+        orders missing in the snapshot are fetched from the API when their states arrive."""
+        records = {record.id: record for record in snapshot}
+        for order in db_orders:
+            record = records.get(order.id)
+            if record is None:
+                record = OrderRecord(order.id, order.car_id, None, order.timestamp or 0, None)
+                self._unreconciled_order_ids.add(order.id)
+            self.orders[order.id] = record
+        logger.info(
+            "Loaded %s orders from the snapshot, %s orders will be fetched when their states arrive.",
+            len(self.orders) - len(self._unreconciled_order_ids), len(self._unreconciled_order_ids)
+        )
         return max(
-            self.orders.values(),
-            key=lambda order: order.last_state.timestamp
-        ).last_state.timestamp if self.orders else 0
+            (max(order.timestamp or 0, self.orders[order.id].timestamp) for order in db_orders), default=0
+        )
 
 
-    def _is_order_finished(self, order: Order) -> bool:
+    def _save_snapshot(self) -> None:
+        """Writes the snapshot of the order cache, if the snapshot is enabled."""
+        if self._snapshot_path is None:
+            return
+        self._snapshot_saved_at = clock.monotonic()
+        try:
+            write_snapshot(self._snapshot_path, (
+                order for order in self.orders.values() if order.id not in self._unreconciled_order_ids
+            ))
+        except OSError as e:
+            logger.warning("Unable to write the order snapshot %s: %s", self._snapshot_path, e)
+
+
+    def _is_order_finished(self, order: OrderRecord) -> bool:
         """Returns true if the order is finished."""
-        return order.last_state.status == OrderStatus.DONE or order.last_state.status == OrderStatus.CANCELED
+        return order.is_finished
+
 
+    def _needs_order_fetch(self, state: OrderState) -> bool:
+        """Returns true if the order of the state is fetched from the API by the checks of the state."""
+        order = self.orders.get(state.order_id)
+        return (
+            order is None or state.order_id in self._unreconciled_order_ids or state.status == OrderStatus.CANCELED
+            or (state.status == OrderStatus.DONE and order.status != OrderStatus.DONE)
+        )
+
+
+    def _prefetch_orders(
+        self, states: Iterable[OrderState], all_orders: dict[int, Order]
+    ) -> dict[int, Order | Exception]:
+        """Fetches the orders the checks of the states need from the API concurrently. Returns the orders,
+        or the exceptions raised when fetching them, by their IDs."""
+        car_ids = {
+            state.order_id: all_orders[state.order_id].car_id
+            for state in states if state.order_id in all_orders and self._needs_order_fetch(state)
+        }
+        if len(car_ids) < 2:
+            # A single order is fetched by its check, without the round-trip to the pool
+            return {}
+
+        def fetch(order_id: int) -> Order | Exception:
+            try:
+                return self.order_api.get_order(car_id=car_ids[order_id], order_id=order_id)
+            except Exception as e:
+                return e
 
-    def _check_if_order_is_new(self, car_id: int, state: OrderState, admin_phone: str, under_test: bool) -> bool:
+        with tracing.span("orders.prefetch", n_of_orders=len(car_ids)), profiling.phase("fetch_orders"):
+            return dict(zip(car_ids, self._order_fetch_executor.map(fetch, car_ids)))
+
+
+    def _get_order(self, car_id: int, order_id: int, prefetched: dict[int, Order | Exception] | None) -> Order:
+        """Returns the prefetched order, or fetches it from the API. Raises the exception of a failed prefetch."""
+        order = prefetched.get(order_id) if prefetched is not None else None
+        if order is None:
+            with profiling.phase("fetch_orders"):
+                return self.order_api.get_order(car_id=car_id, order_id=order_id)
+        if isinstance(order, Exception):
+            raise order
+        return order
+
+
+    def _check_if_order_is_new(
+        self,
+        car_id: int,
+        state: OrderState,
+        admin_phone: str,
+        under_test: bool,
+        prefetched: dict[int, Order | Exception] | None = None
+    ) -> bool:
         """Adds the order belonging to the state to the list of orders. If the order is the first new one,
-        a notification is sent to the admin phone number. Returns false if the order can't be retrieved."""
+        a notification is sent to the admin phone number. Returns false if the order can't be retrieved.
+        Orders in `prefetched` are used instead of fetching them from the API."""
         no_active_order = car_id not in (order.car_id for order in self.orders.values())
-        if state.order_id not in self.orders or state.status == OrderStatus.CANCELED:
+        if (state.order_id not in self.orders or state.order_id in self._unreconciled_order_ids
+                or state.status == OrderStatus.CANCELED):
             try:
-                self.orders[state.order_id] = self.order_api.get_order(car_id=car_id, order_id=state.order_id)
+                order = OrderRecord.from_order(self._get_order(car_id, state.order_id, prefetched))
             except Exception as e:
-                logger.warning(f"Unable to get order with ID {state.order_id} from the api: {e}")
+                logger.warning("Unable to get order with ID %s from the api: %s", state.order_id, e)
                 return False
+            if state.order_id in self._unreconciled_order_ids:
+                self._reconcile_order(self.orders[state.order_id], order)
+            else:
+                self.orders[state.order_id] = order
 
         if (no_active_order and not self._is_order_finished(self.orders[state.order_id])):
-            logger.info(f"New mission started for car (ID={car_id}).")
-            threading.Thread(target=self.notification_client.call_phone, daemon=True,
-                             args=(admin_phone, under_test,)).start()
+            logger.info("New mission started for car (ID=%s).", car_id)
+            with profiling.phase("dispatch"):
+                self.dispatcher.dispatch(admin_phone, under_test, NotificationPriority.ADMIN, state.timestamp)
         return True
 
 
-    def _call_phone_if_order_is_done(self, car_id: int, state: OrderState, under_test: bool) -> None:
-        """Checks if the order is newly done and sends a notification to the phone number in the order."""
-        if self.orders[state.order_id].last_state.status != OrderStatus.DONE and state.status == OrderStatus.DONE:
-            logger.info(f"Order {state.order_id} is done.")
-            try:
-                self.orders[state.order_id] = self.order_api.get_order(car_id=car_id, order_id=state.order_id)
-            except Exception as e:
-                logger.warning(f"Unable to get order with ID {state.order_id} from the api: {e}")
-                return
+    def _reconcile_order(self, placeholder: OrderRecord, order: OrderRecord) -> None:
+        """Fills in the placeholder of an order loaded without the snapshot record. A DONE status is not taken
+        over, as the order might have been finished while the service was not running; the done check fetches
+        the order again and notifies the customer."""
+        placeholder.car_id = order.car_id
+        placeholder.notification_phone = order.notification_phone
+        if order.status != OrderStatus.DONE:
+            placeholder.status = order.status
+            placeholder.timestamp = order.timestamp
+        self._unreconciled_order_ids.discard(order.id)
 
-            notification_phone = self.orders[state.order_id].notification_phone
-            if(notification_phone is None):
-                logger.warning(f"Order {state.order_id} has no notification phone number.")
-                return
 
-            threading.Thread(target=self.notification_client.call_phone, daemon=True, args=(
-                             notification_phone.phone, under_test,)).start()
+    def _call_phone_if_order_is_done(
+        self,
+        car_id: int,
+        state: OrderState,
+        under_test: bool,
+        prefetched: dict[int, Order | Exception] | None = None
+    ) -> None:
+        """Checks if the order is newly done and sends a notification to the phone number in the order.
+        Orders in `prefetched` are used instead of fetching them from the API."""
+        if self.orders[state.order_id].status != OrderStatus.DONE and state.status == OrderStatus.DONE:
+            logger.info("Order %s is done.", state.order_id)
+            with tracing.span("notification.decision", order_id=state.order_id):
+                try:
+                    self.orders[state.order_id] = OrderRecord.from_order(
+                        self._get_order(car_id, state.order_id, prefetched)
+                    )
+                except Exception as e:
+                    logger.warning("Unable to get order with ID %s from the api: %s", state.order_id, e)
+                    return
+
+                notification_phone = self.orders[state.order_id].notification_phone
+                if(notification_phone is None):
+                    logger.warning("Order %s has no notification phone number.", state.order_id)
+                    return
+
+                with profiling.phase("dispatch"):
+                    self.dispatcher.dispatch(
+                        notification_phone, under_test, NotificationPriority.CUSTOMER, state.timestamp
+                    )
 
 
     def _remove_finished_orders(self) -> None:
         """Removes finished orders from the list and the database."""
+        self._orders_high_water = max(self._orders_high_water, len(self.orders))
         finished_order_ids = [order.id for order in self.orders.values() if self._is_order_finished(order)]
-        active_order_ids = [order.id for order in self.order_api.get_orders()]
+        with profiling.phase("fetch_orders"):
+            active_order_ids = {order.id for order in self.order_api.get_orders()}
         deleted_order_ids = [
             order.id for order in self.orders.values() if order.id not in active_order_ids
         ]
-        for order_id in finished_order_ids + deleted_order_ids:
-            if order_id in self.orders:
-                self.orders.pop(order_id)
-            notifications_db.delete_order(order_id)
+        with profiling.phase("db_writes"):
+            for order_id in finished_order_ids + deleted_order_ids:
+                if order_id in self.orders:
+                    self.orders.pop(order_id)
+                    self._unreconciled_order_ids.discard(order_id)
+                notifications_db.delete_order(order_id, self.site)
+        if len(self.orders) * 4 < self._orders_high_water:
+            # A dict does not shrink when its items are removed, a copy releases the memory of evicted orders
+            self.orders = dict(self.orders)
+            self._orders_high_water = len(self.orders)
 
 
     def _update_latest_timestamps(self, since: int) -> None:
         """If an order is not finished, the since parameter is used as its latest timestamp.
         Finished orders are removed from the database."""
         orders_to_update = [order for order in self.orders.values() if not self._is_order_finished(order)]
-        for order in orders_to_update:
-            notifications_db.update_order(order.id, order.car_id, since)
+        with profiling.phase("db_writes"):
+            for order in orders_to_update:
+                notifications_db.update_order(order.id, order.car_id, since, self.site)
 
 
     def _start(self) -> None:
         """Starts checking order states on the Fleet Management API and triggers notifications when needed.
-        This function runs indefinitely and should be run in a separate thread. If an error occurs,
+        This function runs until the checker is stopped and should be run in a separate thread. If an error occurs,
         the function will sleep for a few seconds and then restart."""
+        with log_context(**({"site": self.site} if self.site else {})):
+            self._check_order_states()
+
+
+    def _check_order_states(self) -> None:
         since = self._load_unfinished_orders()
+        self.since = since
+        caught_up = False
 
-        while True:
+        while not self._stopped.is_set():
             try:
-                states: dict[int, OrderState] = {
-                    state.order_id: state
-                    for state in self.order_state_api.get_all_order_states(wait=True, since=since+1)
-                }
-                if states:
-                    since = max(states.values(), key=lambda state: state.timestamp).timestamp
-                    self._check_orders_and_call_if_done(states)
-                    self._remove_finished_orders()
-                    self._update_latest_timestamps(since)
+                if not caught_up:
+                    # A failed catch-up is resumed from the last processed page
+                    since = self._catch_up(self.since)
+                    caught_up = self.long_poll.responded
+                    continue
+                with tracing.span("checker.iteration", since=since) as iteration_span:
+                    with tracing.span("order_states.long_poll"):
+                        states: dict[int, OrderState] = {
+                            state.order_id: state
+                            for state in self.long_poll.poll(
+                                lambda timeout_s: self.order_state_api.get_all_order_states(
+                                    wait=True, since=since+1, _request_timeout=timeout_s
+                                )
+                            )
+                        }
+                    if self.long_poll.responded:
+                        self.last_poll_at = clock.monotonic()
+                    if iteration_span is not None:
+                        iteration_span.set_attribute("n_of_states", len(states))
+                    with self._processing_lock:
+                        # States received after the stop are not processed, they are fetched again after restart
+                        if states and not self._stopped.is_set():
+                            # The iteration is timed from the arrival of the states, as the long poll mostly waits
+                            # for them and its duration would hide the cost of processing them
+                            with profiling.iteration("checker", states=len(states)), \
+                                    tracing.span("order_states.process"):
+                                since = self._process_states(states)
+                            self.since = since
+                    self.consecutive_errors = 0
 
             except KeyboardInterrupt:
                 logger.info("Exiting the script.")
                 return
             except Exception as e:
-                logger.error(f"Unknown error: {e}, restarting.", exc_info=True)
-                time.sleep(THREAD_RESTART_DELAY)
+                if classify_failure(e) is None:
+                    logger.error("Unknown error: %s, restarting.", e, exc_info=True)
+                else:
+                    logger.warning("Request to the Fleet Management API failed: %s, restarting.", e)
+                self.consecutive_errors += 1
+                clock.wait(self._stopped, THREAD_RESTART_DELAY)
+
+
+    def _catch_up(self, since: int) -> int:
+        """Processes the states created since the `since` timestamp, while the checker was not running,
+        before the live long polling starts. Only the latest state of every order is requested and the states
+        are processed in pages from the oldest; the `since` watermark is saved after every page, so the
+        notifications resume page by page. Returns the timestamp of the newest processed state.
+
+        The request is sent by the long-poll client, so a failure is followed by its backoff and counted by its
+        circuit breaker; the catch-up is then repeated, which the client tells by not having responded."""
+        with tracing.span("checker.catch_up", since=since):
+            states = self.long_poll.poll(
+                lambda timeout_s: self.order_state_api.get_all_order_states(
+                    since=since+1, last_n=1, _request_timeout=timeout_s
+                )
+            )
+        if states:
+            logger.info("Catching up on %s order states since %s.", len(states), since)
+        for page in self._pages(states, self._catch_up_page_size):
+            with self._processing_lock:
+                if self._stopped.is_set():
+                    break
+                with profiling.iteration("catch_up", states=len(page)), tracing.span("order_states.process"):
+                    since = self._process_states(page)
+                self.since = since
+        return self.since
+
+
+    @staticmethod
+    def _pages(states: Iterable[OrderState], page_size: int) -> Iterator[dict[int, OrderState]]:
+        """Yields the states sorted by their timestamps in batches of at most `page_size` orders."""
+        page: dict[int, OrderState] = {}
+        for state in sorted(states, key=lambda state: state.timestamp):
+            if state.order_id not in page and len(page) == page_size:
+                yield page
+                page = {}
+            page[state.order_id] = state
+        if page:
+            yield page
+
+
+    def _process_states(self, states: dict[int, OrderState]) -> int:
+        """Processes a non-empty batch of new states received from the API and returns the timestamp
+        of the newest state, which is used as the `since` parameter of the next request."""
+        start = clock.monotonic()
+        since = max(states.values(), key=lambda state: state.timestamp).timestamp
+        self._check_orders_and_call_if_done(states)
+        self._remove_finished_orders()
+        self._update_latest_timestamps(since)
+        if clock.monotonic() - self._snapshot_saved_at >= self._snapshot_interval_s:
+            self._save_snapshot()
+        logger.debug(
+            "Processed %s order states.", len(states),
+            extra={"duration_ms": round((clock.monotonic() - start) * 1000, 3), "since": since}
+        )
+        return since
 
 
     def _check_orders_and_call_if_done(self, new_states: dict[int, OrderState]) -> None:
         """Checks if the orders in the new states are new or done and triggers notifications if needed.
         `new_states` is a dictionary with order IDs as keys and the new states (with corresponding order ID) as values.
         """
-        all_orders = {order.id: order for order in self.order_api.get_orders()}
+        with profiling.phase("fetch_orders"):
+            all_orders = {order.id: order for order in self.order_api.get_orders()}
+        prefetched = self._prefetch_orders(new_states.values(), all_orders)
         for order_id, state in new_states.items():
-            logger.info(
-                f"New order state ID: {state.id} for order {order_id} with status {state.status.name}"
-            )
-            order = all_orders.get(order_id, None)
-            if not order:
-                logger.warning(f"Order not found: {order_id}")
-                continue
+            with log_context(order_id=order_id, state_id=state.id), tracing.span(
+                "order_state.check", order_id=order_id, state_id=state.id, receipt_lag_ms=self._receipt_lag_ms(state)
+            ):
+                self._check_order_state(order_id, state, all_orders, prefetched)
+
+
+    @staticmethod
+    def _receipt_lag_ms(state: OrderState) -> int:
+        """Time between the creation of the state on the server and its processing by the checker."""
+        return int(clock.time() * 1000) - state.timestamp if state.timestamp is not None else 0
+
+
+    def _check_order_state(
+        self,
+        order_id: int,
+        state: OrderState,
+        all_orders: dict[int, Order],
+        prefetched: dict[int, Order | Exception] | None = None
+    ) -> None:
+        """Checks if the order of a single new state is new or done and triggers notifications if needed."""
+        logger.info(
+            "New order state ID: %s for order %s with status %s", state.id, order_id, state.status.name
+        )
+        order = all_orders.get(order_id, None)
+        if not order:
+            logger.warning("Order not found: %s", order_id)
+            return
+        with log_context(car_id=order.car_id):
             try:
-                car = self.car_api.get_car(order.car_id)
+                with profiling.phase("fetch_cars"):
+                    car = self.car_api.get_car(order.car_id)
             except Exception:
-                logger.warning(f"Car not found: {order.car_id}")
-                continue
+                logger.warning("Car not found: %s", order.car_id)
+                return
             phone = "" if car.car_admin_phone.phone is None else car.car_admin_phone.phone
-            if self._check_if_order_is_new(car.id, state, phone, car.under_test):
-                self._call_phone_if_order_is_done(car.id, state, car.under_test)
+            if self._check_if_order_is_new(car.id, state, phone, car.under_test, prefetched):
+                self._call_phone_if_order_is_done(car.id, state, car.under_test, prefetched)
 
 
     def start_thread(self) -> None:
         """Starts the thread that checks the order states."""
         self.thread.start()
+
+
+    def stop(self, timeout_s: float) -> None:
+        """Stops checking the order states and saves the `since` watermark of the unfinished orders
+        and the snapshot of the order cache.
+
+        The batch of states being processed is finished first, waiting at most `timeout_s`. A pending long poll
+        is not interrupted; states it returns are left for the next start of the service."""
+        self._stopped.set()
+        if not self._processing_lock.acquire(timeout=timeout_s):
+            logger.warning("Order states are still being processed, the since watermark was not saved.")
+            return
+        try:
+            self._update_latest_timestamps(self.since)
+            self._save_snapshot()
+        except Exception as e:
+            logger.error("Unable to save the since watermark: %s", e)
+        finally:
+            self._processing_lock.release()
+        self._order_fetch_executor.shutdown(wait=False)
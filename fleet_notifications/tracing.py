@@ -0,0 +1,177 @@
+from __future__ import annotations
+import atexit, contextlib, contextvars, dataclasses, json, logging, os, secrets, threading, time
+from typing import Iterator
+
+from fleet_notifications.script_args.configs import Tracing
+from fleet_notifications.logs import LOGGER_NAME
+
+
+SERVICE_NAME = "fleet-notifications"
+_EXPORT_INTERVAL_S = 1.0
+_STATUS_OK = 1
+_STATUS_ERROR = 2
+logger = logging.getLogger(LOGGER_NAME)
+
+_current_span: contextvars.ContextVar[Span | None] = contextvars.ContextVar("current_span", default=None)
+_exporter: FileSpanExporter | None = None
+
+
+@dataclasses.dataclass
+class Span:
+    """Timed operation in the notification pipeline. Spans of one trace share the trace ID and
+    are linked to their parent by the parent span ID."""
+    name: str
+    trace_id: str
+    span_id: str
+    parent_span_id: str
+    start_time_ns: int = dataclasses.field(default_factory=time.time_ns)
+    end_time_ns: int = 0
+    attributes: dict[str, object] = dataclasses.field(default_factory=dict)
+    error: str = ""
+
+    def set_attribute(self, key: str, value: object) -> None:
+        self.attributes[key] = value
+
+    def end(self) -> None:
+        """End the span and pass it to the exporter. Ending the span again has no effect."""
+        if self.end_time_ns:
+            return
+        self.end_time_ns = time.time_ns()
+        if _exporter is not None:
+            _exporter.export(self)
+
+    def to_otlp(self) -> dict[str, object]:
+        """Return the span in the OTLP JSON representation."""
+        otlp: dict[str, object] = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_time_ns),
+            "endTimeUnixNano": str(self.end_time_ns),
+            "attributes": [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            "status": {"code": _STATUS_ERROR, "message": self.error} if self.error else {"code": _STATUS_OK},
+        }
+        if self.parent_span_id:
+            otlp["parentSpanId"] = self.parent_span_id
+        return otlp
+
+
+class FileSpanExporter:
+    """Appends finished spans to a file in the OTLP JSON lines format (as written by the file exporter
+    of the OpenTelemetry Collector), so the file can be loaded by any OTLP-compatible tool.
+
+    The spans are written in batches by a background thread."""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._path = path
+        self._pending: list[Span] = []
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._export_periodically, daemon=True, name="span-exporter")
+        self._thread.start()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self._pending.append(span)
+
+    def flush(self) -> None:
+        with self._lock:
+            spans, self._pending = self._pending, []
+        if not spans:
+            return
+        batch = {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+                "scopeSpans": [{
+                    "scope": {"name": "fleet_notifications"},
+                    "spans": [span.to_otlp() for span in spans],
+                }],
+            }]
+        }
+        try:
+            with open(self._path, "a") as trace_file:
+                trace_file.write(json.dumps(batch) + "\n")
+        except OSError as e:
+            logger.warning("Unable to write %s spans to '%s': %s", len(spans), self._path, e)
+
+    def shutdown(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+        self.flush()
+
+    def _export_periodically(self) -> None:
+        while not self._stopped.wait(_EXPORT_INTERVAL_S):
+            self.flush()
+
+
+def configure_tracing(config: Tracing) -> None:
+    """Start exporting spans to the file given in the configuration, if tracing is enabled."""
+    global _exporter
+    if config.use:
+        stop_tracing()
+        _exporter = FileSpanExporter(config.path)
+        atexit.register(stop_tracing)
+
+
+def stop_tracing() -> None:
+    """Write the remaining spans to the file and stop exporting."""
+    global _exporter
+    if _exporter is not None:
+        _exporter.shutdown()
+        _exporter = None
+
+
+def is_enabled() -> bool:
+    return _exporter is not None
+
+
+def start_span(name: str, **attributes: object) -> Span | None:
+    """Start a span as a child of the current span, or as a root of a new trace if there is no current span.
+    The span is not made current; it has to be ended by calling its `end` method. Return None if tracing
+    is disabled."""
+    if _exporter is None:
+        return None
+    parent = _current_span.get()
+    return Span(
+        name=name,
+        trace_id=parent.trace_id if parent else secrets.token_hex(16),
+        span_id=secrets.token_hex(8),
+        parent_span_id=parent.span_id if parent else "",
+        attributes=attributes,
+    )
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes: object) -> Iterator[Span | None]:
+    """Run the block in a new span, which is the current span within the block. Spans started in the block
+    (also in other threads running a copy of the context) are its children. Exceptions raised in the block
+    mark the span as failed. If tracing is disabled, the block is run with no span."""
+    new_span = start_span(name, **attributes)
+    if new_span is None:
+        yield None
+        return
+    token = _current_span.set(new_span)
+    try:
+        yield new_span
+    except BaseException as e:
+        new_span.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        new_span.end()
+
+
+def _otlp_attribute(key: str, value: object) -> dict[str, object]:
+    if isinstance(value, bool):
+        typed_value: dict[str, object] = {"boolValue": value}
+    elif isinstance(value, int):
+        typed_value = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed_value = {"doubleValue": value}
+    else:
+        typed_value = {"stringValue": str(value)}
+    return {"key": key, "value": typed_value}
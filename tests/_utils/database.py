@@ -0,0 +1,13 @@
+from typing import Iterable
+
+import fleet_notifications.database.database_controller as notifications_db
+from fleet_notifications.script_args.configs import Database
+
+
+def initialize_test_db(sites: Iterable[str] = ("",)) -> None:
+    """Replace the database with an empty in-memory database holding the tables of the sites."""
+    notifications_db.initialize_db(
+        Database.Connection(location="_", database_name="_", username="_", password="_", port=0),
+        test=True,
+        sites=sites
+    )
@@ -1,78 +1,219 @@
+import bisect
+import collections
+import random
+import threading
+import time
+
 from fleet_management_http_client_python import ( # type: ignore
-    Car, CarState, CarActionState, CarActionStatus, CarStatus, Order
+    Car, CarState, CarActionState, CarActionStatus, CarStatus, Order, OrderState
 )
 
+
+class MockApiFault(Exception):
+    """Error raised by the MockApi when a fault is injected."""
+
+
 class MockApi:
-    def __init__(self):
-        self.cars = []
-        self.car_states = []
-        self.car_actions = []
-        self.orders = []
+    """Local stand-in of the Fleet Management API (CarApi, CarStateApi, CarActionApi, OrderApi, OrderStateApi).
+
+    Cars, orders and their states are indexed by ID, so lookups do not depend on the size of the fleet.
+    Optionally, every request takes `latency_s` plus a random `jitter_s`, fails with probability
+    `fault_rate`, and cars switch states only `transition_delay_s` after being paused or unpaused.
+    `get_all_order_states(wait=True)` blocks until a new state is added or `long_poll_timeout_s` elapses,
+    as the real server does.
+    """
+
+    def __init__(
+        self,
+        latency_s: float = 0.0,
+        jitter_s: float = 0.0,
+        fault_rate: float = 0.0,
+        transition_delay_s: float = 0.0,
+        long_poll_timeout_s: float = 1.0,
+    ):
+        self._cars: dict[int, Car] = {}
+        self._car_states: dict[int, list[CarState]] = collections.defaultdict(list)
+        self._car_actions: dict[int, list[CarActionState]] = collections.defaultdict(list)
+        self._orders: dict[int, Order] = {}
+        self._order_states: list[OrderState] = []
+        self._order_state_timestamps: list[int] = []
+        self._condition = threading.Condition()
         self.states_not_updating = False
         self.actions_not_updating = False
+        self.latency_s = latency_s
+        self.jitter_s = jitter_s
+        self.fault_rate = fault_rate
+        self.transition_delay_s = transition_delay_s
+        self.long_poll_timeout_s = long_poll_timeout_s
+        self.request_count = collections.Counter[str]()
+        self._forced_faults: list[Exception] = []
+
+    @property
+    def cars(self) -> list[Car]:
+        return list(self._cars.values())
+
+    @property
+    def orders(self) -> list[Order]:
+        return list(self._orders.values())
+
+    @property
+    def total_requests(self) -> int:
+        return sum(self.request_count.values())
+
+    def fail_next_requests(self, count: int = 1, exception: Exception | None = None) -> None:
+        """Make the next `count` requests raise `exception` (MockApiFault by default)."""
+        with self._condition:
+            self._forced_faults.extend(exception or MockApiFault("Injected fault") for _ in range(count))
 
     def get_car(self, car_id: int):
-        for car in self.cars:
-            if car.id == car_id:
-                return car
-        raise Exception("Car not found")
+        self._request("get_car")
+        with self._condition:
+            if car_id not in self._cars:
+                raise Exception("Car not found")
+            return self._cars[car_id]
 
     def get_cars(self):
+        self._request("get_cars")
         return self.cars
 
     def _set_cars(self, cars: list[Car]):
-        self.cars = cars
+        with self._condition:
+            self._cars = {car.id: car for car in cars}
 
     def get_car_states(self, car_id: int, last_n: int = 0):
-        car_states = [state for state in self.car_states if state.car_id == car_id]
-        return car_states[-last_n:] if last_n > 0 else car_states
-    
+        self._request("get_car_states")
+        with self._condition:
+            car_states = self._car_states.get(car_id, [])
+            return car_states[-last_n:] if last_n > 0 else list(car_states)
+
     def _set_car_states(self, car_states: list[CarState]):
-        self.car_states = car_states
+        with self._condition:
+            self._car_states = collections.defaultdict(list)
+            for state in car_states:
+                self._car_states[state.car_id].append(state)
 
     def get_car_action_states(self, car_id: int, last_n: int = 0):
-        car_actions = [action for action in self.car_actions if action.car_id == car_id]
-        return car_actions[-last_n:] if last_n > 0 else car_actions
-    
+        self._request("get_car_action_states")
+        with self._condition:
+            car_actions = self._car_actions.get(car_id, [])
+            return car_actions[-last_n:] if last_n > 0 else list(car_actions)
+
+    def _set_car_action_states(self, car_actions: list[CarActionState]):
+        with self._condition:
+            self._car_actions = collections.defaultdict(list)
+            for action in car_actions:
+                self._car_actions[action.car_id].append(action)
+
     def get_order(self, car_id: int, order_id: int):
-        for order in self.orders:
-            if order.car_id == car_id and order.id == order_id:
-                return order
-        raise Exception("Order not found")
-    
+        self._request("get_order")
+        with self._condition:
+            order = self._orders.get(order_id)
+            if order is None or order.car_id != car_id:
+                raise Exception("Order not found")
+            return order
+
     def get_orders(self):
+        self._request("get_orders")
         return self.orders
-            
+
     def _set_orders(self, orders: list[Order]):
-        self.orders = orders
-    
+        with self._condition:
+            self._orders = {order.id: order for order in orders}
+
+    def get_all_order_states(self, wait: bool = False, since: int = 0, last_n: int = 0, **_):
+        """Return the order states with a timestamp equal to or greater than `since`. If `wait` is true and
+        there are no such states, block until one is added or until the long-poll timeout elapses."""
+        self._request("get_all_order_states")
+        deadline = time.monotonic() + self.long_poll_timeout_s
+        with self._condition:
+            states = self._order_states_since(since)
+            while wait and not states:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+                states = self._order_states_since(since)
+        if last_n > 0:
+            by_order = collections.defaultdict[int, list[OrderState]](list)
+            for state in states:
+                by_order[state.order_id].append(state)
+            states = sorted(
+                (state for order_states in by_order.values() for state in order_states[-last_n:]),
+                key=lambda state: state.timestamp
+            )
+        return states
+
+    def _add_order_state(self, state: OrderState) -> None:
+        """Record a new state of an order, as the server does when the car reports it, and wake up
+        the waiting long-poll requests. The order is replaced, not mutated, so objects already returned
+        by the API keep their values."""
+        with self._condition:
+            index = bisect.bisect_right(self._order_state_timestamps, state.timestamp)
+            self._order_state_timestamps.insert(index, state.timestamp)
+            self._order_states.insert(index, state)
+            order = self._orders.get(state.order_id)
+            if order is not None:
+                self._orders[state.order_id] = order.model_copy(update={"last_state": state})
+            self._condition.notify_all()
+
+    def _order_states_since(self, since: int) -> list[OrderState]:
+        return self._order_states[bisect.bisect_left(self._order_state_timestamps, since or 0):]
+
     def pause_car(self, car_id: int):
+        self._request("pause_car")
+        self._after_transition_delay(self._pause, car_id)
+
+    def unpause_car(self, car_id: int):
+        self._request("unpause_car")
+        self._after_transition_delay(self._unpause, car_id)
+
+    def _pause(self, car_id: int) -> None:
         if self.actions_not_updating:
             return
-        self.car_actions.append(CarActionState(
-            id=0,
-            carId=car_id,
-            timestamp=0,
-            actionStatus=CarActionStatus.PAUSED
-        ))
-        if self.states_not_updating:
-            return
-        self.car_states.append(CarState(
-            id=0,
-            timestamp=0,
-            status=CarStatus.IDLE,
-            carId=car_id
-        ))
+        with self._condition:
+            self._car_actions[car_id].append(CarActionState(
+                id=0,
+                carId=car_id,
+                timestamp=0,
+                actionStatus=CarActionStatus.PAUSED
+            ))
+            if self.states_not_updating:
+                return
+            self._car_states[car_id].append(CarState(
+                id=0,
+                timestamp=0,
+                status=CarStatus.IDLE,
+                carId=car_id
+            ))
 
-    def unpause_car(self, car_id: int):
+    def _unpause(self, car_id: int) -> None:
         if self.actions_not_updating:
             return
-        self.car_actions.append(CarActionState(
-            id=0,
-            carId=car_id,
-            timestamp=0,
-            actionStatus=CarActionStatus.NORMAL
-        ))
-    
-    def _set_car_action_states(self, car_actions: list[CarActionState]):
-        self.car_actions = car_actions
\ No newline at end of file
+        with self._condition:
+            self._car_actions[car_id].append(CarActionState(
+                id=0,
+                carId=car_id,
+                timestamp=0,
+                actionStatus=CarActionStatus.NORMAL
+            ))
+
+    def _after_transition_delay(self, transition, car_id: int) -> None:
+        if self.transition_delay_s <= 0:
+            transition(car_id)
+            return
+        timer = threading.Timer(self.transition_delay_s, transition, args=(car_id,))
+        timer.daemon = True
+        timer.start()
+
+    def _request(self, name: str) -> None:
+        """Count the request, simulate its latency and raise an injected fault, if any."""
+        with self._condition:
+            self.request_count[name] += 1
+            fault = self._forced_faults.pop(0) if self._forced_faults else None
+        delay = self.latency_s + (random.uniform(0, self.jitter_s) if self.jitter_s > 0 else 0)
+        if delay > 0:
+            time.sleep(delay)
+        if fault is not None:
+            raise fault
+        if self.fault_rate > 0 and random.random() < self.fault_rate:
+            raise MockApiFault(f"Injected fault in {name}")
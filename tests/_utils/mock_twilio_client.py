@@ -1,9 +1,16 @@
 import random
 import string
 
+from twilio.base.exceptions import TwilioRestException # type: ignore
 from twilio.rest.api.v2010.account.call import CallInstance # type: ignore
 
 
+def _raise_if_throttled(throttled_statuses: list[int]) -> None:
+    """Raise an exception with the first queued HTTP status, simulating Twilio rejecting the request."""
+    if throttled_statuses:
+        raise TwilioRestException(status=throttled_statuses.pop(0), uri="/Calls", msg="Too Many Requests")
+
+
 class MockCallInstance:
     def __init__(self):
         self.status = CallInstance.Status.QUEUED
@@ -13,14 +20,20 @@ class MockCall:
     def __init__(self, sid):
         self.sid = sid
         self._instance = MockCallInstance()
+        self.throttled_statuses: list[int] = []
+        self.fetch_count = 0
 
     def fetch(self):
+        self.fetch_count += 1
+        _raise_if_throttled(self.throttled_statuses)
         return self._instance
 
 
 class MockCallList:
     def __init__(self):
         self.calls = []
+        self.throttled_statuses: list[int] = []
+        self.create_count = 0
 
     @staticmethod
     def _generate_random_sid():
@@ -30,6 +43,8 @@ class MockCallList:
     def create(self, to="", from_="", twiml=""):
         if to == "EXCEPTION":
             raise Exception("Forced test exception")
+        self.create_count += 1
+        _raise_if_throttled(self.throttled_statuses)
         call = MockCall(self._generate_random_sid())
         self.calls.append(call)
         return call
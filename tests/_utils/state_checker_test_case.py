@@ -0,0 +1,34 @@
+import unittest
+
+from fleet_management_http_client_python import ApiClient, Configuration # type: ignore
+
+from fleet_notifications.state_checker import OrderStateChecker
+from tests._utils.database import initialize_test_db
+from tests._utils.mock_api import MockApi
+from tests._utils.testing_configs import TEST_TWILIO_CONFIG
+
+
+def create_test_state_checker(**kwargs) -> OrderStateChecker:
+    return OrderStateChecker(
+        twilio_config=TEST_TWILIO_CONFIG,
+        api_client=ApiClient(Configuration(host="http://example.com", api_key={'APIKeyAuth': "test_api_key"})),
+        **kwargs
+    )
+
+
+class State_Checker_Test_Case(unittest.TestCase):
+    """Base of the tests of an OrderStateChecker requesting the cars, orders and order states from a MockApi
+    and saving the orders to an empty test database with the tables of the `sites`."""
+
+    sites: tuple[str, ...] = ("",)
+
+    def setUp(self) -> None:
+        initialize_test_db(self.sites)
+        self.state_checker = self._create_state_checker()
+        self.mock_api = MockApi()
+        self.state_checker.order_api = self.mock_api
+        self.state_checker.car_api = self.mock_api
+        self.state_checker.order_state_api = self.mock_api
+
+    def _create_state_checker(self) -> OrderStateChecker:
+        return create_test_state_checker()
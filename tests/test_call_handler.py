@@ -1,4 +1,7 @@
-import unittest
+import threading, unittest
+
+from flask import Flask
+from twilio.request_validator import RequestValidator # type: ignore
 
 from fleet_management_http_client_python import ( # type: ignore
     ApiClient,
@@ -9,9 +12,12 @@ from fleet_management_http_client_python import ( # type: ignore
     CarActionApi, CarActionState, CarActionStatus
 )
 
-from fleet_notifications.incoming_call_endpoint import IncomingCallHandler, InvalidCarName
+import fleet_notifications.database.database_controller as notifications_db
+from fleet_notifications.clock import VirtualClock, set_clock
+from fleet_notifications.incoming_call_endpoint import FlaskAppWrapper, IncomingCallHandler, InvalidCarName
 from fleet_notifications.script_args.configs import HTTPServer
 from fleet_notifications.logs import LOGGER_NAME
+from tests._utils.database import initialize_test_db
 from tests._utils.mock_api import MockApi
 from tests._utils.testing_configs import TEST_TWILIO_CONFIG
 
@@ -28,6 +34,14 @@ def _create_test_call_handler() -> IncomingCallHandler:
     )
 
 
+def _use_virtual_clock(test_case: unittest.TestCase) -> VirtualClock:
+    """Run the test on a virtual clock, so the timeouts of the handler elapse without waiting."""
+    virtual_clock = VirtualClock(start_time=1000)
+    previous_clock = set_clock(virtual_clock)
+    test_case.addCleanup(set_clock, previous_clock)
+    return virtual_clock
+
+
 class Test_Call_Handler_Initialization(unittest.TestCase):
     """Tests the initialization of the IncomingCallHandler class."""
 
@@ -50,11 +64,27 @@ class Test_Call_Handler_Initialization(unittest.TestCase):
         self.assertEqual(call_handler.server_port, 8080)
         self.assertTrue(call_handler.allow_http)
 
+    def test_proxy_without_client_address_header_is_reported(self):
+        """Tests if a warning is logged when HTTP is allowed for a proxy, but the client address header is not set."""
+        with self.assertLogs(LOGGER_NAME, level="WARNING") as log:
+            _create_test_call_handler()
+        self.assertIn("client address header", log.output[0])
+        twilio_config = TEST_TWILIO_CONFIG.model_copy(deep=True)
+        twilio_config.call_handling.request_gate.client_address_header = "X-Forwarded-For"
+        with self.assertNoLogs(LOGGER_NAME, level="WARNING"):
+            IncomingCallHandler(
+                twilio_config=twilio_config,
+                server_config=HTTPServer(port=8080),
+                api_client=ApiClient(Configuration(host="http://example.com", api_key={'APIKeyAuth': "test_api_key"})),
+                allow_http=True
+            )
+
 
 class Test_Call_Handler_Action_Checking(unittest.TestCase):
     """Tests the _car_action_status_occured method of the IncomingCallHandler class."""
 
     def setUp(self) -> None:
+        _use_virtual_clock(self)
         self.call_handler = _create_test_call_handler()
         self.call_handler.car_action_api = MockApi()
         self.call_handler.car_action_api._set_car_action_states(
@@ -79,6 +109,7 @@ class Test_Call_Handler_State_Checking(unittest.TestCase):
     """Tests the _car_status_occured method of the IncomingCallHandler class."""
 
     def setUp(self) -> None:
+        _use_virtual_clock(self)
         self.call_handler = _create_test_call_handler()
         self.call_handler.car_state_api = MockApi()
         self.call_handler.car_state_api._set_car_states(
@@ -121,6 +152,53 @@ class Test_Call_Handler_Car_Id(unittest.TestCase):
         self.assertTrue("Car with name: non_existent_name not found." in str(context.exception))
 
 
+class Test_Call_Handler_Sites(unittest.TestCase):
+    """Tests the _find_car method of the IncomingCallHandler class with more sites."""
+
+    def setUp(self) -> None:
+        api_client = ApiClient(Configuration(host="http://example.com", api_key={'APIKeyAuth': "test_api_key"}))
+        self.call_handler = IncomingCallHandler(
+            twilio_config=TEST_TWILIO_CONFIG,
+            server_config=HTTPServer(port=8080),
+            api_client=[api_client, api_client],
+            allow_http=True
+        )
+        for site, car_name in zip(self.call_handler._sites, ("first_car", "second_car")):
+            site.car_api = MockApi()
+            site.car_api._set_cars(
+                [Car(id=1, platformHwId=1, name=car_name, carAdminPhone=MobilePhone(phone="test_number"))]
+            )
+
+    def test_car_is_found_on_other_site(self):
+        """Tests if the _find_car method returns the handler of the site the car belongs to."""
+        car_id, site = self.call_handler._find_car("second_car")
+        self.assertEqual(car_id, 1)
+        self.assertIs(site, self.call_handler._sites[1])
+
+    def test_car_not_found_on_any_site(self):
+        """Tests if the _find_car method raises an exception when no site has the car."""
+        with self.assertRaises(InvalidCarName):
+            self.call_handler._find_car("non_existent_name")
+
+    def test_car_name_on_more_sites_is_rejected(self):
+        """Tests if the _find_car method raises an exception when more sites have a car with the name,
+        instead of pausing the car of the first site."""
+        self.call_handler._sites[1].car_api._set_cars(
+            [Car(id=2, platformHwId=2, name="first_car", carAdminPhone=MobilePhone(phone="test_number"))]
+        )
+        with self.assertRaises(InvalidCarName) as context:
+            self.call_handler._find_car("first_car")
+        self.assertIn("unique", str(context.exception))
+
+    def test_sites_share_only_the_handler(self):
+        """Tests if the sites have their own APIs and car transitions, while the allowlist is kept once."""
+        first_site, second_site = self.call_handler._sites
+        self.assertIsNot(first_site.car_transitions, second_site.car_transitions)
+        self.assertIs(self.call_handler.car_api, first_site.car_api)
+        self.call_handler.update_allowlist({"+111": "second_car"})
+        self.assertEqual(self.call_handler._car_names, {"+111": "second_car"})
+
+
 class Test_Call_Handler_Call_Handling(unittest.TestCase):
     """Tests the handle_call_function method of the IncomingCallHandler class."""
 
@@ -148,6 +226,7 @@ class Test_Call_Handler_Call_Handling(unittest.TestCase):
     def test_car_pause_action_timeout(self):
         """Tests not changing the car action state to PAUSED from NORMAL throws an error.
         Action status will not be set to PAUSED in the mock API."""
+        _use_virtual_clock(self)
         self.mock_api.actions_not_updating = True
         with self.assertLogs(LOGGER_NAME, level="ERROR") as log:
             response = self.call_handler.handle_call_function({"From": "test_number"})
@@ -162,6 +241,7 @@ class Test_Call_Handler_Call_Handling(unittest.TestCase):
     def test_car_pause_state_timeout(self):
         """Tests not changing the car state to IDLE throws an error.
         Status will not be set to IDLE in the mock API."""
+        _use_virtual_clock(self)
         self.mock_api.states_not_updating = True
         with self.assertLogs(LOGGER_NAME, level="ERROR") as log:
             response = self.call_handler.handle_call_function({"From": "test_number"})
@@ -193,6 +273,7 @@ class Test_Call_Handler_Call_Handling(unittest.TestCase):
         self.mock_api._set_car_action_states(
             [CarActionState(id=0, carId=1, timestamp=0, actionStatus=CarActionStatus.PAUSED)]
         )
+        _use_virtual_clock(self)
         self.mock_api.actions_not_updating = True
         with self.assertLogs(LOGGER_NAME, level="ERROR") as log:
             response = self.call_handler.handle_call_function({"From": "test_number"})
@@ -204,6 +285,177 @@ class Test_Call_Handler_Call_Handling(unittest.TestCase):
             )
             self.assertNotEqual(response.find("An error occured while handling the call."), -1)
 
+    def test_concurrent_calls_about_same_car(self):
+        """Tests if concurrent calls about the same car share a single pause of the car."""
+        self.mock_api.transition_delay_s = 0.5
+        responses = []
+        callers = [
+            threading.Thread(target=lambda: responses.append(
+                self.call_handler.handle_call_function({"From": "test_number"})
+            ))
+            for _ in range(2)
+        ]
+        for caller in callers:
+            caller.start()
+        for caller in callers:
+            caller.join()
+        self.assertEqual(len(responses), 2)
+        for response in responses:
+            self.assertNotEqual(response.find("Car successfully paused."), -1)
+        self.assertEqual(self.mock_api.request_count["pause_car"], 1)
+
+
+class Test_Call_Handler_Idempotency(unittest.TestCase):
+    """Tests the handling of repeated requests with the same CallSid."""
+
+    def setUp(self) -> None:
+        initialize_test_db()
+        self.call_handler = _create_test_call_handler()
+        self.mock_api = MockApi()
+        self.call_handler.car_api = self.mock_api
+        self.call_handler.car_state_api = self.mock_api
+        self.call_handler.car_action_api = self.mock_api
+        self.mock_api._set_cars(
+            [Car(id=1, platformHwId=1, name="test_name", carAdminPhone=MobilePhone(phone="test_number"))]
+        )
+        self.mock_api._set_car_states(
+            [CarState(id=0, timestamp=0, status=CarStatus.DRIVING, carId=1)]
+        )
+        self.mock_api._set_car_action_states(
+            [CarActionState(id=0, carId=1, timestamp=0, actionStatus=CarActionStatus.NORMAL)]
+        )
+
+    def test_retry_does_not_toggle_car(self):
+        """Tests if a retried request gets the first response and does not unpause the paused car."""
+        first = self.call_handler.handle_call_function({"From": "test_number", "CallSid": "CA1"})
+        retry = self.call_handler.handle_call_function({"From": "test_number", "CallSid": "CA1"})
+        self.assertNotEqual(first.find("Car successfully paused."), -1)
+        self.assertEqual(first, retry)
+        self.assertEqual(
+            self.mock_api.get_car_action_states(1, last_n=1)[0].action_status, CarActionStatus.PAUSED
+        )
+
+    def test_call_handled_by_other_process(self):
+        """Tests if a call claimed in the database gets the response saved by the process handling it."""
+        notifications_db.claim_call("CA2", ttl_s=60)
+        notifications_db.save_call_response("CA2", "<Response>saved</Response>")
+        with self.assertLogs(LOGGER_NAME, level="INFO"):
+            response = self.call_handler.handle_call_function({"From": "test_number", "CallSid": "CA2"})
+        self.assertEqual(response, "<Response>saved</Response>")
+
+    def test_claim_without_response_expires(self):
+        """Tests if a call claimed by a process that stopped before responding is claimed again
+        after the time the handling of a call can take."""
+        virtual_clock = _use_virtual_clock(self)
+        notifications_db.claim_call("CA3", ttl_s=3600)
+        virtual_clock.advance(2 * self.call_handler.action_timeout_s + self.call_handler.duplicate_wait_s + 1)
+        response = self.call_handler.handle_call_function({"From": "test_number", "CallSid": "CA3"})
+        self.assertNotEqual(response.find("Car successfully paused."), -1)
+        self.assertEqual(notifications_db.get_call_response("CA3"), response)
+
+    def test_twilio_retry_gets_first_response(self):
+        """Tests if a request retried by Twilio with the same CallSid and signature passes the request gate
+        and gets the response to the first request, without toggling the car again."""
+        app = FlaskAppWrapper(Flask(__name__))
+        self.call_handler.add_endpoints(app)
+        client = app.app.test_client()
+        params = {"From": "test_number", "CallSid": "CA4"}
+        signature = RequestValidator(TEST_TWILIO_CONFIG.auth_token).compute_signature(
+            "https://localhost/v2/notifications/handle-call", params
+        )
+        first = client.post("/v2/notifications/handle-call", data=params, headers={"X-Twilio-Signature": signature})
+        retry = client.post("/v2/notifications/handle-call", data=params, headers={"X-Twilio-Signature": signature})
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(self.mock_api.request_count["pause_car"], 1)
+        self.assertEqual(self.mock_api.request_count["unpause_car"], 0)
+
+
+class Test_Call_Handler_Async_Mode(unittest.TestCase):
+    """Tests handling the calls by background jobs."""
+
+    def setUp(self) -> None:
+        initialize_test_db()
+        twilio_config = TEST_TWILIO_CONFIG.model_copy(deep=True)
+        twilio_config.call_handling.async_mode = True
+        self.call_handler = IncomingCallHandler(
+            twilio_config=twilio_config,
+            server_config=HTTPServer(port=8080),
+            api_client=ApiClient(Configuration(host="http://example.com", api_key={'APIKeyAuth': "test_api_key"})),
+            allow_http=True
+        )
+        self.mock_api = MockApi()
+        self.call_handler.car_api = self.mock_api
+        self.call_handler.car_state_api = self.mock_api
+        self.call_handler.car_action_api = self.mock_api
+        self.mock_api._set_cars(
+            [Car(id=1, platformHwId=1, name="test_name", carAdminPhone=MobilePhone(phone="test_number"))]
+        )
+        self.mock_api._set_car_states(
+            [CarState(id=0, timestamp=0, status=CarStatus.DRIVING, carId=1)]
+        )
+        self.mock_api._set_car_action_states(
+            [CarActionState(id=0, carId=1, timestamp=0, actionStatus=CarActionStatus.NORMAL)]
+        )
+
+    def test_call_is_acknowledged(self):
+        """Tests if the call is acknowledged with a redirect to the call status route."""
+        response = self.call_handler.handle_call_function({"From": "test_number", "CallSid": "CA1"})
+        self.assertNotEqual(response.find("Processing the request."), -1)
+        self.assertNotEqual(response.find("/v2/notifications/handle-call/status?poll=1"), -1)
+
+    def test_status_reports_outcome(self):
+        """Tests if the call status route redirects until the job is finished and then returns its response."""
+        self.mock_api.transition_delay_s = 0.5
+        self.call_handler.handle_call_function({"From": "test_number", "CallSid": "CA1"})
+        response = self.call_handler.call_status_function({"From": "test_number", "CallSid": "CA1", "poll": "1"})
+        self.assertNotEqual(response.find("status?poll=2"), -1)
+        self.call_handler._call_jobs["CA1"][1].result(timeout=10)
+        response = self.call_handler.call_status_function({"From": "test_number", "CallSid": "CA1", "poll": "2"})
+        self.assertNotEqual(response.find("Car successfully paused."), -1)
+
+
+class Test_Call_Handler_Admin_Endpoints(unittest.TestCase):
+    """Tests the authentication of the admin endpoints."""
+
+    def setUp(self) -> None:
+        call_handler = IncomingCallHandler(
+            twilio_config=TEST_TWILIO_CONFIG,
+            server_config=HTTPServer(port=8080, admin_api_key="admin_key"),
+            api_client=ApiClient(Configuration(host="http://example.com", api_key={'APIKeyAuth': "test_api_key"})),
+            allow_http=True
+        )
+        app = FlaskAppWrapper(Flask(__name__))
+        call_handler.add_endpoints(app)
+        self.client = app.app.test_client()
+
+    def test_request_without_key_is_rejected(self):
+        """Tests if a request without the admin API key is rejected."""
+        self.assertEqual(self.client.get("/v2/notifications/admin/profiler").status_code, 401)
+
+    def test_request_with_wrong_key_is_rejected(self):
+        """Tests if a request with a wrong admin API key is rejected."""
+        response = self.client.get("/v2/notifications/admin/profiler", headers={"X-Admin-Api-Key": "wrong"})
+        self.assertEqual(response.status_code, 401)
+
+    def test_key_in_query_string_is_rejected(self):
+        """Tests if the admin API key is not accepted in the query string, which is written to the access log."""
+        self.assertEqual(self.client.get("/v2/notifications/admin/profiler?api_key=admin_key").status_code, 401)
+
+    def test_request_with_key_is_accepted(self):
+        """Tests if a request with the admin API key in the header gets the report of the profiler."""
+        response = self.client.get("/v2/notifications/admin/profiler", headers={"X-Admin-Api-Key": "admin_key"})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json["running"])
+
+    def test_metrics_require_key(self):
+        """Tests if the metrics are returned only to the requests with the admin API key."""
+        self.assertEqual(self.client.get("/v2/notifications/metrics").status_code, 401)
+        response = self.client.get("/v2/notifications/metrics", headers={"X-Admin-Api-Key": "admin_key"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.json, dict)
+
 
 if __name__ == "__main__":
     unittest.main() # pragma: no cover
\ No newline at end of file
@@ -0,0 +1,90 @@
+import threading
+import time
+import unittest
+
+from fleet_notifications import clock
+from fleet_notifications.clock import Clock, ScaledClock, SystemClock, VirtualClock, get_clock, set_clock
+from fleet_notifications.rate_limiter import TokenBucket
+
+
+class Test_Virtual_Clock(unittest.TestCase):
+    """Tests the VirtualClock class."""
+
+    def setUp(self) -> None:
+        self.clock = VirtualClock(start_time=100)
+
+    def test_sleep_advances_time(self):
+        """Tests that sleeping advances the time instead of blocking."""
+        start = time.monotonic()
+        self.clock.sleep(3600)
+        self.assertEqual(self.clock.time(), 3700)
+        self.assertEqual(self.clock.monotonic(), 3700)
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_wait_for_set_event(self):
+        """Tests that waiting for a set event does not advance the time."""
+        event = threading.Event()
+        event.set()
+        self.assertTrue(self.clock.wait(event, 10))
+        self.assertEqual(self.clock.time(), 100)
+
+    def test_wait_times_out(self):
+        """Tests that waiting for an event that is not set advances the time by the timeout."""
+        self.assertFalse(self.clock.wait(threading.Event(), 10))
+        self.assertEqual(self.clock.time(), 110)
+
+
+class Test_Scaled_Clock(unittest.TestCase):
+    """Tests the ScaledClock class."""
+
+    def test_time_runs_faster(self):
+        """Tests that the time runs faster and the sleeps are shorter by the factor."""
+        scaled_clock = ScaledClock(factor=1000)
+        start, real_start = scaled_clock.monotonic(), time.monotonic()
+        scaled_clock.sleep(50)
+        self.assertGreaterEqual(scaled_clock.monotonic() - start, 50)
+        self.assertLess(time.monotonic() - real_start, 1)
+
+    def test_factor_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            ScaledClock(factor=0)
+
+
+class Test_Current_Clock(unittest.TestCase):
+    """Tests the clock used by the components."""
+
+    def setUp(self) -> None:
+        self.previous_clock = set_clock(VirtualClock())
+
+    def tearDown(self) -> None:
+        set_clock(self.previous_clock)
+
+    def test_system_clock_is_default(self):
+        self.assertIsInstance(self.previous_clock, SystemClock)
+
+    def test_components_use_current_clock(self):
+        """Tests that a rate limiter waiting for a token waits on the current clock."""
+        bucket = TokenBucket(rate=1 / 60, capacity=1)
+        bucket.acquire()
+        self.assertEqual(bucket.acquire(), 60)
+        self.assertEqual(clock.monotonic(), get_clock().time())
+
+    def test_clock_must_implement_all_methods(self):
+        """Tests that a clock missing any of the methods used by the components cannot be created."""
+
+        class _ClockWithoutWait(Clock):
+            def time(self) -> float:
+                return 0.0
+
+            def monotonic(self) -> float:
+                return 0.0
+
+            def sleep(self, seconds: float) -> None:
+                pass
+
+        with self.assertRaises(TypeError):
+            _ClockWithoutWait()
+
+
+if __name__ == "__main__":
+    unittest.main() # pragma: no cover
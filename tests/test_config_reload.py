@@ -0,0 +1,161 @@
+import json
+import logging
+import os
+import tempfile
+import unittest
+
+from fleet_management_http_client_python import ApiClient, Configuration # type: ignore
+from flask import Flask
+
+from fleet_notifications.config_reload import ConfigReloader, _changed_settings
+from fleet_notifications.incoming_call_endpoint import FlaskAppWrapper, IncomingCallHandler
+from fleet_notifications.notifications_client import NotificationClient
+from fleet_notifications.script_args import load_script_config
+from fleet_notifications.logs import LOGGER_NAME
+
+
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_ARGVALS = {"username": None, "password": None, "location": None, "port": None, "database_name": None}
+
+
+class Test_Changed_Settings(unittest.TestCase):
+    """Tests comparing the dumps of two configurations."""
+
+    def test_nested_settings_are_named(self):
+        """Tests that the changed settings are named by their path and reloadable settings as a whole."""
+        old = {"http_server": {"port": 1}, "twilio": {"call_handling": {"allowed_incoming_phone_numbers": {"a": "b"}}}}
+        new = {"http_server": {"port": 2}, "twilio": {"call_handling": {"allowed_incoming_phone_numbers": {"a": "c"}}}}
+        self.assertEqual(
+            _changed_settings(old, new),
+            ["http_server.port", "twilio.call_handling.allowed_incoming_phone_numbers"]
+        )
+
+
+class Test_Config_Reloader(unittest.TestCase):
+    """Tests reloading the configuration file."""
+
+    def setUp(self) -> None:
+        self.logger = logging.getLogger(LOGGER_NAME)
+        self.original_handlers = list(self.logger.handlers)
+        self.original_level = self.logger.level
+        with open(os.path.join(_ROOT_DIR, "config", "config.json")) as config_file:
+            self.config_dict = json.load(config_file)
+        self.config_dict["logging"]["queue"]["use"] = False
+        self.directory = tempfile.TemporaryDirectory()
+        self.config_path = os.path.join(self.directory.name, "config.json")
+        self._write_config()
+        config = load_script_config(self.config_path, _ARGVALS)
+        self.call_handler = IncomingCallHandler(
+            twilio_config=config.twilio,
+            server_config=config.http_server,
+            api_client=ApiClient(Configuration(host="http://example.com", api_key={'APIKeyAuth': "test_api_key"})),
+            allow_http=True
+        )
+        self.notification_client = NotificationClient(config.twilio)
+        self.reloader = ConfigReloader(
+            "Test", self.config_path, _ARGVALS, config, self.call_handler, self.notification_client
+        )
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+        self.logger.handlers = self.original_handlers
+        self.logger.setLevel(self.original_level)
+
+    def _write_config(self) -> None:
+        with open(self.config_path, "w") as config_file:
+            json.dump(self.config_dict, config_file)
+
+    def _create_client(self):
+        self.reloader.admin_api_key = "admin_key"
+        app = FlaskAppWrapper(Flask(__name__))
+        self.reloader.add_endpoints(app)
+        return app.app.test_client()
+
+    def test_allowlist_and_notifications_are_reloaded(self):
+        """Tests if the allowlist and the notification settings are replaced without a restart."""
+        self.config_dict["twilio"]["call_handling"]["allowed_incoming_phone_numbers"] = {"+111 222 333": "new_car"}
+        self.config_dict["twilio"]["notifications"]["repeated_calls"] = 1
+        self._write_config()
+        result = self.reloader.reload()
+        self.assertEqual(
+            result.reloaded,
+            ["twilio.call_handling.allowed_incoming_phone_numbers", "twilio.notifications.repeated_calls"]
+        )
+        self.assertEqual(result.restart_required, [])
+        self.assertEqual(self.call_handler._car_names, {"+111222333": "new_car"})
+        self.assertTrue(self.call_handler.request_gate.is_allowed("+111222333"))
+        self.assertFalse(self.call_handler.request_gate.is_allowed("+123456789"))
+        self.assertEqual(self.notification_client._n_of_repeated_calls, 1)
+
+    def test_log_level_is_reloaded(self):
+        """Tests if the logging is configured again when its level changes."""
+        self.config_dict["logging"]["console"]["level"] = "warning"
+        self._write_config()
+        self.assertEqual(self.reloader.reload().reloaded, ["logging"])
+        self.assertEqual(self.logger.level, logging.WARNING)
+
+    def test_settings_requiring_restart_are_reported(self):
+        """Tests if the changes of the settings that cannot be reloaded are only reported."""
+        self.config_dict["http_server"]["port"] = 9000
+        self._write_config()
+        with self.assertLogs(LOGGER_NAME, level="WARNING"):
+            result = self.reloader.reload()
+        self.assertEqual(result.restart_required, ["http_server.port"])
+
+    def test_settings_requiring_restart_are_reported_until_restart(self):
+        """Tests if a change requiring a restart is reported again by the next reload, while the reloaded
+        settings are compared with their applied values."""
+        self.config_dict["http_server"]["port"] = 9000
+        self._write_config()
+        with self.assertLogs(LOGGER_NAME, level="WARNING"):
+            self.reloader.reload()
+        self.config_dict["twilio"]["notifications"]["repeated_calls"] = 1
+        self._write_config()
+        with self.assertLogs(LOGGER_NAME, level="WARNING"):
+            result = self.reloader.reload()
+        self.assertEqual(result.reloaded, ["twilio.notifications.repeated_calls"])
+        self.assertEqual(result.restart_required, ["http_server.port"])
+        with self.assertLogs(LOGGER_NAME, level="WARNING"):
+            result = self.reloader.reload()
+        self.assertEqual(result.reloaded, [])
+        self.assertEqual(result.restart_required, ["http_server.port"])
+
+    def test_invalid_config_is_rejected(self):
+        """Tests if an invalid configuration file raises an error and the running configuration is kept."""
+        self.config_dict["twilio"]["notifications"]["repeated_calls"] = "many"
+        self._write_config()
+        with self.assertRaises(Exception):
+            self.reloader.reload()
+        self.assertEqual(self.notification_client._n_of_repeated_calls, 3)
+
+    def test_endpoint_request_without_key_is_rejected(self):
+        """Tests if the configuration is not reloaded without the admin API key in the header."""
+        client = self._create_client()
+        self.assertEqual(client.post("/v2/notifications/admin/reload-config").status_code, 401)
+        response = client.post("/v2/notifications/admin/reload-config?api_key=admin_key")
+        self.assertEqual(response.status_code, 401)
+
+    def test_endpoint_reloads_config(self):
+        """Tests if the endpoint reloads the configuration and returns the changed settings."""
+        self.config_dict["twilio"]["notifications"]["repeated_calls"] = 1
+        self._write_config()
+        response = self._create_client().post(
+            "/v2/notifications/admin/reload-config", headers={"X-Admin-Api-Key": "admin_key"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["reloaded"], ["twilio.notifications.repeated_calls"])
+
+    def test_endpoint_returns_error_for_invalid_config(self):
+        """Tests if the endpoint returns HTTP 400 for an invalid configuration file."""
+        self.config_dict["twilio"]["notifications"]["repeated_calls"] = "many"
+        self._write_config()
+        with self.assertLogs(LOGGER_NAME, level="ERROR"):
+            response = self._create_client().post(
+                "/v2/notifications/admin/reload-config", headers={"X-Admin-Api-Key": "admin_key"}
+            )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("error", response.json)
+
+
+if __name__ == "__main__":
+    unittest.main() # pragma: no cover
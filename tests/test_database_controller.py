@@ -0,0 +1,26 @@
+import unittest
+
+import fleet_notifications.database.database_controller as notifications_db
+from tests._utils.database import initialize_test_db
+
+
+class Test_Pending_Notifications(unittest.TestCase):
+    """Tests saving and restoring the notifications not placed before the shutdown."""
+
+    def setUp(self) -> None:
+        initialize_test_db()
+
+    def test_pending_notifications_are_restored_once(self):
+        """Tests if the pending notifications saved at the shutdown are returned only once."""
+        notifications_db.add_pending_notifications([
+            notifications_db.PendingNotification("test_number", False, "customer", 1)
+        ])
+        self.assertEqual(
+            notifications_db.pop_pending_notifications(),
+            [notifications_db.PendingNotification("test_number", False, "customer", 1)]
+        )
+        self.assertEqual(notifications_db.pop_pending_notifications(), [])
+
+
+if __name__ == "__main__":
+    unittest.main() # pragma: no cover
@@ -0,0 +1,66 @@
+import time
+import unittest
+
+from flask import Flask
+
+import fleet_notifications.database.database_controller as notifications_db
+from fleet_notifications.health import HealthMonitor
+from fleet_notifications.incoming_call_endpoint import FlaskAppWrapper
+from fleet_notifications.script_args.configs import Health
+from tests._utils.database import initialize_test_db
+from tests._utils.state_checker_test_case import create_test_state_checker
+
+
+class Test_Health_Report(unittest.TestCase):
+    """Tests the report of the HealthMonitor class."""
+
+    def setUp(self) -> None:
+        initialize_test_db()
+        self.state_checker = create_test_state_checker()
+        self.health_monitor = HealthMonitor(self.state_checker, Health(max_poll_age_s=10, max_queue_depth=1))
+        self.health_monitor._db_connected = notifications_db.is_connected()
+
+    def test_checker_not_started(self):
+        """Tests that the service is not ready before the state checker receives any states."""
+        report = self.health_monitor.report()
+        self.assertFalse(report["checkers"][0]["alive"])
+        self.assertIsNone(report["checkers"][0]["last_poll_age_s"])
+        self.assertIsNone(report["checkers"][0]["since_lag_s"])
+        self.assertTrue(report["database_connected"])
+        self.assertEqual(len(self.health_monitor.problems(report)), 2)
+
+    def test_stale_poll(self):
+        """Tests that the service is not ready if the last long poll is too old."""
+        self.state_checker.last_poll_at = time.monotonic() - 20
+        problems = self.health_monitor.problems(self.health_monitor.report())
+        self.assertIn("No order states were received from the Fleet Management API recently.", problems)
+
+    def test_since_lag(self):
+        """Tests that the lag of the since watermark is reported in seconds."""
+        self.state_checker.since = int(time.time() * 1000) - 5000
+        self.assertGreaterEqual(self.health_monitor.report()["checkers"][0]["since_lag_s"], 5)
+
+
+class Test_Health_Endpoints(unittest.TestCase):
+    """Tests the health endpoints of the HealthMonitor class."""
+
+    def setUp(self) -> None:
+        self.state_checker = create_test_state_checker()
+        self.health_monitor = HealthMonitor(self.state_checker, Health())
+        app = Flask(__name__)
+        self.health_monitor.add_endpoints(FlaskAppWrapper(app))
+        self.client = app.test_client()
+
+    def test_healthz_fails_if_checker_is_not_running(self):
+        """Tests that the liveness probe fails if the state checker thread is not running."""
+        self.assertEqual(self.client.get("/healthz").status_code, 503)
+
+    def test_readyz_lists_problems(self):
+        """Tests that the readiness probe fails and lists the problems."""
+        response = self.client.get("/readyz")
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("The database is not available.", response.get_json()["problems"])
+
+
+if __name__ == "__main__":
+    unittest.main() # pragma: no cover
@@ -0,0 +1,150 @@
+import json
+import logging
+import queue
+import threading
+import unittest
+
+from fleet_notifications import logs, metrics
+from fleet_notifications.logs import (
+    LOGGER_NAME,
+    _ContextFilter,
+    _DroppingQueueHandler,
+    _JsonFormatter,
+    configure_logging,
+    log_context,
+    stop_logging,
+)
+from fleet_notifications.script_args.configs import Logging
+
+
+class _RecordingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.messages.append(record.getMessage())
+
+
+class _LoggingConfig:
+    def __init__(self, logging_config: Logging):
+        self.logging = logging_config
+
+
+class Test_Dropping_Queue_Handler(unittest.TestCase):
+    """Tests the handler passing records to the logging queue."""
+
+    def test_records_are_dropped_when_queue_is_full(self):
+        """Tests that records not fitting into the queue are dropped and counted."""
+        handler = _DroppingQueueHandler(queue.Queue(maxsize=1))
+        dropped_before = metrics.counter("log_records_dropped").value
+        for i in range(3):
+            handler.handle(logging.makeLogRecord({"msg": "message %s", "args": (i,)}))
+        self.assertEqual(handler.queue.qsize(), 1)
+        self.assertEqual(metrics.counter("log_records_dropped").value - dropped_before, 2)
+
+    def test_records_are_not_formatted_when_queued(self):
+        """Tests that the message of a queued record is built by the listener, not by the caller."""
+        handler = _DroppingQueueHandler(queue.Queue())
+        handler.handle(logging.makeLogRecord({"msg": "message %s", "args": (1,)}))
+        record = handler.queue.get_nowait()
+        self.assertEqual(record.msg, "message %s")
+        self.assertEqual(record.getMessage(), "message 1")
+
+
+class Test_Queue_Logging(unittest.TestCase):
+    """Tests the logging configured to use the queue."""
+
+    def setUp(self) -> None:
+        self.logger = logging.getLogger(LOGGER_NAME)
+        self.original_handlers = list(self.logger.handlers)
+        self.original_level = self.logger.level
+
+    def tearDown(self) -> None:
+        stop_logging()
+        self.logger.handlers = self.original_handlers
+        self.logger.setLevel(self.original_level)
+
+    def test_records_reach_handlers_through_queue(self):
+        """Tests that the records pass through the queue to the configured handlers."""
+        config = Logging(
+            console=Logging.HandlerConfig(level="info", use=True),
+            file=Logging.HandlerConfig(level="info", use=False),
+            queue=Logging.QueueConfig(use=True, max_size=100)
+        )
+        configure_logging("Test", _LoggingConfig(config))
+        self.assertEqual(self.logger.level, logging.INFO)
+        recorder = _RecordingHandler()
+        logs._queue_listener.handlers = logs._queue_listener.handlers + (recorder,)
+        self.logger.info("Order %s is done.", 1)
+        self.logger.debug("Not passed to the handlers")
+        stop_logging()
+        self.assertEqual(recorder.messages, ["Order 1 is done."])
+
+    def test_reconfiguration_replaces_handlers(self):
+        """Tests that configuring the logging again replaces the handlers and stops the previous queue."""
+        config = Logging(
+            console=Logging.HandlerConfig(level="info", use=True),
+            file=Logging.HandlerConfig(level="info", use=False),
+            queue=Logging.QueueConfig(use=True, max_size=100)
+        )
+        configure_logging("Test", _LoggingConfig(config))
+        previous_listener = logs._queue_listener
+        config = config.model_copy(update={
+            "console": Logging.HandlerConfig(level="warning", use=True),
+            "queue": Logging.QueueConfig(use=False)
+        })
+        configure_logging("Test", _LoggingConfig(config))
+        added_handlers = [handler for handler in self.logger.handlers if handler not in self.original_handlers]
+        self.assertEqual(len(added_handlers), 1)
+        self.assertIsInstance(added_handlers[0], logging.StreamHandler)
+        self.assertEqual(self.logger.level, logging.WARNING)
+        self.assertIsNone(logs._queue_listener)
+        self.assertIsNone(previous_listener._thread)
+
+
+class Test_Structured_Logging(unittest.TestCase):
+    """Tests the JSON log format and the log context."""
+
+    def setUp(self) -> None:
+        self.formatter = _JsonFormatter("Fleet Notifications")
+        self.filter = _ContextFilter()
+
+    def _record(self, msg: str, *args, **extra) -> logging.LogRecord:
+        record = logging.makeLogRecord({"msg": msg, "args": args, "levelname": "INFO", **extra})
+        self.filter.filter(record)
+        return record
+
+    def test_json_contains_message_and_context(self):
+        """Tests that the context fields and extra fields are top-level keys of the JSON entry."""
+        with log_context(order_id=1, car_id=2):
+            with log_context(call_sid="CA123"):
+                record = self._record("Order %s is done.", 1, duration_ms=1.5)
+        entry = json.loads(self.formatter.format(record))
+        self.assertEqual(entry["message"], "Order 1 is done.")
+        self.assertEqual(entry["component"], "fleet-notifications")
+        self.assertEqual(entry["level"], "INFO")
+        self.assertEqual(entry["order_id"], 1)
+        self.assertEqual(entry["car_id"], 2)
+        self.assertEqual(entry["call_sid"], "CA123")
+        self.assertEqual(entry["duration_ms"], 1.5)
+
+    def test_context_is_reset_after_block(self):
+        """Tests that the context fields are not added to records logged after the block."""
+        with log_context(order_id=1):
+            pass
+        entry = json.loads(self.formatter.format(self._record("message")))
+        self.assertNotIn("order_id", entry)
+
+    def test_context_is_not_shared_between_threads(self):
+        """Tests that a context set in one thread is not added to records of other threads."""
+        records = []
+        with log_context(order_id=1):
+            thread = threading.Thread(target=lambda: records.append(self._record("message")))
+            thread.start()
+            thread.join()
+        self.assertEqual(records[0].context, {})
+
+
+if __name__ == "__main__":
+    unittest.main() # pragma: no cover
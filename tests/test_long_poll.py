@@ -0,0 +1,140 @@
+import unittest
+
+import urllib3.exceptions
+from fleet_management_http_client_python.exceptions import ( # type: ignore
+    NotFoundException,
+    ServiceException,
+    UnauthorizedException,
+)
+
+from fleet_notifications import metrics
+from fleet_notifications.long_poll import (
+    CircuitBreaker,
+    CircuitState,
+    FailureKind,
+    LongPollClient,
+    classify_failure,
+)
+from fleet_notifications.logs import LOGGER_NAME
+from fleet_notifications.script_args.configs import FleetManagementServer
+
+
+def _failing_request(exception: Exception):
+    def request(timeout_s: float) -> list:
+        raise exception
+    return request
+
+
+class Test_Failure_Classification(unittest.TestCase):
+    """Tests the classification of failed requests to the Fleet Management API."""
+
+    def test_api_exceptions(self):
+        """Tests that the API exceptions are classified by the HTTP status."""
+        self.assertEqual(classify_failure(UnauthorizedException(status=401)), FailureKind.AUTH)
+        self.assertEqual(classify_failure(ServiceException(status=503)), FailureKind.SERVER)
+        self.assertEqual(classify_failure(NotFoundException(status=404)), FailureKind.CLIENT)
+
+    def test_urllib3_exceptions(self):
+        """Tests that timeouts are distinguished from other connection errors."""
+        self.assertEqual(
+            classify_failure(urllib3.exceptions.ReadTimeoutError(None, "/v2/management/order", "timed out")),
+            FailureKind.TIMEOUT
+        )
+        self.assertEqual(
+            classify_failure(urllib3.exceptions.MaxRetryError(
+                None, "/v2/management/order", urllib3.exceptions.ProtocolError("Connection refused")
+            )),
+            FailureKind.CONNECTION
+        )
+
+    def test_other_exceptions(self):
+        """Tests that exceptions not caused by the request are not classified."""
+        self.assertIsNone(classify_failure(KeyError("order")))
+
+
+class Test_Circuit_Breaker(unittest.TestCase):
+    """Tests the CircuitBreaker class."""
+
+    def test_opens_after_threshold(self):
+        """Tests that the circuit opens after the number of consecutive failures reaches the threshold."""
+        breaker = CircuitBreaker(failure_threshold=2, open_s=60)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitState.CLOSED)
+        with self.assertLogs(LOGGER_NAME, level="WARNING"):
+            breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitState.OPEN)
+        self.assertGreater(breaker.time_until_trial(), 0)
+
+    def test_trial_request(self):
+        """Tests that the circuit is half-open after the open period and closes after a success."""
+        breaker = CircuitBreaker(failure_threshold=1, open_s=0.01)
+        with self.assertLogs(LOGGER_NAME, level="WARNING"):
+            breaker.record_failure()
+        breaker._opened_at -= 1
+        self.assertEqual(breaker.state, CircuitState.HALF_OPEN)
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitState.CLOSED)
+
+
+class Test_Long_Poll_Client(unittest.TestCase):
+    """Tests the LongPollClient class."""
+
+    def setUp(self) -> None:
+        self.client = LongPollClient(FleetManagementServer.LongPoll(
+            backoff_base_s=0.001, backoff_max_s=0.001, failure_threshold=100
+        ))
+
+    def test_request_timeout_is_passed(self):
+        """Tests that the request gets the configured timeout and its result is returned."""
+        self.assertEqual(self.client.poll(lambda timeout_s: [timeout_s]), [90.0])
+
+    def test_failure_returns_no_states(self):
+        """Tests that a failed request is logged once and no states are returned."""
+        with self.assertLogs(LOGGER_NAME, level="WARNING") as log:
+            self.assertEqual(self.client.poll(_failing_request(ServiceException(status=503))), [])
+            self.assertEqual(self.client.poll(_failing_request(ServiceException(status=503))), [])
+        self.assertEqual(len(log.output), 1)
+        self.assertEqual(self.client.consecutive_failures, 2)
+
+    def test_single_timeout_is_not_failure(self):
+        """Tests that a timed out long poll does not count as a failure, but not as a response either."""
+        timeout = urllib3.exceptions.ReadTimeoutError(None, "/v2/management/order", "timed out")
+        self.assertEqual(self.client.poll(_failing_request(timeout)), [])
+        self.assertEqual(self.client.consecutive_failures, 0)
+        self.assertFalse(self.client.responded)
+        self.client.poll(lambda timeout_s: [])
+        self.assertTrue(self.client.responded)
+        self.assertEqual(self.client.consecutive_timeouts, 0)
+
+    def test_repeated_timeouts_are_failures(self):
+        """Tests that long polls timing out repeatedly count as failures and open the circuit."""
+        client = LongPollClient(FleetManagementServer.LongPoll(
+            backoff_base_s=0.001, backoff_max_s=0.001, failure_threshold=2
+        ))
+        timeout = urllib3.exceptions.ReadTimeoutError(None, "/v2/management/order", "timed out")
+        with self.assertLogs(LOGGER_NAME, level="WARNING"):
+            for _ in range(3):
+                self.assertEqual(client.poll(_failing_request(timeout)), [])
+        self.assertEqual(client.consecutive_failures, 2)
+        self.assertEqual(client.circuit_breaker.state, CircuitState.OPEN)
+        self.assertFalse(client.responded)
+
+    def test_recovery_is_measured(self):
+        """Tests that the recovery after failures is logged and observed in the metrics."""
+        recoveries = metrics.summary("fleet_management_recovery_s").count
+        with self.assertLogs(LOGGER_NAME, level="ERROR"):
+            self.client.poll(_failing_request(UnauthorizedException(status=401)))
+        with self.assertLogs(LOGGER_NAME, level="INFO") as log:
+            self.assertEqual(self.client.poll(lambda timeout_s: [1]), [1])
+        self.assertIn("available again", log.output[0])
+        self.assertEqual(metrics.summary("fleet_management_recovery_s").count, recoveries + 1)
+        self.assertEqual(self.client.consecutive_failures, 0)
+
+    def test_unknown_exception_is_raised(self):
+        """Tests that exceptions not caused by the request are raised."""
+        with self.assertRaises(KeyError):
+            self.client.poll(_failing_request(KeyError("order")))
+
+
+if __name__ == "__main__":
+    unittest.main() # pragma: no cover
@@ -0,0 +1,120 @@
+import threading
+import time
+import unittest
+
+from fleet_management_http_client_python import CarActionStatus, OrderState, OrderStatus # type: ignore
+
+from tests._utils.mock_api import MockApi, MockApiFault
+
+
+def _state(order_id: int, timestamp: int) -> OrderState:
+    return OrderState(orderId=order_id, timestamp=timestamp, status=OrderStatus.IN_PROGRESS)
+
+
+class Test_Mock_Api_Order_States(unittest.TestCase):
+    """Tests the order states and the long poll of the MockApi."""
+
+    def setUp(self) -> None:
+        self.mock_api = MockApi(long_poll_timeout_s=5.0)
+
+    def test_states_since_timestamp(self):
+        """Tests that the states since the timestamp are returned in the order of their timestamps, optionally
+        only the last `last_n` states of every order."""
+        for state in (_state(1, 3), _state(2, 1), _state(1, 2), _state(2, 4)):
+            self.mock_api._add_order_state(state)
+        self.assertEqual([state.timestamp for state in self.mock_api.get_all_order_states(since=2)], [2, 3, 4])
+        self.assertEqual([state.timestamp for state in self.mock_api.get_all_order_states(last_n=1)], [3, 4])
+
+    def test_request_without_wait_does_not_block(self):
+        """Tests that a request without `wait` returns no states at once if there are none."""
+        start = time.monotonic()
+        self.assertEqual(self.mock_api.get_all_order_states(since=1), [])
+        self.assertLess(time.monotonic() - start, 1.0)
+
+    def test_long_poll_returns_when_state_arrives(self):
+        """Tests that a long poll blocks until a new state is added and then returns it."""
+        state = _state(1, 10)
+        timer = threading.Timer(0.1, self.mock_api._add_order_state, args=(state,))
+        start = time.monotonic()
+        timer.start()
+        states = self.mock_api.get_all_order_states(wait=True, since=10)
+        elapsed_s = time.monotonic() - start
+        timer.join()
+        self.assertEqual(states, [state])
+        self.assertGreaterEqual(elapsed_s, 0.1)
+        self.assertLess(elapsed_s, self.mock_api.long_poll_timeout_s)
+
+    def test_long_poll_ignores_older_states(self):
+        """Tests that a state older than `since` does not end the long poll."""
+        self.mock_api.long_poll_timeout_s = 0.2
+        timer = threading.Timer(0.05, self.mock_api._add_order_state, args=(_state(1, 5),))
+        timer.start()
+        self.assertEqual(self.mock_api.get_all_order_states(wait=True, since=10), [])
+        timer.join()
+
+    def test_long_poll_times_out(self):
+        """Tests that a long poll without new states returns no states after the long-poll timeout."""
+        self.mock_api.long_poll_timeout_s = 0.1
+        start = time.monotonic()
+        self.assertEqual(self.mock_api.get_all_order_states(wait=True, since=1), [])
+        self.assertGreaterEqual(time.monotonic() - start, 0.1)
+
+
+class Test_Mock_Api_Faults(unittest.TestCase):
+    """Tests the latency and the faults injected into the MockApi requests."""
+
+    def test_forced_faults_raise_configured_exception(self):
+        """Tests that the next requests raise the given exception and the following requests succeed."""
+        mock_api = MockApi()
+        mock_api.fail_next_requests(2, ConnectionError("Connection refused"))
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                mock_api.get_cars()
+        self.assertEqual(mock_api.get_cars(), [])
+
+    def test_forced_faults_raise_mock_api_fault_by_default(self):
+        """Tests that a forced fault without an exception raises the MockApiFault."""
+        mock_api = MockApi()
+        mock_api.fail_next_requests()
+        with self.assertRaises(MockApiFault):
+            mock_api.get_all_order_states()
+        self.assertEqual(mock_api.get_all_order_states(), [])
+
+    def test_fault_rate(self):
+        """Tests that with the fault rate 1, every request raises the MockApiFault."""
+        mock_api = MockApi(fault_rate=1.0)
+        for _ in range(3):
+            with self.assertRaises(MockApiFault):
+                mock_api.get_orders()
+
+    def test_failed_requests_are_counted(self):
+        """Tests that every request is counted by its name, including the failed ones."""
+        mock_api = MockApi()
+        mock_api.fail_next_requests()
+        with self.assertRaises(MockApiFault):
+            mock_api.get_cars()
+        mock_api.get_cars()
+        mock_api.get_orders()
+        self.assertEqual(mock_api.request_count["get_cars"], 2)
+        self.assertEqual(mock_api.total_requests, 3)
+
+    def test_latency(self):
+        """Tests that every request takes at least the configured latency."""
+        mock_api = MockApi(latency_s=0.1)
+        start = time.monotonic()
+        mock_api.get_cars()
+        self.assertGreaterEqual(time.monotonic() - start, 0.1)
+
+    def test_transition_delay(self):
+        """Tests that a paused car switches its action state only after the transition delay."""
+        mock_api = MockApi(transition_delay_s=0.1)
+        mock_api.pause_car(1)
+        self.assertEqual(mock_api.get_car_action_states(1), [])
+        deadline = time.monotonic() + 5.0
+        while not mock_api.get_car_action_states(1) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(mock_api.get_car_action_states(1, last_n=1)[0].action_status, CarActionStatus.PAUSED)
+
+
+if __name__ == "__main__":
+    unittest.main() # pragma: no cover
@@ -0,0 +1,153 @@
+import threading
+import unittest
+
+from fleet_notifications.notification_dispatcher import (
+    NotificationDispatcher,
+    NotificationJob,
+    NotificationPriority,
+)
+from fleet_notifications.script_args.configs import Twilio
+from fleet_notifications.logs import LOGGER_NAME
+
+
+class _RecordingNotificationClient:
+    def __init__(self):
+        self.calls = []
+        self.called = threading.Event()
+
+    def call_phone(self, phone_number: str, under_test: bool, origin_timestamp_ms: int | None = None, on_placing=None):
+        self.calls.append((phone_number, under_test))
+        self.called.set()
+
+
+def _queue_jobs(dispatcher: NotificationDispatcher, priority: NotificationPriority, count: int) -> None:
+    for i in range(count):
+        dispatcher._queues[priority].append(NotificationJob(f"{priority.value}_{i}", False, priority))
+
+
+class Test_Dispatcher_Scheduling(unittest.TestCase):
+    """Tests the weighted fair scheduling of the NotificationDispatcher class."""
+
+    def setUp(self) -> None:
+        self.dispatcher = NotificationDispatcher(
+            _RecordingNotificationClient(),
+            Twilio.Notifications.Dispatcher(admin_weight=3, customer_weight=2, test_weight=1)
+        )
+
+    def test_classes_share_workers_by_weight(self):
+        """Tests that every class gets a share of the picks proportional to its weight."""
+        for priority in NotificationPriority:
+            _queue_jobs(self.dispatcher, priority, 10)
+        picked = [self.dispatcher._next_job(tuple(NotificationPriority)).priority for _ in range(6)]
+        self.assertEqual(picked.count(NotificationPriority.ADMIN), 3)
+        self.assertEqual(picked.count(NotificationPriority.CUSTOMER), 2)
+        self.assertEqual(picked.count(NotificationPriority.TEST), 1)
+
+    def test_admin_is_picked_first(self):
+        """Tests that a waiting admin notification is picked before the others."""
+        _queue_jobs(self.dispatcher, NotificationPriority.CUSTOMER, 5)
+        _queue_jobs(self.dispatcher, NotificationPriority.ADMIN, 1)
+        job = self.dispatcher._next_job(tuple(NotificationPriority))
+        self.assertEqual(job.priority, NotificationPriority.ADMIN)
+
+    def test_reserved_worker_serves_only_admin(self):
+        """Tests that a worker reserved for admin notifications does not pick other jobs."""
+        _queue_jobs(self.dispatcher, NotificationPriority.CUSTOMER, 1)
+        self.assertIsNone(self.dispatcher._next_job((NotificationPriority.ADMIN,)))
+
+    def test_empty_queues(self):
+        """Tests that no job is returned when the queues are empty."""
+        self.assertIsNone(self.dispatcher._next_job(tuple(NotificationPriority)))
+        self.assertEqual(self.dispatcher.queue_depth(), 0)
+
+
+class Test_Dispatcher_Dispatch(unittest.TestCase):
+    """Tests the dispatch method of the NotificationDispatcher class."""
+
+    def test_dispatch_calls_phone(self):
+        """Tests that a dispatched notification is placed by a worker."""
+        client = _RecordingNotificationClient()
+        dispatcher = NotificationDispatcher(client, Twilio.Notifications.Dispatcher(workers=2))
+        dispatcher.dispatch("test_number", False, NotificationPriority.CUSTOMER)
+        self.assertTrue(client.called.wait(timeout=5))
+        self.assertEqual(client.calls, [("test_number", False)])
+
+    def test_under_test_uses_test_priority(self):
+        """Tests that notifications for cars under test are queued with the TEST priority."""
+        dispatcher = NotificationDispatcher(_RecordingNotificationClient(), Twilio.Notifications.Dispatcher())
+        dispatcher._workers.append(threading.Thread())  # prevents workers from starting and taking the job
+        dispatcher.dispatch("test_number", True, NotificationPriority.ADMIN)
+        self.assertEqual(len(dispatcher._queues[NotificationPriority.TEST]), 1)
+        self.assertEqual(dispatcher.queue_depth(), 1)
+
+
+class _BlockingNotificationClient:
+    """Blocks the calls until released. Calls to the `placed_numbers` are requested from Twilio before blocking."""
+
+    def __init__(self, placed_numbers: tuple[str, ...] = ()):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self._placed_numbers = placed_numbers
+
+    def call_phone(self, phone_number: str, under_test: bool, origin_timestamp_ms: int | None = None, on_placing=None):
+        if phone_number in self._placed_numbers:
+            on_placing()
+        self.started.set()
+        self.release.wait(timeout=5)
+
+
+class Test_Dispatcher_Shutdown(unittest.TestCase):
+    """Tests the shutdown method of the NotificationDispatcher class."""
+
+    def test_queued_notifications_are_placed_before_shutdown(self):
+        """Tests that the workers place the queued notifications and then stop."""
+        client = _RecordingNotificationClient()
+        dispatcher = NotificationDispatcher(client, Twilio.Notifications.Dispatcher(workers=2))
+        dispatcher.dispatch("test_number", False, NotificationPriority.CUSTOMER)
+        self.assertEqual(dispatcher.shutdown(timeout_s=5), [])
+        self.assertEqual(client.calls, [("test_number", False)])
+        self.assertFalse(any(worker.is_alive() for worker in dispatcher._workers))
+
+    def test_notifications_not_placed_in_time_are_returned(self):
+        """Tests that the notifications taken by a worker but not requested from Twilio and the notifications
+        still queued after the timeout are returned and the queued ones are not placed."""
+        client = _BlockingNotificationClient()
+        dispatcher = NotificationDispatcher(
+            client, Twilio.Notifications.Dispatcher(workers=2, reserved_admin_workers=1)
+        )
+        dispatcher.dispatch("first", False, NotificationPriority.CUSTOMER, origin_timestamp_ms=0)
+        self.assertTrue(client.started.wait(timeout=5))
+        dispatcher.dispatch("second", False, NotificationPriority.CUSTOMER, origin_timestamp_ms=1)
+        unplaced = dispatcher.shutdown(timeout_s=0.1)
+        client.release.set()
+        self.assertEqual(
+            [(job.phone_number, job.origin_timestamp_ms) for job in unplaced], [("first", 0), ("second", 1)]
+        )
+        self.assertEqual(dispatcher.queue_depth(), 0)
+
+    def test_calls_requested_from_twilio_are_not_returned(self):
+        """Tests that a call already requested from Twilio is not returned, so it is not placed again
+        after the restart."""
+        client = _BlockingNotificationClient(placed_numbers=("first",))
+        dispatcher = NotificationDispatcher(
+            client, Twilio.Notifications.Dispatcher(workers=2, reserved_admin_workers=1)
+        )
+        dispatcher.dispatch("first", False, NotificationPriority.CUSTOMER)
+        self.assertTrue(client.started.wait(timeout=5))
+        dispatcher.dispatch("second", False, NotificationPriority.CUSTOMER)
+        with self.assertLogs(LOGGER_NAME, level="WARNING"):
+            unplaced = dispatcher.shutdown(timeout_s=0.1)
+        client.release.set()
+        self.assertEqual([job.phone_number for job in unplaced], ["second"])
+
+    def test_dispatch_after_shutdown(self):
+        """Tests that notifications are not queued after the shutdown."""
+        dispatcher = NotificationDispatcher(_RecordingNotificationClient(), Twilio.Notifications.Dispatcher())
+        dispatcher.shutdown(timeout_s=0)
+        with self.assertLogs(LOGGER_NAME, level="WARNING"):
+            dispatcher.dispatch("test_number", False, NotificationPriority.ADMIN)
+        self.assertEqual(dispatcher.queue_depth(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main() # pragma: no cover
@@ -3,6 +3,8 @@ import unittest
 from twilio.rest import Client # type: ignore
 from twilio.rest.api.v2010.account.call import CallInstance # type: ignore
 
+from fleet_notifications import metrics
+from fleet_notifications.clock import VirtualClock, set_clock
 from fleet_notifications.notifications_client import NotificationClient
 from fleet_notifications.logs import LOGGER_NAME
 from tests._utils.mock_twilio_client import MockTwilioClient
@@ -22,6 +24,17 @@ class Test_Notification_Client_Initialization(unittest.TestCase):
         self.assertEqual(notification_client._call_status_timeout_s, TEST_TWILIO_CONFIG.notifications.call_status_timeout_s)
         self.assertTrue(isinstance(notification_client._client, Client))
 
+    def test_update_settings(self):
+        """Tests if the notification settings are replaced and the credentials are kept."""
+        notification_client = NotificationClient(TEST_TWILIO_CONFIG)
+        notification_client.update_settings(TEST_TWILIO_CONFIG.notifications.model_copy(
+            update={"play_sound_url": "https://example.com", "repeated_calls": 1, "call_status_timeout_s": 10}
+        ))
+        self.assertEqual(notification_client._url, "https://example.com")
+        self.assertEqual(notification_client._n_of_repeated_calls, 1)
+        self.assertEqual(notification_client._call_status_timeout_s, 10)
+        self.assertEqual(notification_client._auth_token, TEST_TWILIO_CONFIG.auth_token)
+
 
 class Test_Notification_Client_Is_Call_Picked_Up(unittest.TestCase):
     """Tests the _is_call_picked_up method of the NotificationClient class."""
@@ -43,10 +56,15 @@ class Test_Notification_Client_Wait_For_Pickup(unittest.TestCase):
     """Tests the _wait_for_pickup method of the NotificationClient class."""
 
     def setUp(self) -> None:
+        # The pickup is polled on the virtual clock, so the tests do not wait for the polling interval
+        self.previous_clock = set_clock(VirtualClock())
         self.notification_client = NotificationClient(TEST_TWILIO_CONFIG)
         self.notification_client._client = MockTwilioClient()
         self.call = self.notification_client._client.calls.create()
 
+    def tearDown(self) -> None:
+        set_clock(self.previous_clock)
+
     def test_wait_for_pickup_completed(self):
         """Tests if the _wait_for_pickup method returns true when the call is completed."""
         self.notification_client._client.calls.get(self.call.sid).fetch().status = CallInstance.Status.COMPLETED
@@ -76,10 +94,15 @@ class Test_Notification_Client_Call_Phone(unittest.TestCase):
     """Tests the call_phone method of the NotificationClient class."""
 
     def setUp(self) -> None:
+        # The pickup is polled on the virtual clock, so the tests do not wait for the polling interval
+        self.previous_clock = set_clock(VirtualClock())
         self.notification_client = NotificationClient(TEST_TWILIO_CONFIG)
         self.notification_client._client = MockTwilioClient()
         self.call = self.notification_client._client.calls.create()
 
+    def tearDown(self) -> None:
+        set_clock(self.previous_clock)
+
     def test_call_phone_no_number(self):
         """Tests if the call_phone method logs a warning when no phone number is provided."""
         with self.assertLogs(LOGGER_NAME, level="WARNING") as log:
@@ -107,6 +130,22 @@ class Test_Notification_Client_Call_Phone(unittest.TestCase):
                 "An error occured while handling a call to number EXCEPTION : Forced test exception"
             ), -1)
 
+    def test_call_phone_records_end_to_end_lag(self):
+        """Tests if the call_phone method records the lag from the order state to the first placed call."""
+        self.notification_client._client.calls.get(self.call.sid).fetch().status = CallInstance.Status.COMPLETED
+        lag = metrics.histogram("notification_end_to_end_lag_s")
+        count_before = lag.snapshot()["count"]
+        self.notification_client.call_phone("test_number", under_test=False, origin_timestamp_ms=0)
+        self.assertEqual(lag.snapshot()["count"], count_before + 1)
+
+    def test_call_phone_reports_placing(self):
+        """Tests if the on_placing callback is called when the call is requested from Twilio."""
+        self.notification_client._client.calls.get(self.call.sid).fetch().status = CallInstance.Status.COMPLETED
+        placing = []
+        with self.assertLogs(LOGGER_NAME, level="INFO"):
+            self.notification_client.call_phone("test_number", under_test=False, on_placing=lambda: placing.append(1))
+        self.assertEqual(placing, [1])
+
     def test_call_phone_under_test(self):
         """Tests if the call_phone method does not do anything when under test is True."""
         with self.assertNoLogs(LOGGER_NAME, level="INFO") as log:
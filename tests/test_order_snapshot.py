@@ -0,0 +1,57 @@
+import os
+import tempfile
+import unittest
+
+from fleet_management_http_client_python import OrderStatus # type: ignore
+
+from fleet_notifications.order_record import OrderRecord
+from fleet_notifications.order_snapshot import read_snapshot, snapshot_path, write_snapshot
+from fleet_notifications.logs import LOGGER_NAME
+
+
+class Test_Order_Snapshot(unittest.TestCase):
+    """Tests writing and reading the snapshot of the order cache."""
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = snapshot_path(self.directory.name, "site")
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_records_are_restored(self):
+        """Tests if the written records are read back with all their fields."""
+        write_snapshot(self.path, [
+            OrderRecord(id=1, car_id=2, status=OrderStatus.IN_PROGRESS, timestamp=3, notification_phone="+420 123"),
+            OrderRecord(id=4, car_id=5, status=None, timestamp=0, notification_phone=None),
+            OrderRecord(id=6, car_id=5, status=OrderStatus.TO_ACCEPT, timestamp=7, notification_phone=""),
+        ])
+        records = read_snapshot(self.path)
+        self.assertEqual(
+            [(r.id, r.car_id, r.status, r.timestamp, r.notification_phone) for r in records],
+            [(1, 2, OrderStatus.IN_PROGRESS, 3, "+420 123"), (4, 5, None, 0, None), (6, 5, OrderStatus.TO_ACCEPT, 7, "")]
+        )
+
+    def test_missing_snapshot(self):
+        """Tests if no records are returned when there is no snapshot."""
+        self.assertIsNone(read_snapshot(self.path))
+
+    def test_corrupted_snapshot(self):
+        """Tests if a truncated snapshot is ignored with a warning."""
+        write_snapshot(self.path, [
+            OrderRecord(id=1, car_id=2, status=OrderStatus.IN_PROGRESS, timestamp=3, notification_phone="+420 123")
+        ])
+        with open(self.path, "r+b") as file:
+            file.truncate(os.path.getsize(self.path) - 1)
+        with self.assertLogs(LOGGER_NAME, level="WARNING") as log:
+            self.assertIsNone(read_snapshot(self.path))
+        self.assertNotEqual(log.output[0].find("is corrupted"), -1)
+
+    def test_snapshot_path_of_unnamed_site(self):
+        """Tests if the snapshot files are named like the tables of the orders of the sites."""
+        self.assertEqual(os.path.basename(snapshot_path(self.directory.name)), "orders.snapshot")
+        self.assertEqual(os.path.basename(self.path), "orders_site.snapshot")
+
+
+if __name__ == "__main__":
+    unittest.main() # pragma: no cover
@@ -0,0 +1,126 @@
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from fleet_notifications import metrics, profiling
+from fleet_notifications.logs import LOGGER_NAME
+from fleet_notifications.script_args.configs import Profiling
+
+
+class Test_Iteration_Phases(unittest.TestCase):
+    """Tests timing the phases of loop iterations."""
+
+    def setUp(self) -> None:
+        profiling.configure_profiling(Profiling(use=True, slowest_iterations=2, dump_interval_s=3600))
+
+    def tearDown(self) -> None:
+        profiling.configure_profiling(Profiling())
+
+    def test_phases_are_recorded_as_metrics(self):
+        """Tests that the durations of the phases and of the iteration are observed in the metrics."""
+        phase_count = metrics.summary("test_loop_phase_fetch_orders_s").count
+        iteration_count = metrics.summary("test_loop_iteration_s").count
+        with profiling.iteration("test_loop") as profile:
+            with profiling.phase("fetch_orders"):
+                pass
+            with profiling.phase("fetch_orders"):
+                pass
+        self.assertEqual(list(profile.phases), ["fetch_orders"])
+        self.assertGreaterEqual(profile.duration_s, profile.phases["fetch_orders"])
+        self.assertEqual(metrics.summary("test_loop_phase_fetch_orders_s").count, phase_count + 1)
+        self.assertEqual(metrics.summary("test_loop_iteration_s").count, iteration_count + 1)
+
+    def test_discarded_iteration_is_not_recorded(self):
+        """Tests that a discarded iteration is not observed in the metrics."""
+        iteration_count = metrics.summary("discarded_loop_iteration_s").count
+        with profiling.iteration("discarded_loop") as profile:
+            profile.discard()
+        self.assertEqual(metrics.summary("discarded_loop_iteration_s").count, iteration_count)
+
+    def test_phase_outside_iteration_is_ignored(self):
+        """Tests that a phase run outside of any iteration does nothing."""
+        with profiling.phase("fetch_cars"):
+            pass
+
+    def test_slowest_iterations_are_logged(self):
+        """Tests that the dump contains only the slowest iterations, the slowest first."""
+        recorder = profiling.SlowIterationRecorder(n_of_slowest=2, dump_interval_s=3600)
+        for duration_s in (0.3, 0.1, 0.2):
+            profile = profiling.IterationProfile("checker", {"states": 1})
+            profile.duration_s = duration_s
+            recorder.record(profile)
+        recorder._last_dump -= 3600
+        with self.assertLogs(LOGGER_NAME, level="INFO") as log:
+            recorder.record(profiling.IterationProfile("checker", {}))
+        lines = log.output[0].splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertIn("300.0 ms", lines[1])
+        self.assertIn("200.0 ms", lines[2])
+
+
+class Test_Disabled_Phases(unittest.TestCase):
+    """Tests that the iterations are not timed if the profiling is disabled."""
+
+    def test_iteration_is_none(self):
+        """Tests that the block is run without a profile."""
+        profiling.configure_profiling(Profiling(use=False))
+        with profiling.iteration("checker") as profile:
+            self.assertIsNone(profile)
+
+
+class Test_Sampling_Profiler(unittest.TestCase):
+    """Tests the sampling profiler."""
+
+    def test_samples_stacks_of_busy_thread(self):
+        """Tests that the profiler records the stack of a thread running while sampling."""
+        stopped = threading.Event()
+
+        def busy_function():
+            while not stopped.is_set():
+                time.sleep(0.001)
+
+        thread = threading.Thread(target=busy_function, name="busy-thread")
+        thread.start()
+        profiler = profiling.SamplingProfiler(interval_s=0.001)
+        with self.assertLogs(LOGGER_NAME, level="INFO"):
+            profiler.toggle()
+            self.assertTrue(profiler.running)
+            time.sleep(0.1)
+            profiler.toggle()
+        stopped.set()
+        thread.join()
+        report = profiler.report()
+        self.assertFalse(report["running"])
+        self.assertGreater(report["samples"], 0)
+        self.assertTrue(any(
+            entry["stack"].startswith("busy-thread;") and "busy_function" in entry["stack"]
+            for entry in report["stacks"]
+        ))
+
+    def test_stop_while_sampling_does_not_hang(self):
+        """Tests that stopping the profiler returns when its thread is taking a sample."""
+        profiler = profiling.SamplingProfiler(interval_s=0.001)
+        sampling = threading.Event()
+        collapse_stack = profiling._collapse_stack
+
+        def slow_collapse_stack(*args):
+            sampling.set()
+            time.sleep(0.05)
+            return collapse_stack(*args)
+
+        with patch.object(profiling, "_collapse_stack", slow_collapse_stack), \
+                self.assertLogs(LOGGER_NAME, level="INFO"):
+            for _ in range(5):
+                sampling.clear()
+                profiler.start()
+                sampling.wait(timeout=5)
+                stopping = threading.Thread(target=profiler.stop, daemon=True)
+                stopping.start()
+                stopping.join(timeout=5)
+                self.assertFalse(stopping.is_alive(), "SamplingProfiler.stop() did not return")
+        self.assertFalse(profiler.running)
+
+
+if __name__ == "__main__":
+    unittest.main() # pragma: no cover
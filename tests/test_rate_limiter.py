@@ -0,0 +1,110 @@
+import unittest
+
+from twilio.base.exceptions import TwilioRestException # type: ignore
+from twilio.rest.api.v2010.account.call import CallInstance # type: ignore
+
+from fleet_notifications.rate_limiter import TokenBucket, TwilioRateLimiter
+from fleet_notifications.notifications_client import NotificationClient
+from fleet_notifications.script_args.configs import Twilio
+from fleet_notifications.logs import LOGGER_NAME
+from tests._utils.mock_twilio_client import MockTwilioClient
+from tests._utils.testing_configs import TEST_TWILIO_CONFIG
+
+
+_FAST_RATE_LIMIT = Twilio.Notifications.RateLimit(
+    calls_create_per_s=1000, calls_fetch_per_s=1000, burst=1, max_retries=2, max_backoff_s=0.01
+)
+
+
+class Test_Token_Bucket(unittest.TestCase):
+    """Tests the TokenBucket class."""
+
+    def test_acquire_within_capacity_does_not_wait(self):
+        """Tests that tokens available in the bucket are handed out immediately."""
+        bucket = TokenBucket(rate=1, capacity=3)
+        for _ in range(3):
+            self.assertLess(bucket.acquire(), 0.01)
+
+    def test_acquire_over_capacity_waits_for_refill(self):
+        """Tests that acquiring a token from an empty bucket waits for the refill."""
+        bucket = TokenBucket(rate=20, capacity=1)
+        bucket.acquire()
+        self.assertGreater(bucket.acquire(), 0.02)
+
+    def test_blocked_bucket_waits(self):
+        """Tests that no tokens are handed out while the bucket is blocked."""
+        bucket = TokenBucket(rate=1000, capacity=1)
+        bucket.block_for(0.05)
+        self.assertGreater(bucket.acquire(), 0.03)
+
+    def test_try_acquire_does_not_wait(self):
+        """Tests that try_acquire fails immediately when the bucket is empty."""
+        bucket = TokenBucket(rate=1, capacity=1)
+        self.assertTrue(bucket.try_acquire())
+        self.assertFalse(bucket.try_acquire())
+
+
+class Test_Twilio_Rate_Limiter(unittest.TestCase):
+    """Tests the TwilioRateLimiter class against the mock Twilio client."""
+
+    def setUp(self) -> None:
+        self.limiter = TwilioRateLimiter(_FAST_RATE_LIMIT)
+        self.client = MockTwilioClient()
+
+    def test_throttled_create_is_retried(self):
+        """Tests that a create request rejected with 429 and 503 is retried and eventually succeeds."""
+        self.client.calls.throttled_statuses = [429, 503]
+        with self.assertLogs(LOGGER_NAME, level="WARNING"):
+            call = self.limiter.create(lambda: self.client.calls.create(to="test_number"))
+        self.assertEqual(self.client.calls.create_count, 3)
+        self.assertEqual(self.client.calls.get(call.sid), call)
+
+    def test_throttling_lowers_rate(self):
+        """Tests that the rate of the throttled budget is lowered and the other budget is unaffected."""
+        self.client.calls.throttled_statuses = [429]
+        with self.assertLogs(LOGGER_NAME, level="WARNING"):
+            self.limiter.create(lambda: self.client.calls.create(to="test_number"))
+        self.assertLess(self.limiter.create_limiter.rate, _FAST_RATE_LIMIT.calls_create_per_s)
+        self.assertEqual(self.limiter.fetch_limiter.rate, _FAST_RATE_LIMIT.calls_fetch_per_s)
+
+    def test_retries_are_limited(self):
+        """Tests that the request fails after the configured number of retries."""
+        self.client.calls.throttled_statuses = [429, 429, 429, 429]
+        with self.assertLogs(LOGGER_NAME, level="WARNING"):
+            with self.assertRaises(TwilioRestException):
+                self.limiter.create(lambda: self.client.calls.create(to="test_number"))
+        self.assertEqual(self.client.calls.create_count, _FAST_RATE_LIMIT.max_retries + 1)
+
+    def test_other_errors_are_not_retried(self):
+        """Tests that errors other than throttling are raised immediately."""
+        self.client.calls.throttled_statuses = [400]
+        with self.assertRaises(TwilioRestException):
+            self.limiter.create(lambda: self.client.calls.create(to="test_number"))
+        self.assertEqual(self.client.calls.create_count, 1)
+
+    def test_throttled_fetch_is_retried(self):
+        """Tests that a throttled call status fetch is retried."""
+        call = self.client.calls.create(to="test_number")
+        call.throttled_statuses = [429]
+        with self.assertLogs(LOGGER_NAME, level="WARNING"):
+            self.assertEqual(self.limiter.fetch(call.fetch).status, CallInstance.Status.QUEUED)
+        self.assertEqual(call.fetch_count, 2)
+
+
+class Test_Notification_Client_Rate_Limiting(unittest.TestCase):
+    """Tests that the NotificationClient places calls through the rate limiter."""
+
+    def test_throttled_pickup_polling_is_retried(self):
+        """Tests that the pickup polling survives a throttled status fetch."""
+        notification_client = NotificationClient(TEST_TWILIO_CONFIG)
+        notification_client._rate_limiter = TwilioRateLimiter(_FAST_RATE_LIMIT)
+        notification_client._client = MockTwilioClient()
+        call = notification_client._client.calls.create()
+        call.fetch().status = CallInstance.Status.COMPLETED
+        call.throttled_statuses = [429]
+        with self.assertLogs(LOGGER_NAME, level="WARNING"):
+            self.assertTrue(notification_client._wait_for_pickup(call))
+
+
+if __name__ == "__main__":
+    unittest.main() # pragma: no cover
@@ -0,0 +1,101 @@
+import unittest
+
+from twilio.request_validator import RequestValidator # type: ignore
+
+from fleet_notifications import metrics
+from fleet_notifications.request_gate import Rejection, RequestGate, normalize_phone_number
+from fleet_notifications.script_args.configs import Twilio
+
+
+_URL = "https://example.com/v2/notifications/handle-call"
+_AUTH_TOKEN = "test_token"
+
+
+def _signed_request(phone_number: str, call_sid: str = "CA1") -> tuple[dict[str, str], str]:
+    params = {"CallSid": call_sid, "From": phone_number}
+    return params, RequestValidator(_AUTH_TOKEN).compute_signature(_URL, params)
+
+
+class Test_Phone_Number_Normalization(unittest.TestCase):
+    """Tests the normalize_phone_number function."""
+
+    def test_separators_are_removed(self):
+        """Tests that spaces, dashes, dots and parentheses are removed from the number."""
+        self.assertEqual(normalize_phone_number("+420 (123) 456-78.9"), "+420123456789")
+        self.assertEqual(normalize_phone_number("test_number"), "test_number")
+
+
+class Test_Request_Gate(unittest.TestCase):
+    """Tests the RequestGate class."""
+
+    def setUp(self) -> None:
+        self.gate = RequestGate(
+            _AUTH_TOKEN, {"+420 123 456 789": "car"}, Twilio.CallHandling.RequestGate(requests_per_s=0.001, burst=2)
+        )
+
+    def _check(self, params: dict[str, str], signature: str, source: str = "127.0.0.1") -> Rejection | None:
+        return self.gate.check(_URL, params, params, signature, source)
+
+    def test_signed_request_from_allowed_number(self):
+        """Tests that a signed request from an allowed number is accepted, whatever the number formatting."""
+        self.assertIsNone(self._check(*_signed_request("+420123456789")))
+
+    def test_number_not_allowed(self):
+        """Tests that a request from a number not in the allowlist is rejected and counted."""
+        rejected = metrics.counter("webhook_rejected_not_allowed").value
+        self.assertEqual(self._check(*_signed_request("+420000000000")), Rejection.NOT_ALLOWED)
+        self.assertEqual(metrics.counter("webhook_rejected_not_allowed").value, rejected + 1)
+
+    def test_invalid_signature(self):
+        """Tests that a request with an invalid signature is rejected."""
+        params, _ = _signed_request("+420123456789")
+        self.assertEqual(self._check(params, "invalid"), Rejection.INVALID_SIGNATURE)
+
+    def test_rate_limit_per_source(self):
+        """Tests that the requests over the burst are rejected only for the source that sent them."""
+        for call_sid in ("CA1", "CA2"):
+            self.assertIsNone(self._check(*_signed_request("+420123456789", call_sid)))
+        rejection = self._check(*_signed_request("+420123456789", "CA3"))
+        self.assertEqual(rejection, Rejection.RATE_LIMITED)
+        self.assertEqual(rejection.http_status, 429)
+        self.assertIsNone(self._check(*_signed_request("+420123456789", "CA3"), source="127.0.0.2"))
+
+    def test_invalid_requests_do_not_use_up_rate_limit(self):
+        """Tests that the requests with an invalid signature are rejected without taking the tokens of the source."""
+        params, _ = _signed_request("+420123456789")
+        for _ in range(3):
+            self.assertEqual(self._check(params, "invalid"), Rejection.INVALID_SIGNATURE)
+        self.assertIsNone(self._check(*_signed_request("+420123456789")))
+
+    def test_client_address_from_proxy_header(self):
+        """Tests that the client address is the last address in the configured header, or the connection address."""
+        gate = RequestGate(
+            _AUTH_TOKEN, {}, Twilio.CallHandling.RequestGate(client_address_header="X-Forwarded-For")
+        )
+        headers = {"X-Forwarded-For": "10.0.0.1, 203.0.113.5"}
+        self.assertEqual(gate.client_address("127.0.0.1", headers), "203.0.113.5")
+        self.assertEqual(gate.client_address("127.0.0.1", {}), "127.0.0.1")
+        self.assertEqual(self.gate.client_address("127.0.0.1", headers), "127.0.0.1")
+
+    def test_allowlist_is_replaced(self):
+        """Tests that the requests are checked against the replaced allowlist."""
+        self.gate.set_allowed_phone_numbers({"+420 000 000 000": "car"})
+        self.assertEqual(self._check(*_signed_request("+420123456789")), Rejection.NOT_ALLOWED)
+        self.assertIsNone(self._check(*_signed_request("+420000000000")))
+
+    def test_rate_limit_can_be_skipped(self):
+        """Tests that the requests over the burst are accepted if the rate is not limited."""
+        for call_sid in ("CA1", "CA2", "CA3"):
+            params, signature = _signed_request("+420123456789", call_sid)
+            self.assertIsNone(self.gate.check(_URL, params, params, signature, "127.0.0.1", limit_rate=False))
+
+    def test_repeated_request_is_accepted(self):
+        """Tests that a request repeated with the same CallSid and signature, e.g. retried by Twilio, is let through
+        to the call handler, which answers it with the response to the first request."""
+        request = _signed_request("+420123456789")
+        self.assertIsNone(self._check(*request))
+        self.assertIsNone(self._check(*request))
+
+
+if __name__ == "__main__":
+    unittest.main() # pragma: no cover
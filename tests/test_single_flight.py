@@ -0,0 +1,65 @@
+import threading, unittest
+
+from fleet_notifications import metrics
+from fleet_notifications.single_flight import SingleFlight
+
+
+class Test_Single_Flight(unittest.TestCase):
+    """Tests the SingleFlight class."""
+
+    def test_concurrent_calls_share_result(self):
+        """Tests that concurrent calls with the same key run the function once and get its result."""
+        single_flight = SingleFlight[str, int](name="test_concurrent")
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def function() -> int:
+            calls.append(1)
+            started.set()
+            release.wait()
+            return 42
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(single_flight.do("key", function)))
+        leader.start()
+        started.wait()
+        follower = threading.Thread(target=lambda: results.append(single_flight.do("key", function)))
+        follower.start()
+        while metrics.counter("single_flight_test_concurrent_shared").value == 0:
+            pass
+        release.set()
+        leader.join()
+        follower.join()
+        self.assertEqual(results, [42, 42])
+        self.assertEqual(len(calls), 1)
+
+    def test_result_is_not_remembered_without_ttl(self):
+        """Tests that the function runs again once the previous call finished if no TTL is set."""
+        single_flight = SingleFlight[str, int]()
+        self.assertEqual(single_flight.do("key", lambda: 1), 1)
+        self.assertEqual(single_flight.do("key", lambda: 2), 2)
+
+    def test_result_is_remembered_for_ttl(self):
+        """Tests that the result is returned to later calls until the TTL elapses."""
+        single_flight = SingleFlight[str, int](ttl_s=60)
+        self.assertEqual(single_flight.do("key", lambda: 1), 1)
+        self.assertEqual(single_flight.do("key", lambda: 2), 1)
+        self.assertEqual(single_flight.do("other_key", lambda: 3), 3)
+        expires_at, result = single_flight._results["key"]
+        single_flight._results["key"] = (expires_at - 61, result)
+        self.assertEqual(single_flight.do("key", lambda: 4), 4)
+
+    def test_failure_is_not_remembered(self):
+        """Tests that an exception is raised to the caller and the next call runs the function again."""
+        single_flight = SingleFlight[str, int](ttl_s=60)
+
+        def fail() -> int:
+            raise ValueError("failed")
+
+        with self.assertRaises(ValueError):
+            single_flight.do("key", fail)
+        self.assertEqual(single_flight.do("key", lambda: 1), 1)
+
+
+if __name__ == "__main__":
+    unittest.main() # pragma: no cover
@@ -0,0 +1,106 @@
+import threading, unittest
+from unittest.mock import patch
+
+from fleet_management_http_client_python import ApiClient, CarApi, Configuration, OrderApi # type: ignore
+
+from fleet_notifications import metrics
+from fleet_notifications.single_flight_api import configure_single_flight, SingleFlightCarApi, SingleFlightOrderApi
+
+
+def _create_api_client() -> ApiClient:
+    return ApiClient(Configuration(host="http://example.com", api_key={'APIKeyAuth': "test_api_key"}))
+
+
+class Test_Single_Flight_Car_Api(unittest.TestCase):
+    """Tests sharing the requests of the SingleFlightCarApi."""
+
+    def setUp(self) -> None:
+        self.requests = []
+        self.release = threading.Event()
+
+        def get_car(api, car_id, **kwargs):
+            self.requests.append(car_id)
+            self.release.wait(timeout=5)
+            return f"car_{car_id}"
+
+        patcher = patch.object(CarApi, "get_car", get_car)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _get_cars_concurrently(self, calls: list[tuple[CarApi, int]]) -> list[str]:
+        shared = metrics.counter("single_flight_fleet_api_shared")
+        executed = metrics.counter("single_flight_fleet_api_executed")
+        expected_count = shared.value + executed.value + len(calls)
+        results = [""] * len(calls)
+
+        def get_car(index: int, api: CarApi, car_id: int) -> None:
+            results[index] = api.get_car(car_id)
+
+        threads = [
+            threading.Thread(target=get_car, args=(index, api, car_id)) for index, (api, car_id) in enumerate(calls)
+        ]
+        for thread in threads:
+            thread.start()
+        while shared.value + executed.value < expected_count:
+            pass
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_identical_requests_are_shared(self):
+        """Tests if concurrent requests for the same car send a single request and get its result."""
+        api = SingleFlightCarApi(_create_api_client())
+        shared_before = metrics.counter("single_flight_fleet_api_shared").value
+        self.assertEqual(self._get_cars_concurrently([(api, 1), (api, 1), (api, 1)]), ["car_1"] * 3)
+        self.assertEqual(self.requests, [1])
+        self.assertEqual(metrics.counter("single_flight_fleet_api_shared").value - shared_before, 2)
+
+    def test_different_requests_are_not_shared(self):
+        """Tests if requests for different cars are sent separately."""
+        api = SingleFlightCarApi(_create_api_client())
+        self.assertEqual(self._get_cars_concurrently([(api, 1), (api, 2)]), ["car_1", "car_2"])
+        self.assertEqual(sorted(self.requests), [1, 2])
+
+    def test_apis_of_the_same_client_share_requests(self):
+        """Tests if the APIs created for the same client share the requests, unlike APIs of other clients."""
+        api_client = _create_api_client()
+        apis = [SingleFlightCarApi(api_client), SingleFlightCarApi(api_client)]
+        apis.append(SingleFlightCarApi(_create_api_client()))
+        self._get_cars_concurrently([(api, 1) for api in apis])
+        self.assertEqual(self.requests, [1, 1])
+
+    def test_results_are_shared_for_ttl(self):
+        """Tests if a finished request is shared with the following identical requests only if the TTL is set."""
+        self.release.set()
+        api = SingleFlightCarApi(_create_api_client())
+        api.get_car(1)
+        api.get_car(1)
+        self.assertEqual(self.requests, [1, 1])
+
+        api_client = _create_api_client()
+        configure_single_flight(api_client, ttl_s=60)
+        api = SingleFlightCarApi(api_client)
+        api.get_car(2)
+        api.get_car(2)
+        self.assertEqual(self.requests, [1, 1, 2])
+
+    def test_orders_are_not_shared_for_ttl(self):
+        """Tests if finished requests for orders are not reused, as the checker needs the current orders."""
+        requests = []
+
+        def get_orders(api, **kwargs):
+            requests.append(1)
+            return []
+
+        api_client = _create_api_client()
+        configure_single_flight(api_client, ttl_s=60)
+        api = SingleFlightOrderApi(api_client)
+        with patch.object(OrderApi, "get_orders", get_orders):
+            api.get_orders()
+            api.get_orders()
+        self.assertEqual(len(requests), 2)
+
+
+if __name__ == "__main__":
+    unittest.main() # pragma: no cover
@@ -1,9 +1,10 @@
 import unittest
+import tempfile
 import threading
+import time
 
+import urllib3.exceptions
 from fleet_management_http_client_python import ( # type: ignore
-    ApiClient,
-    Configuration,
     MobilePhone,
     CarApi, Car,
     OrderApi, Order,
@@ -11,30 +12,26 @@ from fleet_management_http_client_python import ( # type: ignore
 )
 
 import fleet_notifications.database.database_controller as notifications_db
+from fleet_notifications import metrics, profiling
+from fleet_notifications.clock import VirtualClock, set_clock
 from fleet_notifications.state_checker import OrderStateChecker
+from fleet_notifications.order_record import OrderRecord
+from fleet_notifications.order_snapshot import write_snapshot
 from fleet_notifications.notifications_client import NotificationClient
+from fleet_notifications.notification_dispatcher import NotificationDispatcher
 from fleet_notifications.logs import LOGGER_NAME
-from fleet_notifications.script_args.configs import Database
+from fleet_notifications.script_args.configs import OrderSnapshot, Profiling
 from tests._utils.mock_api import MockApi
-from tests._utils.testing_configs import TEST_TWILIO_CONFIG
-
-
-def _create_test_state_checker() -> OrderStateChecker:
-    return OrderStateChecker(
-        twilio_config=TEST_TWILIO_CONFIG,
-        api_client=ApiClient(Configuration(
-            host="http://example.com",
-            api_key={'APIKeyAuth': "test_api_key"}
-        ))
-    )
+from tests._utils.state_checker_test_case import State_Checker_Test_Case, create_test_state_checker
 
 
 class Test_State_Checker_Initialization(unittest.TestCase):
     """Tests the initialization of the OrderStateChecker class."""
 
     def test_initialization(self):
-        state_checker = _create_test_state_checker()
+        state_checker = create_test_state_checker()
         self.assertTrue(isinstance(state_checker.notification_client, NotificationClient))
+        self.assertTrue(isinstance(state_checker.dispatcher, NotificationDispatcher))
         self.assertTrue(isinstance(state_checker.car_api, CarApi))
         self.assertTrue(isinstance(state_checker.order_api, OrderApi))
         self.assertTrue(isinstance(state_checker.order_state_api, OrderStateApi))
@@ -47,13 +44,13 @@ class Test_State_Checker_Is_Order_Finished(unittest.TestCase):
 
     def test_is_order_finished(self):
         """Tests if the _is_order_finished method returns true for finished orders and false for unfinished ones."""
-        state_checker = _create_test_state_checker()
-        order = Order(carId=0, targetStopId=0, stopRouteId=0,
-                      last_state=OrderState(orderId=0, status=OrderStatus.DONE))
+        state_checker = create_test_state_checker()
+        order = OrderRecord.from_order(Order(carId=0, targetStopId=0, stopRouteId=0,
+                                             last_state=OrderState(orderId=0, status=OrderStatus.DONE)))
         self.assertTrue(state_checker._is_order_finished(order))
-        order.last_state.status = OrderStatus.CANCELED
+        order.status = OrderStatus.CANCELED
         self.assertTrue(state_checker._is_order_finished(order))
-        order.last_state.status = OrderStatus.IN_PROGRESS
+        order.status = OrderStatus.IN_PROGRESS
         self.assertFalse(state_checker._is_order_finished(order))
 
 
@@ -61,14 +58,12 @@ class Test_State_Checker_Check_New_Order(unittest.TestCase):
     """Tests the _check_if_order_is_new method of the OrderStateChecker class."""
 
     def setUp(self) -> None:
-        self.state_checker = _create_test_state_checker()
+        self.state_checker = create_test_state_checker()
         self.mock_api = MockApi()
         self.state_checker.order_api = self.mock_api
         self.state_checker.orders = {
-            1: Order(carId=1, targetStopId=0, stopRouteId=0, id=1,
-                     last_state=OrderState(orderId=1, status=OrderStatus.IN_PROGRESS)),
-            2: Order(carId=2, targetStopId=0, stopRouteId=0, id=2,
-                     last_state=OrderState(orderId=2, status=OrderStatus.IN_PROGRESS))
+            1: OrderRecord(id=1, car_id=1, status=OrderStatus.IN_PROGRESS, timestamp=0, notification_phone=None),
+            2: OrderRecord(id=2, car_id=2, status=OrderStatus.IN_PROGRESS, timestamp=0, notification_phone=None)
         }
 
     def test_check_new_order(self):
@@ -101,14 +96,12 @@ class Test_State_Checker_Call_If_Order_Done(unittest.TestCase):
     """Tests the _call_phone_if_order_is_done method of the OrderStateChecker class."""
 
     def setUp(self) -> None:
-        self.state_checker = _create_test_state_checker()
+        self.state_checker = create_test_state_checker()
         self.mock_api = MockApi()
         self.state_checker.order_api = self.mock_api
         self.state_checker.orders = {
-            1: Order(carId=1, targetStopId=0, stopRouteId=0, id=1,
-                     last_state=OrderState(orderId=1, status=OrderStatus.IN_PROGRESS)),
-            2: Order(carId=2, targetStopId=0, stopRouteId=0, id=2,
-                     last_state=OrderState(orderId=2, status=OrderStatus.IN_PROGRESS))
+            1: OrderRecord(id=1, car_id=1, status=OrderStatus.IN_PROGRESS, timestamp=0, notification_phone=None),
+            2: OrderRecord(id=2, car_id=2, status=OrderStatus.IN_PROGRESS, timestamp=0, notification_phone=None)
         }
 
     def test_call_if_order_is_done(self):
@@ -158,7 +151,7 @@ class Test_State_Checker_Check_All_Orders(unittest.TestCase):
     """Tests the _check_orders_and_call_if_done method of the OrderStateChecker class."""
 
     def setUp(self) -> None:
-        self.state_checker = _create_test_state_checker()
+        self.state_checker = create_test_state_checker()
         self.mock_api = MockApi()
         self.state_checker.order_api = self.mock_api
         self.state_checker.car_api = self.mock_api
@@ -195,24 +188,9 @@ class Test_State_Checker_Check_All_Orders(unittest.TestCase):
             self.assertNotEqual(log.output[1].find("New mission started for car (ID=1)."), -1)
 
 
-class Test_State_Checker_Load_Orders(unittest.TestCase):
+class Test_State_Checker_Load_Orders(State_Checker_Test_Case):
     """Tests the _load_unfinished_orders method of the OrderStateChecker class."""
 
-    def setUp(self) -> None:
-        self.state_checker = _create_test_state_checker()
-        self.mock_api = MockApi()
-        self.state_checker.order_api = self.mock_api
-        notifications_db.initialize_db(
-            Database.Connection(
-                location="_",
-                database_name="_",
-                username="_",
-                password="_",
-                port=0
-            ),
-            test=True
-        )
-
     def test_load_orders(self):
         """Tests if the _load_unfinished_orders method loads the orders correctly."""
         self.mock_api._set_orders([Order(carId=1, targetStopId=0, stopRouteId=0, id=1,
@@ -242,31 +220,75 @@ class Test_State_Checker_Load_Orders(unittest.TestCase):
         self.assertEqual(self.state_checker._load_unfinished_orders(), 3)
 
 
-class Test_State_Checker_Remove_Finished_Orders(unittest.TestCase):
+class Test_State_Checker_Load_Orders_From_Snapshot(State_Checker_Test_Case):
+    """Tests loading the unfinished orders from the snapshot of the order cache."""
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        super().setUp()
+
+    def _create_state_checker(self) -> OrderStateChecker:
+        return create_test_state_checker(snapshot_config=OrderSnapshot(directory=self.directory.name))
+
+    def test_orders_are_loaded_without_api_requests(self):
+        """Tests if the unfinished orders in the snapshot are loaded without requests to the API and
+        the orders finished since the snapshot was written are left out."""
+        self.state_checker.orders = {
+            1: OrderRecord(id=1, car_id=1, status=OrderStatus.IN_PROGRESS, timestamp=2, notification_phone="phone"),
+            2: OrderRecord(id=2, car_id=1, status=OrderStatus.IN_PROGRESS, timestamp=3, notification_phone=None),
+        }
+        self.state_checker._save_snapshot()
+        self.state_checker.orders = {}
+        notifications_db.update_order(1, 1, 4)
+        self.assertEqual(self.state_checker._load_unfinished_orders(), 4)
+        self.assertEqual(list(self.state_checker.orders), [1])
+        self.assertEqual(self.state_checker.orders[1].notification_phone, "phone")
+        self.assertEqual(self.mock_api.total_requests, 0)
+
+    def test_order_missing_in_snapshot_is_fetched_with_its_state(self):
+        """Tests if an order missing in the snapshot is fetched from the API when its state arrives."""
+        write_snapshot(self.state_checker._snapshot_path, [])
+        notifications_db.update_order(1, 1, 4)
+        self.state_checker._load_unfinished_orders()
+        self.assertIsNone(self.state_checker.orders[1].status)
+        self.mock_api._set_orders([Order(carId=1, targetStopId=0, stopRouteId=0, id=1,
+                                         last_state=OrderState(orderId=1, status=OrderStatus.IN_PROGRESS, timestamp=5))])
+        state = OrderState(orderId=1, status=OrderStatus.IN_PROGRESS, timestamp=5)
+        self.assertTrue(self.state_checker._check_if_order_is_new(1, state, "admin", False))
+        self.assertEqual(self.state_checker.orders[1].status, OrderStatus.IN_PROGRESS)
+        self.assertEqual(self.mock_api.request_count["get_order"], 1)
+
+    def test_customer_is_called_when_order_missing_in_snapshot_is_done(self):
+        """Tests if the customer is called when the first state of an order missing in the snapshot is DONE,
+        although the fetched order is already done."""
+        write_snapshot(self.state_checker._snapshot_path, [])
+        notifications_db.update_order(1, 1, 4)
+        self.state_checker._load_unfinished_orders()
+        self.mock_api._set_orders([Order(carId=1, targetStopId=0, stopRouteId=0, id=1,
+                                         notificationPhone=MobilePhone(phone="customer"),
+                                         last_state=OrderState(orderId=1, status=OrderStatus.DONE, timestamp=5))])
+        dispatched = []
+        self.state_checker.dispatcher.dispatch = lambda phone, *_: dispatched.append(phone)
+        state = OrderState(orderId=1, status=OrderStatus.DONE, timestamp=5)
+        self.assertTrue(self.state_checker._check_if_order_is_new(1, state, "admin", False))
+        self.state_checker._call_phone_if_order_is_done(1, state, False)
+        self.assertEqual(dispatched, ["customer"])
+        self.assertEqual(self.state_checker.orders[1].status, OrderStatus.DONE)
+
+
+class Test_State_Checker_Remove_Finished_Orders(State_Checker_Test_Case):
     """Tests the _remove_finished_orders method of the OrderStateChecker class."""
 
     def setUp(self) -> None:
-        self.state_checker = _create_test_state_checker()
-        self.mock_api = MockApi()
-        self.state_checker.order_api = self.mock_api
+        super().setUp()
         self.mock_api._set_orders([Order(carId=1, targetStopId=0, stopRouteId=0, id=1,
                                          last_state=OrderState(orderId=1, status=OrderStatus.IN_PROGRESS))])
-        notifications_db.initialize_db(
-            Database.Connection(
-                location="_",
-                database_name="_",
-                username="_",
-                password="_",
-                port=0
-            ),
-            test=True
-        )
 
     def test_remove_finished_orders(self):
         """Tests if the _remove_finished_orders method removes finished orders from the list."""
         self.state_checker.orders = {
-            1: Order(carId=1, targetStopId=0, stopRouteId=0, id=1,
-                     last_state=OrderState(orderId=1, status=OrderStatus.DONE))
+            1: OrderRecord(id=1, car_id=1, status=OrderStatus.DONE, timestamp=0, notification_phone=None)
         }
         self.state_checker._remove_finished_orders()
         self.assertEqual(len(self.state_checker.orders), 0)
@@ -274,10 +296,8 @@ class Test_State_Checker_Remove_Finished_Orders(unittest.TestCase):
     def test_remove_finished_orders_order_not_in_api(self):
         """Tests if the _remove_finished_orders method removes orders that are not in the API."""
         self.state_checker.orders = {
-            1: Order(carId=1, targetStopId=0, stopRouteId=0, id=1,
-                     last_state=OrderState(orderId=1, status=OrderStatus.IN_PROGRESS)),
-            2: Order(carId=2, targetStopId=0, stopRouteId=0, id=2,
-                     last_state=OrderState(orderId=2, status=OrderStatus.IN_PROGRESS))
+            1: OrderRecord(id=1, car_id=1, status=OrderStatus.IN_PROGRESS, timestamp=0, notification_phone=None),
+            2: OrderRecord(id=2, car_id=2, status=OrderStatus.IN_PROGRESS, timestamp=0, notification_phone=None)
         }
         self.state_checker._remove_finished_orders()
         self.assertEqual(len(self.state_checker.orders), 1)
@@ -285,36 +305,20 @@ class Test_State_Checker_Remove_Finished_Orders(unittest.TestCase):
     def test_remove_finished_orders_order_finished_and_not_in_api(self):
         """Tests if the _remove_finished_orders method removes orders that are finished and not in the API."""
         self.state_checker.orders = {
-            2: Order(carId=1, targetStopId=0, stopRouteId=0, id=2,
-                     last_state=OrderState(orderId=1, status=OrderStatus.DONE))
+            2: OrderRecord(id=2, car_id=1, status=OrderStatus.DONE, timestamp=0, notification_phone=None)
         }
         self.state_checker._remove_finished_orders()
         self.assertEqual(len(self.state_checker.orders), 0)
 
 
-class Test_State_Checker_Timestamp_Update(unittest.TestCase):
+class Test_State_Checker_Timestamp_Update(State_Checker_Test_Case):
     """Tests the _update_latest_timestamps method of the OrderStateChecker class."""
 
-    def setUp(self) -> None:
-        self.state_checker = _create_test_state_checker()
-        notifications_db.initialize_db(
-            Database.Connection(
-                location="_",
-                database_name="_",
-                username="_",
-                password="_",
-                port=0
-            ),
-            test=True
-        )
-
     def test_updating_timestamps(self):
         """Tests if the _update_latest_timestamps method updates the timestamps of the orders."""
         self.state_checker.orders = {
-            1: Order(carId=1, targetStopId=0, stopRouteId=0, id=1,
-                     last_state=OrderState(orderId=1, status=OrderStatus.IN_PROGRESS, timestamp=1)),
-            2: Order(carId=2, targetStopId=0, stopRouteId=0, id=2,
-                     last_state=OrderState(orderId=2, status=OrderStatus.IN_PROGRESS, timestamp=2))
+            1: OrderRecord(id=1, car_id=1, status=OrderStatus.IN_PROGRESS, timestamp=1, notification_phone=None),
+            2: OrderRecord(id=2, car_id=2, status=OrderStatus.IN_PROGRESS, timestamp=2, notification_phone=None)
         }
         self.state_checker._update_latest_timestamps(3)
         orders = notifications_db.get_orders()
@@ -324,15 +328,183 @@ class Test_State_Checker_Timestamp_Update(unittest.TestCase):
     def test_updating_timestamps_finished_orders(self):
         """Tests if the _update_latest_timestamps method removes finished orders."""
         self.state_checker.orders = {
-            1: Order(carId=1, targetStopId=0, stopRouteId=0, id=1,
-                     last_state=OrderState(orderId=1, status=OrderStatus.DONE, timestamp=1)),
-            2: Order(carId=2, targetStopId=0, stopRouteId=0, id=2,
-                     last_state=OrderState(orderId=2, status=OrderStatus.CANCELED, timestamp=1))
+            1: OrderRecord(id=1, car_id=1, status=OrderStatus.DONE, timestamp=1, notification_phone=None),
+            2: OrderRecord(id=2, car_id=2, status=OrderStatus.CANCELED, timestamp=1, notification_phone=None)
         }
         self.state_checker._update_latest_timestamps(3)
         orders = notifications_db.get_orders()
         self.assertEqual(orders, [])
 
 
+class Test_State_Checker_Stop(State_Checker_Test_Case):
+    """Tests the stop method of the OrderStateChecker class."""
+
+    def test_stop_saves_since(self):
+        """Tests if the stop method saves the since watermark of the unfinished orders."""
+        self.state_checker.orders = {
+            1: OrderRecord(id=1, car_id=1, status=OrderStatus.IN_PROGRESS, timestamp=1, notification_phone=None)
+        }
+        self.state_checker.since = 5
+        self.state_checker.stop(timeout_s=1)
+        self.assertEqual(notifications_db.get_orders()[0].timestamp, 5)
+
+
+class Test_State_Checker_Iteration_Profiling(State_Checker_Test_Case):
+    """Tests timing the iterations of the OrderStateChecker."""
+
+    def setUp(self) -> None:
+        profiling.configure_profiling(Profiling(use=True, slowest_iterations=0))
+        self.addCleanup(profiling.configure_profiling, Profiling())
+        super().setUp()
+        self.state_checker.dispatcher.dispatch = lambda *_: None
+        self.mock_api._set_cars([Car(id=1, platformHwId=1, name="car", carAdminPhone=MobilePhone(phone="admin"))])
+        self.mock_api._set_orders([Order(id=1, carId=1, targetStopId=0, stopRouteId=0)])
+
+    def test_wait_for_states_is_not_timed(self):
+        """Tests if the iteration is timed from the arrival of the states, without the wait of the long poll."""
+        iterations = metrics.summary("checker_iteration_s").snapshot()
+        self.state_checker.start_thread()
+        time.sleep(0.3)
+        self.mock_api._add_order_state(
+            OrderState(id=1, orderId=1, carId=1, status=OrderStatus.IN_PROGRESS, timestamp=1)
+        )
+        deadline = time.monotonic() + 5
+        while self.state_checker.since < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.state_checker.stop(timeout_s=1)
+        snapshot = metrics.summary("checker_iteration_s").snapshot()
+        self.assertEqual(snapshot["count"], iterations["count"] + 1)
+        self.assertLess(snapshot["sum"] - iterations["sum"], 0.25)
+
+
+class Test_State_Checker_Catch_Up(State_Checker_Test_Case):
+    """Tests processing the states created while the OrderStateChecker was not running."""
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.state_checker._catch_up_page_size = 2
+        self.mock_api._set_cars([Car(id=1, platformHwId=1, name="car", carAdminPhone=MobilePhone(phone="admin"))])
+        self.mock_api._set_orders([
+            Order(id=order_id, carId=1, targetStopId=0, stopRouteId=0, notificationPhone=MobilePhone(phone="phone"))
+            for order_id in range(1, 6)
+        ])
+        for timestamp, order_id in enumerate((1, 2, 1, 3, 4, 5), start=1):
+            self.mock_api._add_order_state(
+                OrderState(id=timestamp, orderId=order_id, carId=1, status=OrderStatus.IN_PROGRESS, timestamp=timestamp)
+            )
+
+    def test_states_are_processed_in_pages(self):
+        """Tests if only the latest state of every order is processed, in pages sorted by the timestamps."""
+        pages = list(OrderStateChecker._pages(self.mock_api.get_all_order_states(last_n=1), page_size=2))
+        self.assertEqual([list(page) for page in pages], [[2, 1], [3, 4], [5]])
+
+    def test_since_is_saved_after_every_page(self):
+        """Tests if the since watermark is saved after every page and the newest timestamp is returned."""
+        saved_since = []
+        process_states = self.state_checker._process_states
+        def process_and_record(states):
+            since = process_states(states)
+            saved_since.append(since)
+            return since
+        self.state_checker._process_states = process_and_record
+        self.assertEqual(self.state_checker._catch_up(since=1), 6)
+        self.assertEqual(saved_since, [3, 5, 6])
+        self.assertEqual(self.state_checker.since, 6)
+        self.assertEqual(self.mock_api.request_count["get_all_order_states"], 1)
+
+    def test_catch_up_backs_off_during_outage(self):
+        """Tests if the catch-up failing during an outage of the API backs off and opens the circuit, logging
+        only the first failure, instead of restarting at a fixed interval, and is finished after the recovery."""
+        previous_clock = set_clock(VirtualClock())
+        self.addCleanup(set_clock, previous_clock)
+        self.state_checker.dispatcher.dispatch = lambda *_: None
+        self.mock_api.long_poll_timeout_s = 0.1
+        self.mock_api.fail_next_requests(8, urllib3.exceptions.MaxRetryError(
+            None, "/v2/management/order-state", urllib3.exceptions.ProtocolError("Connection refused")
+        ))
+        opened_before = metrics.counter("fleet_management_circuit_opened").value
+        with self.assertLogs(LOGGER_NAME, level="WARNING") as log:
+            self.state_checker.start_thread()
+            deadline = time.monotonic() + 5
+            while self.state_checker.since < 6 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.state_checker.stop(timeout_s=1)
+        self.assertEqual(self.state_checker.since, 6)
+        self.assertEqual(metrics.counter("fleet_management_circuit_opened").value - opened_before, 1)
+        self.assertEqual(sum("Request to the Fleet Management API failed" in line for line in log.output), 1)
+        self.assertEqual(self.state_checker.consecutive_errors, 0)
+
+
+class Test_State_Checker_Prefetch(State_Checker_Test_Case):
+    """Tests fetching the orders of a batch of states concurrently."""
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.mock_api.latency_s = 0.1
+        self.mock_api._set_cars([
+            Car(id=car_id, platformHwId=car_id, name=f"car_{car_id}", carAdminPhone=MobilePhone(phone="admin"))
+            for car_id in range(1, 5)
+        ])
+        self.mock_api._set_orders([
+            Order(id=order_id, carId=order_id, targetStopId=0, stopRouteId=0,
+                  notificationPhone=MobilePhone(phone=f"phone_{order_id}"))
+            for order_id in range(1, 5)
+        ])
+        self.dispatched = []
+        self.state_checker.dispatcher.dispatch = lambda phone, *_: self.dispatched.append(phone)
+        self.states = {
+            order_id: OrderState(id=order_id, orderId=order_id, carId=order_id, status=OrderStatus.DONE, timestamp=1)
+            for order_id in range(1, 5)
+        }
+
+    def tearDown(self) -> None:
+        self.state_checker.stop(timeout_s=1)
+
+    def test_orders_are_fetched_concurrently(self):
+        """Tests if the orders are fetched in parallel, so the batch does not wait for the sum of the requests."""
+        start = time.monotonic()
+        prefetched = self.state_checker._prefetch_orders(
+            self.states.values(), {order.id: order for order in self.mock_api.orders}
+        )
+        self.assertLess(time.monotonic() - start, 0.3)
+        self.assertEqual(sorted(prefetched), [1, 2, 3, 4])
+
+    def test_prefetched_orders_are_used_by_both_checks(self):
+        """Tests if every order is fetched once, although both the new and the done check need it."""
+        self.state_checker._check_orders_and_call_if_done(self.states)
+        self.assertEqual(self.mock_api.request_count["get_order"], 4)
+        self.assertEqual(sorted(self.dispatched), ["admin"] * 4 + [f"phone_{order_id}" for order_id in range(1, 5)])
+
+    def test_failed_prefetch_is_not_repeated(self):
+        """Tests if an order that could not be prefetched is skipped without another request."""
+        all_orders = {order.id: order for order in self.mock_api.orders}
+        self.mock_api.fail_next_requests(1)
+        with self.assertLogs(LOGGER_NAME, level="WARNING") as log:
+            prefetched = self.state_checker._prefetch_orders(self.states.values(), all_orders)
+            for order_id, state in self.states.items():
+                self.state_checker._check_order_state(order_id, state, all_orders, prefetched)
+        self.assertEqual(sum("Unable to get order with ID" in line for line in log.output), 1)
+        self.assertEqual(self.mock_api.request_count["get_order"], 4)
+        self.assertEqual(len(self.dispatched), 6)
+
+
+class Test_State_Checker_Sites(State_Checker_Test_Case):
+    """Tests the OrderStateChecker class watching one of several sites."""
+
+    sites = ("", "second_site")
+
+    def test_orders_of_sites_are_isolated(self):
+        """Tests if the orders of a site are saved only in the table of the site."""
+        notifications_db.update_order(1, 1, 5, "second_site")
+        self.assertEqual(notifications_db.get_orders(), [])
+        self.assertEqual(notifications_db.get_orders("second_site")[0].timestamp, 5)
+
+    def test_sites_share_dispatcher(self):
+        """Tests if the checkers given the same dispatcher also share the notification client."""
+        second_checker = create_test_state_checker(dispatcher=self.state_checker.dispatcher, site="second_site")
+        self.assertIs(second_checker.notification_client, self.state_checker.notification_client)
+        self.assertEqual(second_checker.thread.name, "state-checker-second_site")
+
+
 if __name__ == "__main__":
     unittest.main() # pragma: no cover
\ No newline at end of file
@@ -0,0 +1,113 @@
+import contextvars
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from fleet_notifications import metrics, tracing
+from fleet_notifications.notification_dispatcher import NotificationDispatcher, NotificationPriority
+from fleet_notifications.script_args.configs import Tracing, Twilio
+
+
+class _RecordingNotificationClient:
+    def __init__(self):
+        self.origin_timestamps = []
+        self.called = threading.Event()
+
+    def call_phone(self, phone_number: str, under_test: bool, origin_timestamp_ms: int | None = None, on_placing=None):
+        with tracing.span("twilio.calls.create"):
+            self.origin_timestamps.append(origin_timestamp_ms)
+        self.called.set()
+
+
+class Test_Spans(unittest.TestCase):
+    """Tests creating and exporting spans."""
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "traces.jsonl")
+        tracing.configure_tracing(Tracing(use=True, path=self.path))
+
+    def tearDown(self) -> None:
+        tracing.stop_tracing()
+        self.directory.cleanup()
+
+    def _exported_spans(self) -> dict[str, dict]:
+        tracing.stop_tracing()
+        spans = {}
+        with open(self.path) as trace_file:
+            for line in trace_file:
+                batch = json.loads(line)
+                for resource_spans in batch["resourceSpans"]:
+                    for scope_spans in resource_spans["scopeSpans"]:
+                        spans.update((span["name"], span) for span in scope_spans["spans"])
+        return spans
+
+    def test_nested_spans_share_trace(self):
+        """Tests that a span started in a block of another span is its child."""
+        with tracing.span("checker.iteration"):
+            with tracing.span("order_state.check", order_id=1):
+                pass
+        spans = self._exported_spans()
+        parent, child = spans["checker.iteration"], spans["order_state.check"]
+        self.assertEqual(child["traceId"], parent["traceId"])
+        self.assertEqual(child["parentSpanId"], parent["spanId"])
+        self.assertNotIn("parentSpanId", parent)
+        self.assertIn({"key": "order_id", "value": {"intValue": "1"}}, child["attributes"])
+
+    def test_exception_marks_span_as_failed(self):
+        """Tests that an exception raised in the block sets the error status of the span."""
+        with self.assertRaises(ValueError):
+            with tracing.span("twilio.calls.create"):
+                raise ValueError("rejected")
+        status = self._exported_spans()["twilio.calls.create"]["status"]
+        self.assertEqual(status, {"code": 2, "message": "ValueError: rejected"})
+
+    def test_queued_notification_continues_trace(self):
+        """Tests that the spans of the dispatched call belong to the trace of the dispatching span."""
+        client = _RecordingNotificationClient()
+        dispatcher = NotificationDispatcher(client, Twilio.Notifications.Dispatcher(workers=2))
+        with tracing.span("notification.decision"):
+            dispatcher.dispatch("123", False, NotificationPriority.CUSTOMER, origin_timestamp_ms=1000)
+        self.assertTrue(client.called.wait(5))
+        spans = self._exported_spans()
+        decision = spans["notification.decision"]
+        self.assertEqual(spans["notification.queue"]["parentSpanId"], decision["spanId"])
+        self.assertEqual(spans["twilio.calls.create"]["parentSpanId"], decision["spanId"])
+        self.assertEqual(spans["twilio.calls.create"]["traceId"], decision["traceId"])
+        self.assertEqual(client.origin_timestamps, [1000])
+
+
+class Test_Disabled_Tracing(unittest.TestCase):
+    """Tests that no spans are created if the tracing is disabled."""
+
+    def test_span_is_none(self):
+        """Tests that the block is run without a span."""
+        tracing.configure_tracing(Tracing(use=False))
+        with tracing.span("checker.iteration") as span:
+            self.assertIsNone(span)
+        self.assertIsNone(tracing.start_span("notification.queue"))
+        self.assertFalse(tracing.is_enabled())
+
+    def test_context_without_span(self):
+        """Tests that a copied context has no current span."""
+        self.assertIsNone(contextvars.copy_context().run(tracing._current_span.get))
+
+
+class Test_Histogram(unittest.TestCase):
+    """Tests the histogram metric used for the end-to-end lag."""
+
+    def test_buckets_are_cumulative(self):
+        """Tests that every bucket counts all values up to its bound."""
+        histogram = metrics.Histogram(buckets=(1, 5))
+        for value in (0.5, 1, 3, 10):
+            histogram.observe(value)
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot["buckets"], {"1": 2, "5": 3, "+Inf": 4})
+        self.assertEqual(snapshot["count"], 4)
+        self.assertEqual(snapshot["max"], 10)
+
+
+if __name__ == "__main__":
+    unittest.main() # pragma: no cover